@@ -0,0 +1,211 @@
+"""Queue-based logging and sampled JSON access logs.
+
+start() moves every handler off the request thread. The root logger and the
+"bookstore.access" logger each get a QueueHandler on a bounded queue, and one
+QueueListener thread per queue does the formatting and file/console I/O:
+
+- Root: app.log and the console handler, with the same levels and formats
+  as the old logging.basicConfig setup. werkzeug's request lines and
+  logging.exception() calls from views go here.
+- bookstore.access: one JSON line per logged request in a rotating
+  access.log (10MB x 5).
+
+    {"ts": 1760000000.123, "method": "POST", "route": "/buyer/payment",
+     "path": "/buyer/payment", "status": 200, "ms": 8.41, "db_ops": 12,
+     "db_ms": 3.27, "remote": "127.0.0.1", "sample": 0.01}
+
+init_app(app) adds the hooks that write these lines. Which requests are
+logged:
+
+- every response with status >= 400;
+- every request slower than ACCESS.slow_ms;
+- a random ACCESS.sample_rate share of the rest.
+
+Sampled lines carry "sample" so counts can be scaled back up. The decision
+comes first, so a skipped request costs one perf_counter pair and a
+random(). Access entries are passed to the queue as dicts and serialized on
+the listener thread. When a queue is full, records are dropped and counted
+in bookstore_log_dropped_total; a slow disk never blocks a request.
+
+Configuration comes from the environment. ACCESS.sample_rate and
+ACCESS.slow_ms can also be changed at runtime:
+
+    BE_ACCESS_LOG              path, default <bookstore>/access.log; "off" disables
+    BE_ACCESS_LOG_SAMPLE       share of fast 2xx/3xx requests logged, default 0.01
+    BE_ACCESS_LOG_SLOW_MS      always log requests at or above this, default 500
+"""
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import List, Optional
+
+from flask import Flask, g, request
+
+from be import metrics
+from be.model import mongo_monitor
+
+ACCESS_LOG_PATH = os.getenv(
+    "BE_ACCESS_LOG", os.path.join(os.path.dirname(os.path.dirname(__file__)), "access.log")
+)
+SAMPLE_RATE = float(os.getenv("BE_ACCESS_LOG_SAMPLE", "0.01"))
+SLOW_MS = float(os.getenv("BE_ACCESS_LOG_SLOW_MS", "500"))
+QUEUE_SIZE = 10000
+MAX_BYTES = 10 * 1024 * 1024
+BACKUP_COUNT = 5
+
+CONSOLE_FORMAT = "%(asctime)s [%(threadName)-12.12s] [%(levelname)-5.5s]  %(message)s"
+
+DROPPED = metrics.Counter(
+    "bookstore_log_dropped_total", "Log records dropped because the logging queue was full.", ("logger",)
+)
+
+access_logger = logging.getLogger("bookstore.access")
+access_logger.propagate = False
+access_logger.setLevel(logging.INFO)
+
+
+class _BoundedQueueHandler(QueueHandler):
+    """QueueHandler that drops (and counts) records instead of blocking or raising."""
+
+    def __init__(self, q: "queue.Queue", name: str):
+        super().__init__(q)
+        self._drop_label = name
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DROPPED.inc(self._drop_label)
+
+
+class _DictQueueHandler(_BoundedQueueHandler):
+    # 访问日志的 msg 是请求线程新建的 dict，不再修改，直接入队，留给监听线程序列化
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        msg = record.msg
+        if isinstance(msg, dict):
+            return json.dumps(msg, ensure_ascii=False, separators=(",", ":"), default=str)
+        return json.dumps({"ts": round(record.created, 3), "message": record.getMessage()}, ensure_ascii=False)
+
+
+class AccessLog:
+    def __init__(self, sample_rate: float = None, slow_ms: float = None):
+        self.sample_rate = SAMPLE_RATE if sample_rate is None else sample_rate
+        self.slow_ms = SLOW_MS if slow_ms is None else slow_ms
+
+    def should_log(self, status: int, ms: float) -> Optional[float]:
+        """None to skip; otherwise the sampling rate the entry was kept at (1.0 = always)."""
+        if status >= 400 or ms >= self.slow_ms:
+            return 1.0
+        rate = self.sample_rate
+        if rate >= 1:
+            return 1.0
+        if rate > 0 and random.random() < rate:
+            return rate
+        return None
+
+
+ACCESS = AccessLog()
+
+_listeners: List[QueueListener] = []
+_lock = threading.Lock()
+
+
+def start(app_log_path: str, access_log_path: str = None) -> None:
+    """Install the queue handlers and start the listener threads (once per process)."""
+    with _lock:
+        if _listeners:
+            return
+        access_log_path = ACCESS_LOG_PATH if access_log_path is None else access_log_path
+
+        file_handler = logging.FileHandler(app_log_path)
+        file_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+        console = logging.StreamHandler()
+        console.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+        app_queue: "queue.Queue" = queue.Queue(QUEUE_SIZE)
+        root = logging.getLogger()
+        root.setLevel(logging.ERROR)
+        root.addHandler(_BoundedQueueHandler(app_queue, "root"))
+        _listeners.append(QueueListener(app_queue, file_handler, console, respect_handler_level=True))
+
+        if access_log_path and access_log_path != "off":
+            handler = RotatingFileHandler(access_log_path, maxBytes=MAX_BYTES, backupCount=BACKUP_COUNT,
+                                          encoding="utf-8")
+            handler.setFormatter(JsonFormatter())
+            access_queue: "queue.Queue" = queue.Queue(QUEUE_SIZE)
+            access_logger.addHandler(_DictQueueHandler(access_queue, "access"))
+            _listeners.append(QueueListener(access_queue, handler))
+
+        for listener in _listeners:
+            listener.start()
+
+
+def flush() -> None:
+    """Wait until every queued record has been handled by its listener."""
+    for listener in list(_listeners):
+        listener.queue.join()
+
+
+def stop() -> None:
+    """Flush the queues and close the handlers (shutdown, tests)."""
+    with _lock:
+        for listener in _listeners:
+            listener.stop()
+            for h in listener.handlers:
+                h.close()
+        _listeners.clear()
+        for logger in (logging.getLogger(), access_logger):
+            for h in list(logger.handlers):
+                if isinstance(h, QueueHandler):
+                    logger.removeHandler(h)
+
+
+def _before() -> None:
+    g._access_start = time.perf_counter()
+
+
+def _after(response):
+    start_t = g.get("_access_start")
+    if start_t is None or not access_logger.handlers:
+        return response
+    ms = (time.perf_counter() - start_t) * 1000
+    status = response.status_code
+    rate = ACCESS.should_log(status, ms)
+    if rate is None:
+        return response
+    rule = request.url_rule
+    entry = {
+        "ts": round(time.time(), 3),
+        "method": request.method,
+        "route": rule.rule if rule is not None else metrics.UNMATCHED,
+        "path": request.path,
+        "status": status,
+        "ms": round(ms, 3),
+    }
+    db = mongo_monitor.current()
+    if db is not None:
+        entry["db_ops"] = db.round_trips
+        entry["db_ms"] = round(db.seconds * 1000, 3)
+    entry["remote"] = request.remote_addr
+    root = g.get("_trace_root")
+    if root is not None:
+        entry["trace_id"] = root.trace.trace_id
+    if rate < 1:
+        entry["sample"] = rate
+    access_logger.info(entry)
+    return response
+
+
+def init_app(app: Flask) -> None:
+    """Write access log entries for requests handled by `app` (all blueprints)."""
+    app.before_request(_before)
+    app.after_request(_after)
@@ -0,0 +1,199 @@
+"""Liveness, readiness, background index builds and graceful drain.
+
+GET /healthz answers 200 as long as the process serves requests, including
+while it drains. Restarting a draining process would cut the requests it is
+finishing. GET /readyz (be/view/health.py) answers 200 only when all of
+these hold:
+
+- MongoDB answers a ping within READY_TIMEOUT_S. pymongo.timeout bounds
+  server selection too, so a probe never hangs for the client's 30 s
+  default.
+- The index version stored in the database (store_mongo.INDEX_VERSION,
+  written by ensure_indexes) is at least the one this code expects.
+- The process is not draining.
+
+be_run no longer builds indexes before it starts serving. An unreachable
+MongoDB used to block startup in server selection. start_index_build()
+now runs mongo_store.ensure_indexes and store_mongo.ensure_indexes_once on
+a background thread, retrying with backoff. /readyz stays 503 until it
+succeeds.
+
+Drain (POST /admin/drain, or SIGTERM when be_run runs in the main thread):
+
+1. /readyz turns 503, so the load balancer stops routing here.
+2. New requests get 503 with Retry-After: 1 and Connection: close, so
+   clients retry on another instance. Health, metrics and admin routes stay
+   open.
+3. Requests already running finish. When none are left, or at the
+   deadline, the server is shut down.
+
+A rolling restart that drains each instance therefore completes every
+checkout that reached it.
+
+    BE_READY_TIMEOUT_S    readiness ping timeout, default 2
+    BE_DRAIN_DEADLINE_S   default drain deadline, default 30
+"""
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import pymongo
+from flask import Flask, g, jsonify, request
+
+from be.model import mongo_store, store_mongo
+
+READY_TIMEOUT_S = float(os.getenv("BE_READY_TIMEOUT_S", "2"))
+DRAIN_DEADLINE_S = float(os.getenv("BE_DRAIN_DEADLINE_S", "30"))
+INDEX_RETRY_MIN_S = 1.0
+INDEX_RETRY_MAX_S = 60.0
+
+# 排空期间仍然放行的蓝图：探针、指标与管理接口
+EXEMPT_BLUEPRINTS = ("health", "metrics", "admin", "shutdown")
+
+
+class Lifecycle:
+    """In-flight request count, drain state and the server to stop."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self.in_flight = 0
+        self.draining = False
+        self.indexes_ready = False
+        self.index_error: Optional[str] = None
+        self.server = None
+        # 最近一次排空的结果：耗时与截止时仍在执行的请求数
+        self.last_drain: Optional[Dict[str, Any]] = None
+        self._drain_thread: Optional[threading.Thread] = None
+
+    def enter(self) -> bool:
+        with self._cond:
+            if self.draining:
+                return False
+            self.in_flight += 1
+            return True
+
+    def leave(self) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            if self.in_flight == 0:
+                self._cond.notify_all()
+
+    def wait_idle(self, timeout: float) -> bool:
+        """Wait until no counted request is running; False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.in_flight == 0, timeout)
+
+    def drain(self, deadline_s: float = None, stop: bool = True) -> bool:
+        """Stop taking new work; when idle (or at the deadline) stop the server.
+
+        Returns False if a drain was already in progress.
+        """
+        deadline_s = DRAIN_DEADLINE_S if deadline_s is None else deadline_s
+        with self._cond:
+            if self.draining:
+                return False
+            self.draining = True
+        self._drain_thread = threading.Thread(target=self._drain, args=(deadline_s, stop), name="drain", daemon=True)
+        self._drain_thread.start()
+        return True
+
+    def _drain(self, deadline_s: float, stop: bool) -> None:
+        started = time.monotonic()
+        idle = self.wait_idle(deadline_s)
+        self.last_drain = {"seconds": round(time.monotonic() - started, 3), "unfinished": 0 if idle else self.in_flight}
+        if not idle:
+            logging.getLogger(__name__).error("drain deadline reached with %d requests running", self.in_flight)
+        if stop:
+            self.stop_server()
+
+    def resume(self) -> None:
+        """Leave drain mode (tests, or a cancelled rollout)."""
+        with self._cond:
+            self.draining = False
+
+    def stop_server(self) -> None:
+        server = self.server
+        if server is not None:
+            # shutdown() 会等待 serve_forever 退出，不能在服务线程内同步调用
+            threading.Thread(target=server.shutdown, name="server-shutdown", daemon=True).start()
+
+
+STATE = Lifecycle()
+
+
+def start_index_build(get_db: Callable[[], Any]) -> threading.Thread:
+    """Ensure indexes on a background thread, retrying until it succeeds."""
+
+    def build() -> None:
+        delay = INDEX_RETRY_MIN_S
+        while not STATE.draining:
+            try:
+                db = get_db()
+                mongo_store.ensure_indexes(db)
+                store_mongo.ensure_indexes_once(db)
+                STATE.indexes_ready = True
+                STATE.index_error = None
+                return
+            except Exception as e:
+                STATE.index_error = "{}: {}".format(type(e).__name__, e)
+                logging.getLogger(__name__).error("index build failed, retrying in %.0fs: %s", delay,
+                                                  STATE.index_error)
+                time.sleep(delay)
+                delay = min(delay * 2, INDEX_RETRY_MAX_S)
+
+    t = threading.Thread(target=build, name="index-build", daemon=True)
+    t.start()
+    return t
+
+
+def readiness(db=None) -> Tuple[bool, Dict[str, Any]]:
+    """(ready, per-check details) for /readyz."""
+    checks: Dict[str, Any] = {"draining": STATE.draining}
+    ready = not STATE.draining
+    try:
+        if db is None:
+            db = mongo_store.get_db()
+        with pymongo.timeout(READY_TIMEOUT_S):
+            db.command("ping")
+            checks["mongo"] = "ok"
+            found = store_mongo.index_version(db)
+    except Exception as e:
+        checks["mongo"] = "{}: {}".format(type(e).__name__, e)
+        return False, checks
+    checks["indexes"] = {"expected": store_mongo.INDEX_VERSION, "found": found}
+    if STATE.index_error and not STATE.indexes_ready:
+        checks["indexes"]["error"] = STATE.index_error
+    return ready and found >= store_mongo.INDEX_VERSION, checks
+
+
+def _before():
+    if request.blueprint in EXEMPT_BLUEPRINTS:
+        return None
+    if not STATE.enter():
+        resp = jsonify({"message": "draining"})
+        resp.status_code = 503
+        resp.headers["Retry-After"] = "1"
+        resp.headers["Connection"] = "close"
+        return resp
+    g._health_counted = True
+    return None
+
+
+def _after(response):
+    if STATE.draining:
+        response.headers["Connection"] = "close"
+    return response
+
+
+def _teardown(exc: Optional[BaseException]) -> None:
+    if g.pop("_health_counted", False):
+        STATE.leave()
+
+
+def init_app(app: Flask) -> None:
+    """Count in-flight requests and refuse new ones while draining."""
+    app.before_request(_before)
+    app.after_request(_after)
+    app.teardown_request(_teardown)
@@ -0,0 +1,249 @@
+"""In-process request metrics, exported in the Prometheus text format.
+
+init_app(app) instruments every blueprint through Flask request hooks:
+
+    bookstore_http_request_duration_seconds{route,method,status}  histogram
+    bookstore_http_requests_in_flight{route}                      gauge
+    bookstore_http_errors_total{route,status}                     counter, status >= 400
+    bookstore_http_exceptions_total{route,exception}              counter, unhandled exceptions
+    bookstore_http_db_round_trips{route}                          histogram, MongoDB commands per request
+
+The hooks also track the MongoDB commands each request sends (see
+be/model/mongo_monitor.py) and add X-DB-Round-Trips / X-DB-Time-Ms headers.
+
+`route` is the URL rule (e.g. /buyer/new_order), not the raw path, so a
+scanner hitting random URLs adds one "<unmatched>" series instead of one per
+path. GET /metrics (be/view/metrics.py) renders everything in REGISTRY.
+
+Overhead is one perf_counter pair, a dict lookup and a short lock per
+request: a bisect over a dozen bucket bounds. There are no background
+threads and no client library. Counters live in this process; the backend
+runs as one multi-threaded process (be_run), so one scrape sees
+everything.
+
+Other modules can define their own metrics with Counter/Gauge/Histogram;
+they are registered on creation and appear on /metrics automatically.
+"""
+import bisect
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from flask import Flask, g, request
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 秒；覆盖从缓存命中的亚毫秒请求到超时边缘的慢请求
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+UNMATCHED = "<unmatched>"
+
+REGISTRY: List["_Metric"] = []
+_registry_lock = threading.Lock()
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = ['{}="{}"'.format(n, _escape(v)) for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        with _registry_lock:
+            REGISTRY.append(self)
+
+    def _key(self, labels: Sequence[str]) -> Tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError("{} expects labels {}".format(self.name, self.labelnames))
+        return tuple(str(v) for v in labels)
+
+    def render(self) -> Iterable[str]:
+        yield "# HELP {} {}".format(self.name, self.doc)
+        yield "# TYPE {} {}".format(self.name, self.kind)
+        yield from self._samples()
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, doc: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, doc, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, v in items:
+            yield "{}{} {}".format(self.name, _labels(self.labelnames, key), _num(v))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels: str, value: float) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, doc, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [每个桶的计数(非累计)..., +Inf 桶, 总和]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            row[i] += 1
+            row[-1] += value
+
+    def count(self, *labels: str) -> int:
+        row = self._values.get(self._key(labels))
+        return int(sum(row[:-1])) if row else 0
+
+    def _samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        bounds = self.buckets + (float("inf"),)
+        for key, row in items:
+            cumulative = 0
+            for bound, n in zip(bounds, row[:-1]):
+                cumulative += n
+                le = 'le="{}"'.format(_num(bound))
+                yield "{}_bucket{} {}".format(self.name, _labels(self.labelnames, key, le), int(cumulative))
+            yield "{}_sum{} {}".format(self.name, _labels(self.labelnames, key), _num(row[-1]))
+            yield "{}_count{} {}".format(self.name, _labels(self.labelnames, key), int(cumulative))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+def render() -> str:
+    with _registry_lock:
+        metrics = list(REGISTRY)
+    lines: List[str] = []
+    for m in metrics:
+        lines.extend(m.render())
+    return "\n".join(lines) + "\n"
+
+
+REQUEST_DURATION = Histogram(
+    "bookstore_http_request_duration_seconds",
+    "Time spent handling a request, by URL rule, method and status code.",
+    ("route", "method", "status"),
+)
+IN_FLIGHT = Gauge("bookstore_http_requests_in_flight", "Requests currently being handled, by URL rule.", ("route",))
+ERRORS = Counter("bookstore_http_errors_total", "Responses with status >= 400, by URL rule and status code.", ("route", "status"))
+EXCEPTIONS = Counter(
+    "bookstore_http_exceptions_total", "Requests that raised an unhandled exception, by URL rule.", ("route", "exception")
+)
+DB_ROUND_TRIPS = Histogram(
+    "bookstore_http_db_round_trips",
+    "MongoDB commands sent while handling one request, by URL rule.",
+    ("route",),
+    buckets=(0, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 30, 50, 100),
+)
+
+
+def _route() -> str:
+    rule = request.url_rule
+    return rule.rule if rule is not None else UNMATCHED
+
+
+def _before() -> None:
+    # 放在函数内导入：be.model 依赖本模块定义的指标类型
+    from be.model import mongo_monitor
+
+    route = _route()
+    g._metrics_route = route
+    g._metrics_start = time.perf_counter()
+    g._metrics_db = mongo_monitor.begin(route)
+    IN_FLIGHT.inc(route)
+
+
+def _after(response):
+    from be.model import mongo_monitor
+
+    start = g.get("_metrics_start")
+    if start is not None:
+        route = g._metrics_route
+        status = str(response.status_code)
+        REQUEST_DURATION.observe(time.perf_counter() - start, route, request.method, status)
+        if response.status_code >= 400:
+            ERRORS.inc(route, status)
+        db = mongo_monitor.current()
+        if db is not None:
+            DB_ROUND_TRIPS.observe(db.round_trips, route)
+            if mongo_monitor.HEADER_ENABLED:
+                response.headers["X-DB-Round-Trips"] = str(db.round_trips)
+                response.headers["X-DB-Time-Ms"] = "{:.3f}".format(db.seconds * 1000)
+    return response
+
+
+def _teardown(exc: Optional[BaseException]) -> None:
+    from be.model import mongo_monitor
+
+    token = g.pop("_metrics_db", None)
+    if token is not None:
+        mongo_monitor.end(token)
+    route = g.pop("_metrics_route", None)
+    if route is None:
+        return
+    IN_FLIGHT.dec(route)
+    if exc is not None:
+        EXCEPTIONS.inc(route, type(exc).__name__)
+
+
+def init_app(app: Flask) -> None:
+    """Instrument every request handled by `app` (all blueprints)."""
+    app.before_request(_before)
+    app.after_request(_after)
+    app.teardown_request(_teardown)
@@ -6,6 +6,7 @@ from typing import List, Tuple
 from be.model import db_conn
 from be.model import error
 from be.model import mongo_store
+from be.tracing import traced
 from pymongo.errors import PyMongoError
 from typing import Optional, Dict, Any
 
@@ -32,13 +33,18 @@ class Buyer(db_conn.DBConn):
     def _store_exists(self, store_id: str) -> bool:
         return self.col_stores.find_one({"_id": store_id}, {"_id": 1}) is not None
 
-    def _fetch_inventory(self, store_id: str, book_id: str):
-        return self.col_inventory.find_one(
-            {"store_id": store_id, "book_id": book_id}, {"stock_level": 1, "book_info": 1, "price": 1}
+    def _fetch_inventories(self, store_id: str, book_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        if not book_ids:
+            return {}
+        cursor = self.col_inventory.find(
+            {"store_id": store_id, "book_id": {"$in": book_ids}},
+            {"book_id": 1, "stock_level": 1, "book_info": 1, "price": 1},
         )
+        return {doc["book_id"]: doc for doc in cursor}
 
     # SQLite mirror removed
 
+    @traced
     def new_order(self, user_id: str, store_id: str, id_and_count: List[Tuple[str, int]]):
         order_id = ""
         try:
@@ -48,9 +54,11 @@ class Buyer(db_conn.DBConn):
                 return error.error_non_exist_store_id(store_id) + (order_id,)
 
             # Validate items and prepare details
+            # 一次 $in 查询取回所有书的库存，往返次数不随订单书目数增长
+            inventory = self._fetch_inventories(store_id, [book_id for book_id, _ in id_and_count])
             details_docs = []
             for book_id, count in id_and_count:
-                doc = self._fetch_inventory(store_id, book_id)
+                doc = inventory.get(book_id)
                 if doc is None:
                     return error.error_non_exist_book_id(book_id) + (order_id,)
                 stock = int(doc.get("stock_level", 0))
@@ -74,9 +82,8 @@ class Buyer(db_conn.DBConn):
             self.col_orders.insert_one(
                 {"_id": uid, "user_id": user_id, "store_id": store_id, "created_ts": created_ts}
             )
-            for d in details_docs:
-                ddoc = {"order_id": uid} | d
-                self.col_order_details.insert_one(ddoc)
+            if details_docs:
+                self.col_order_details.insert_many([{"order_id": uid} | d for d in details_docs])
             self.col_order_status.insert_one(
                 {"order_id": uid, "status": "created", "ts": created_ts, "user_id": user_id, "store_id": store_id}
             )
@@ -113,6 +120,7 @@ class Buyer(db_conn.DBConn):
             return True
         return False
 
+    @traced
     def payment(self, user_id: str, password: str, order_id: str):
         try:
             # Validate order owner
@@ -200,6 +208,7 @@ class Buyer(db_conn.DBConn):
             return 530, f"{e}"
         return 200, "ok"
 
+    @traced
     def add_funds(self, user_id, password, add_value):
         try:
             row = self.col_users.find_one({"_id": user_id}, {"password": 1})
@@ -219,6 +228,7 @@ class Buyer(db_conn.DBConn):
 
     # SQLite helpers removed
 
+    @traced
     def receive_books(self, user_id: str, order_id: str):
         try:
             # Mongo-first: use order_status in MongoDB as source of truth
@@ -273,6 +283,7 @@ class Buyer(db_conn.DBConn):
             return 530, f"{e}"
         return 200, "ok"
 
+    @traced
     def cancel_order(self, user_id: str, order_id: str):
         try:
             # Mongo-only logic
@@ -307,6 +318,7 @@ class Buyer(db_conn.DBConn):
         return 200, "ok"
 
     # -------- history / query --------
+    @traced
     def list_orders(
         self,
         user_id: str,
@@ -0,0 +1,188 @@
+"""MongoDB command monitoring and per-request round-trip accounting.
+
+MONITOR is a pymongo CommandListener passed to the MongoClient built by
+mongo_store._get_client. For every command it records the name, the
+collection, the server-reported duration and the documents returned or
+affected:
+
+- Globally, in the bookstore_mongo_* metrics on /metrics.
+- On the RequestStats of the current request, if one is being tracked.
+  be/metrics.py starts tracking in its before_request hook. It reports the
+  count and time as X-DB-Round-Trips / X-DB-Time-Ms response headers and
+  in the bookstore_http_db_round_trips histogram.
+- As a "mongo.<command>" child span of the current trace span, if the
+  request is sampled for tracing (see be/tracing.py).
+
+Sync pymongo calls listeners in the thread that runs the command, so a
+ContextVar is enough to attribute a command to its request. Work done in
+other threads (e.g. background index builds) is only counted globally.
+
+    with mongo_monitor.track() as stats:
+        Buyer().new_order(user_id, store_id, items)
+    stats.round_trips, stats.commands
+"""
+import contextlib
+import contextvars
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pymongo import monitoring
+
+from be import metrics
+from be import tracing
+from be.model import slow_ops
+
+# 每个请求最多保留的命令明细条数；计数与耗时不受此限制
+MAX_COMMANDS = 200
+
+# 设为 0 时不在响应中附带 X-DB-* 头
+HEADER_ENABLED = os.getenv("BE_DB_STATS_HEADER", "1") != "0"
+
+COMMAND_DURATION = metrics.Histogram(
+    "bookstore_mongo_command_duration_seconds",
+    "Server-reported duration of MongoDB commands, by command and collection.",
+    ("command", "collection"),
+)
+COMMAND_DOCUMENTS = metrics.Counter(
+    "bookstore_mongo_command_documents_total",
+    "Documents returned or affected by MongoDB commands, by command and collection.",
+    ("command", "collection"),
+)
+COMMAND_FAILURES = metrics.Counter(
+    "bookstore_mongo_command_failures_total",
+    "MongoDB commands that failed, by command and collection.",
+    ("command", "collection"),
+)
+
+
+class RequestStats:
+    """Commands one request (or one track() block) sent to MongoDB."""
+
+    __slots__ = ("route", "round_trips", "seconds", "failures", "commands")
+
+    def __init__(self, route: Optional[str] = None):
+        self.route = route
+        self.round_trips = 0
+        self.seconds = 0.0
+        self.failures = 0
+        # (command, collection, ms, documents)
+        self.commands: List[Tuple[str, str, float, int]] = []
+
+    def add(self, command: str, collection: str, seconds: float, documents: int, ok: bool) -> None:
+        self.round_trips += 1
+        self.seconds += seconds
+        if not ok:
+            self.failures += 1
+        if len(self.commands) < MAX_COMMANDS:
+            self.commands.append((command, collection, round(seconds * 1000, 3), documents))
+
+    def by_command(self) -> Dict[str, int]:
+        out: Dict[str, int] = {}
+        for command, collection, _, _ in self.commands:
+            key = "{}.{}".format(command, collection) if collection else command
+            out[key] = out.get(key, 0) + 1
+        return out
+
+
+_current: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("mongo_request_stats", default=None)
+
+
+def current() -> Optional[RequestStats]:
+    return _current.get()
+
+
+def begin(route: Optional[str] = None) -> contextvars.Token:
+    """Start attributing commands in this context to a fresh RequestStats."""
+    return _current.set(RequestStats(route))
+
+
+def end(token: contextvars.Token) -> None:
+    _current.reset(token)
+
+
+@contextlib.contextmanager
+def track() -> Iterator[RequestStats]:
+    token = begin()
+    try:
+        yield current()
+    finally:
+        end(token)
+
+
+def _collection(command_name: str, command: Dict[str, Any]) -> str:
+    if command_name == "getMore":
+        target = command.get("collection")
+    else:
+        target = command.get(command_name)
+    return target if isinstance(target, str) else ""
+
+
+def _documents(reply: Dict[str, Any]) -> int:
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or ())
+    if "value" in reply:  # findAndModify
+        return 1 if reply.get("value") is not None else 0
+    n = reply.get("n")
+    return n if isinstance(n, int) else 0
+
+
+class CommandMonitor(monitoring.CommandListener):
+    def __init__(self):
+        # (connection_id, request_id) -> (command, collection, RequestStats, database, 慢查询候选命令, 父 span, 开始时间 ns)
+        self._pending: Dict[Tuple[Any, int], Tuple[str, str, Optional[RequestStats], str, Optional[dict],
+                                                   Optional[tracing.Span], int]] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        name = event.command_name
+        # 只为 find/aggregate 保留命令文档的引用，供慢查询日志提取查询形状
+        watched = event.command if name in slow_ops.WATCHED_COMMANDS and slow_ops.LOG.enabled else None
+        span = tracing.current_span()
+        entry = (name, _collection(name, event.command), current(), event.database_name, watched, span,
+                 time.time_ns() if span is not None else 0)
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = entry
+
+    def _finish(self, event, ok: bool, documents: int) -> None:
+        with self._lock:
+            entry = self._pending.pop((event.connection_id, event.request_id), None)
+        if entry is None:
+            return
+        command, collection, stats, database, watched, span, start_ns = entry
+        seconds = event.duration_micros / 1e6
+        COMMAND_DURATION.observe(seconds, command, collection)
+        if ok:
+            COMMAND_DOCUMENTS.inc(command, collection, amount=documents)
+        else:
+            COMMAND_FAILURES.inc(command, collection)
+        if stats is not None:
+            stats.add(command, collection, seconds, documents, ok)
+        if ok and watched is not None:
+            slow_ops.LOG.observe(database, collection, command, watched, seconds, stats.route if stats else None)
+        if span is not None:
+            tracing.TRACER.record(
+                "mongo." + command,
+                start_ns,
+                event.duration_micros * 1000,
+                attributes={
+                    "db.system": "mongodb",
+                    "db.name": database,
+                    "db.operation": command,
+                    "db.mongodb.collection": collection,
+                    "db.response.documents": documents,
+                },
+                ok=ok,
+                parent=span,
+            )
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._finish(event, True, _documents(event.reply or {}))
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._finish(event, False, 0)
+
+
+MONITOR = CommandMonitor()
@@ -5,6 +5,20 @@ Default connection:
 - URI: env MONGO_URI or 'mongodb://localhost:27017'
 - DB : env MONGO_DB  or 'project1'
 
+Client settings (env; unset ones keep pymongo's defaults, and explicit ones
+override the same option in MONGO_URI):
+- MONGO_MAX_POOL_SIZE / MONGO_MIN_POOL_SIZE   connections per server (default 100 / 0)
+- MONGO_WAIT_QUEUE_TIMEOUT_MS                 max wait for a free pooled connection
+- MONGO_SERVER_SELECTION_TIMEOUT_MS           default 30000
+- MONGO_CONNECT_TIMEOUT_MS / MONGO_SOCKET_TIMEOUT_MS
+- MONGO_COMPRESSORS                           e.g. "zstd,snappy,zlib"; pymongo skips
+                                              (with a warning) ones whose library is missing
+- MONGO_ZLIB_LEVEL                            -1..9
+- MONGO_APP_NAME                              shown in server logs and currentOp, default "bookstore"
+
+The client is created once per process. After a fork, the child creates its
+own client on first use instead of sharing the parent's pooled sockets.
+
 Usage:
     from be.model import mongo_store
     db = mongo_store.get_db()
@@ -13,18 +27,86 @@ Usage:
 from __future__ import annotations
 
 import os
-from functools import lru_cache
-from typing import Optional
+import threading
+from typing import Any, Dict, Optional
 
 from pymongo import MongoClient
 from pymongo.database import Database
 
+from be.model import mongo_monitor
 
-@lru_cache(maxsize=1)
-def _get_client() -> MongoClient:
+# 环境变量 -> MongoClient 参数（整数型）
+_INT_OPTIONS = (
+    ("MONGO_MAX_POOL_SIZE", "maxPoolSize"),
+    ("MONGO_MIN_POOL_SIZE", "minPoolSize"),
+    ("MONGO_WAIT_QUEUE_TIMEOUT_MS", "waitQueueTimeoutMS"),
+    ("MONGO_SERVER_SELECTION_TIMEOUT_MS", "serverSelectionTimeoutMS"),
+    ("MONGO_CONNECT_TIMEOUT_MS", "connectTimeoutMS"),
+    ("MONGO_SOCKET_TIMEOUT_MS", "socketTimeoutMS"),
+    ("MONGO_ZLIB_LEVEL", "zlibCompressionLevel"),
+)
+
+_client: Optional[MongoClient] = None
+_client_pid: Optional[int] = None
+_client_lock = threading.Lock()
+
+
+def client_options() -> Dict[str, Any]:
+    """MongoClient keyword arguments from the environment."""
+    options: Dict[str, Any] = {"appname": os.getenv("MONGO_APP_NAME", "bookstore")}
+    for env, option in _INT_OPTIONS:
+        value = os.getenv(env)
+        if value is None or value == "":
+            continue
+        try:
+            options[option] = int(value)
+        except ValueError:
+            raise ValueError("{} must be an integer, got {!r}".format(env, value)) from None
+    compressors = os.getenv("MONGO_COMPRESSORS")
+    if compressors:
+        options["compressors"] = compressors
+    return options
+
+
+def _create_client() -> MongoClient:
     uri = os.getenv("MONGO_URI", "mongodb://localhost:27017")
-    # MongoClient is thread-safe and designed to be reused
-    return MongoClient(uri)
+    # 命令监听器：记录每条命令并计入当前请求的往返次数（见 mongo_monitor）
+    return MongoClient(uri, event_listeners=[mongo_monitor.MONITOR], **client_options())
+
+
+def _get_client() -> MongoClient:
+    # MongoClient is thread-safe and designed to be reused, but not across fork()
+    global _client, _client_pid
+    pid = os.getpid()
+    client = _client
+    if client is not None and _client_pid == pid:
+        return client
+    with _client_lock:
+        if _client is None or _client_pid != pid:
+            _client = _create_client()
+            _client_pid = pid
+        return _client
+
+
+def reset_client() -> None:
+    """Close the cached client; the next call creates one with the current settings."""
+    global _client, _client_pid
+    with _client_lock:
+        client, _client, _client_pid = _client, None, None
+    if client is not None:
+        client.close()
+
+
+def _after_fork_in_child() -> None:
+    # 子进程不能使用父进程的连接池；锁可能在 fork 时正被其他线程持有，也要重建。
+    # 不调用 close()：那会关闭与父进程共享的套接字
+    global _client, _client_pid, _client_lock
+    _client, _client_pid = None, None
+    _client_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
 
 
 def get_db_name() -> str:
@@ -1,12 +1,34 @@
 import json
 from dataclasses import dataclass
-from typing import Optional, Tuple, List, Dict, Any
+from typing import Optional, Tuple, List, Dict, Any, Iterator
 
 from be.model import db_conn
 from be.model import mongo_store
+from be.tracing import traced
+from be.model import search_query
 from be.model import store_mongo
 from pymongo.errors import OperationFailure
 
+# Result order of every listing path; compound inventory indexes put these keys
+# right after the equality fields (ESR) so Mongo can avoid an in-memory sort.
+SORT_KEYS = [("title", 1), ("book_id", 1)]
+
+# Fields a search result carries. Listing queries project only these so a
+# covering index answers them without reading book_info (base64 pictures etc.).
+LISTING_FIELDS = ("store_id", "book_id", "title", "author", "price", "isbn", "stock_level")
+LISTING_PROJECTION: Dict[str, int] = {"_id": 0, **{f: 1 for f in LISTING_FIELDS}}
+# Adds the JSON blob the in-Python keyword fallback matches against
+FULL_PROJECTION: Dict[str, int] = {**LISTING_PROJECTION, "book_info": 1, "pages": 1, "pub_year": 1}
+# Residual boolean predicates read the pre-computed text_blob, book_info only for legacy rows
+MATCH_PROJECTION: Dict[str, int] = {**FULL_PROJECTION, "text_blob": 1}
+
+
+def _safe_int(v: Any, default: int = 0) -> int:
+    try:
+        return int(v)
+    except Exception:
+        return default
+
 
 @dataclass
 class Filter:
@@ -43,7 +65,7 @@ class Search(db_conn.DBConn):
         self.col_inventory = self.mongo_db["inventory"]
         # Best-effort ensure indexes, including text index if supported
         try:
-            store_mongo.ensure_indexes(self.mongo_db)
+            store_mongo.ensure_indexes_once(self.mongo_db)
         except Exception:
             pass
 
@@ -84,9 +106,12 @@ class Search(db_conn.DBConn):
             if cond:
                 q[field] = cond
 
-    def search(self, keyword: str, filter: Filter) -> Tuple[int, str, List[Dict[str, Any]]]:
-        kw = (keyword or "").strip()
-        # Build base query without keyword so we can try text->regex fallbacks cleanly
+    def _base_query(self, filter: Optional[Filter]) -> Dict[str, Any]:
+        """Translate a Filter into the Mongo query shared by every search path.
+
+        Equality fields (store_id, isbn) come first and range fields follow, which
+        is also the order the compound indexes in store_mongo are shaped around.
+        """
         q_base: Dict[str, Any] = {}
 
         # store_id
@@ -104,21 +129,134 @@ class Search(db_conn.DBConn):
             self._add_range(q_base, "price", filter.price)
             # publish_date in SQL version maps to pub_year here
             self._add_range(q_base, "pub_year", filter.publish_date)
+        return q_base
+
+    def _iter_rows(
+        self, cursor_iter, kw: str, require_kw_match: bool, predicate=None
+    ) -> Iterator[Dict[str, Any]]:
+        for doc in cursor_iter:
+            if predicate is not None and not predicate(doc):
+                continue
+            title = doc.get("title")
+            author = doc.get("author")
+            isbn = doc.get("isbn")
+            # keep pages/pub_year only for potential future filters; not returned
+
+            if require_kw_match and kw:
+                # Fallback keyword match for fields inside JSON
+                try:
+                    bi = json.loads(doc.get("book_info") or "{}")
+                except Exception:
+                    bi = {}
+                # ensure fallback keyword covers publisher/tags/content/book_intro/catalog as well
+                if not self._match_keyword(
+                    {
+                        "title": title,
+                        "author": author,
+                        "publisher": bi.get("publisher"),
+                        "isbn": isbn,
+                        "tags": bi.get("tags"),
+                        "content": bi.get("content"),
+                        "book_intro": bi.get("book_intro"),
+                        "catalog": bi.get("catalog"),
+                    },
+                    kw,
+                ):
+                    continue
+
+            yield {
+                "store_id": doc.get("store_id"),
+                "book_id": doc.get("book_id"),
+                "title": title,
+                "author": author,
+                "price": doc.get("price"),
+                "isbn": isbn,
+                "stock_level": _safe_int(doc.get("stock_level", 0), 0),
+            }
+
+    def _iter_boolean(
+        self, q_base: Dict[str, Any], plan: search_query.QueryPlan, batch_size: int = 0
+    ) -> Iterator[Dict[str, Any]]:
+        """Narrow with the plan's indexed conditions, then apply it as a residual predicate."""
+        if plan.empty:
+            return
+        q = dict(q_base)
+        for col, val in plan.equals.items():
+            if col in q and q[col] != val:
+                return
+            q[col] = val
+
+        def _cursor(query):
+            cursor = self.col_inventory.find(query, projection=MATCH_PROJECTION).sort(SORT_KEYS)
+            return cursor.batch_size(batch_size) if batch_size else cursor
+
+        if plan.text:
+            q_text = dict(q)
+            q_text["$text"] = {"$search": plan.text}
+            started = False
+            try:
+                for row in self._iter_rows(_cursor(q_text), "", False, plan.matches):
+                    started = True
+                    yield row
+                return
+            except OperationFailure:
+                # no text index: equality narrowing plus the residual still answer correctly
+                if started:
+                    raise
+        yield from self._iter_rows(_cursor(q), "", False, plan.matches)
+
+    def iter_search(self, keyword: str, filter: Filter, batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """Yield search rows straight off the Mongo cursor, in SORT_KEYS order.
+
+        Same matching rules as search(), but nothing is buffered beyond one cursor
+        batch, so exporting a whole store keeps memory flat. If $text fails before
+        the first row, falls back to the base query plus the Python keyword match.
+        """
+        kw = (keyword or "").strip()
+        q_base = self._base_query(filter)
+        batch_size = max(1, int(batch_size))
+        plan = search_query.compile_query(kw)
+        if plan is not None:
+            yield from self._iter_boolean(q_base, plan, batch_size)
+            return
+        if not kw:
+            cursor = self.col_inventory.find(q_base, projection=LISTING_PROJECTION).sort(SORT_KEYS)
+            yield from self._iter_rows(cursor.batch_size(batch_size), kw, False)
+            return
+
+        q_text = dict(q_base)
+        q_text["$text"] = {"$search": kw}
+        started = False
+        try:
+            cursor = self.col_inventory.find(q_text, projection=LISTING_PROJECTION).sort(SORT_KEYS)
+            for row in self._iter_rows(cursor.batch_size(batch_size), kw, False):
+                started = True
+                yield row
+            return
+        except OperationFailure:
+            if started:
+                raise
+        cursor = self.col_inventory.find(q_base, projection=FULL_PROJECTION).sort(SORT_KEYS)
+        yield from self._iter_rows(cursor.batch_size(batch_size), kw, True)
+
+    @traced
+    def search(self, keyword: str, filter: Filter) -> Tuple[int, str, List[Dict[str, Any]]]:
+        kw = (keyword or "").strip()
+        # Build base query without keyword so we can try text->regex fallbacks cleanly
+        q_base = self._base_query(filter)
 
-        # Projection keeps book_info for fallback keyword match
-        projection = {
-            "_id": 0,
-            "store_id": 1,
-            "book_id": 1,
-            "book_info": 1,
-            "stock_level": 1,
-            "title": 1,
-            "author": 1,
-            "isbn": 1,
-            "price": 1,
-            "pages": 1,
-            "pub_year": 1,
-        }
+        # AND/OR/NOT, phrases and field terms go through the boolean planner
+        try:
+            plan = search_query.compile_query(kw)
+            if plan is not None:
+                return 200, "ok", list(self._iter_boolean(q_base, plan))
+        except Exception as e:
+            return 528, str(e), []
+
+        # Full projection keeps book_info for the Python keyword fallback only;
+        # listing paths (no keyword, or $text) read LISTING_PROJECTION, which the
+        # inv_store_listing index can serve without fetching documents.
+        projection = FULL_PROJECTION
 
         # Helpers
         def _regex_query() -> Dict[str, Any]:
@@ -134,59 +272,8 @@ class Search(db_conn.DBConn):
             q["$text"] = {"$search": kw}
             return q
 
-        def _safe_int(v: Any, default: int = 0) -> int:
-            try:
-                return int(v)
-            except Exception:
-                return default
-
         def _collect_from_cursor(cursor_iter, require_kw_match: bool) -> List[Dict[str, Any]]:
-            results: List[Dict[str, Any]] = []
-            for doc in cursor_iter:
-                store_id = doc.get("store_id")
-                book_id = doc.get("book_id")
-                stock_level = _safe_int(doc.get("stock_level", 0), 0)
-                title = doc.get("title")
-                author = doc.get("author")
-                isbn = doc.get("isbn")
-                price = doc.get("price")
-                # keep pages/pub_year only for potential future filters; not returned
-
-                # Fallback keyword match for fields inside JSON
-                try:
-                    bi = json.loads(doc.get("book_info") or "{}")
-                except Exception:
-                    bi = {}
-
-                if require_kw_match and kw:
-                    # ensure fallback keyword covers publisher/tags/content/book_intro/catalog as well
-                    if not self._match_keyword(
-                        {
-                            "title": title,
-                            "author": author,
-                            "publisher": bi.get("publisher"),
-                            "isbn": isbn,
-                            "tags": bi.get("tags"),
-                            "content": bi.get("content"),
-                            "book_intro": bi.get("book_intro"),
-                            "catalog": bi.get("catalog"),
-                        },
-                        kw,
-                    ):
-                        continue
-
-                results.append(
-                    {
-                        "store_id": store_id,
-                        "book_id": book_id,
-                        "title": title,
-                        "author": author,
-                        "price": price,
-                        "isbn": isbn,
-                        "stock_level": stock_level,
-                    }
-                )
-            return results
+            return list(self._iter_rows(cursor_iter, kw, require_kw_match))
 
         # Main query path with robust fallbacks
         try:
@@ -195,18 +282,12 @@ class Search(db_conn.DBConn):
             if kw:
                 try:
                     # Try text search first; if any OperationFailure occurs, fallback to regex unconditionally
-                    cursor = self.col_inventory.find(_text_query(), projection=projection).sort(
-                        [("title", 1), ("book_id", 1)]
-                    )
+                    cursor = self.col_inventory.find(_text_query(), projection=LISTING_PROJECTION).sort(SORT_KEYS)
                     used_text = True
                 except OperationFailure:
-                    cursor = self.col_inventory.find(_regex_query(), projection=projection).sort(
-                        [("title", 1), ("book_id", 1)]
-                    )
+                    cursor = self.col_inventory.find(_regex_query(), projection=projection).sort(SORT_KEYS)
             if cursor is None:
-                cursor = self.col_inventory.find(_regex_query(), projection=projection).sort(
-                    [("title", 1), ("book_id", 1)]
-                )
+                cursor = self.col_inventory.find(_regex_query(), projection=LISTING_PROJECTION).sort(SORT_KEYS)
             # If we used text search, we trust Mongo's match and do not require extra Python kw check.
             results = _collect_from_cursor(cursor, require_kw_match=not used_text)
             return 200, "ok", results
@@ -0,0 +1,334 @@
+"""Boolean keyword queries for Search.
+
+Syntax (operators are upper-case, AND is implicit between terms):
+
+    三体 -漫画                    term AND NOT term
+    "三体 黑暗森林" OR 球状闪电     quoted phrase OR term
+    author:刘慈欣 (科幻 OR 小说)    field equality, grouping
+    NOT isbn:9787536692930
+
+compile_query() narrows with the most selective indexed form it can express:
+field terms (isbn/author/title/store) become equality conditions on inventory
+columns, the positive terms of the top-level AND become $text phrases, which
+MongoDB intersects, and negated terms become $text exclusions. Without positive
+terms, a top-level OR becomes an implicit-OR $text search over one necessary
+word per branch. Queries with nothing positive to narrow on (only NOT terms)
+scan the base filter range.
+
+Matching semantics follow the legacy keyword path. While the text index is
+available, free terms match whole whitespace-separated tokens (the index uses
+default_language "none"), so 三体 finds "三体 全集" but not "三体全集". When
+$text is unavailable the base range is scanned and terms match substrings. In
+both cases the whole expression is re-checked on every candidate with substring
+matching; that residual can only remove documents, so a NOT term excludes any
+document containing its text.
+
+Parsing is bounded: at most MAX_TOKENS tokens are read and parentheses nest at
+most MAX_DEPTH levels, deeper ones are ignored.
+
+A keyword without any operator is not compiled (compile_query returns None) and
+keeps the legacy single-string behaviour.
+"""
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+# query field -> inventory column matched by equality
+FIELD_COLUMNS = {"isbn": "isbn", "author": "author", "title": "title", "store": "store_id"}
+
+MAX_TOKENS = 64
+MAX_DEPTH = 8
+
+_TOKEN_RE = re.compile(r'\s*(?:(\()|(\))|"([^"]*)"?|([^\s()"]+))')
+_OPERATOR_RE = re.compile(r'["()]|(?:^|\s)(?:-\S|OR\b|AND\b|NOT\b|\||&&)|(?:^|\s)(?:%s):\S' % "|".join(FIELD_COLUMNS))
+
+
+@dataclass
+class Term:
+    text: str
+    field: Optional[str] = None
+    phrase: bool = False
+
+
+@dataclass
+class Not:
+    child: "Node"
+
+
+@dataclass
+class And:
+    children: List["Node"]
+
+
+@dataclass
+class Or:
+    children: List["Node"]
+
+
+Node = Union[Term, Not, And, Or]
+
+
+def tokenize(query: str) -> List[Tuple[str, str]]:
+    """Split into (kind, value) with kinds LP, RP, NOT, OR, AND, PHRASE, WORD, FIELD.
+
+    Stops after MAX_TOKENS tokens.
+    """
+    tokens: List[Tuple[str, str]] = []
+    pos = 0
+    query = query or ""
+    while pos < len(query) and len(tokens) < MAX_TOKENS:
+        m = _TOKEN_RE.match(query, pos)
+        if not m or m.end() == pos:
+            break
+        pos = m.end()
+        lp, rp, phrase, word = m.groups()
+        if lp:
+            tokens.append(("LP", lp))
+        elif rp:
+            tokens.append(("RP", rp))
+        elif phrase is not None:
+            # field:"quoted value"
+            if tokens and tokens[-1][0] == "FIELD" and tokens[-1][1].endswith(":"):
+                tokens[-1] = ("FIELD", tokens[-1][1] + phrase)
+            elif phrase.strip():
+                tokens.append(("PHRASE", phrase.strip()))
+        elif word:
+            if word in ("OR", "|"):
+                tokens.append(("OR", word))
+                continue
+            if word in ("AND", "&&"):
+                tokens.append(("AND", word))
+                continue
+            if word in ("NOT", "-"):
+                tokens.append(("NOT", word))
+                continue
+            # -term, --term ...: one NOT per leading '-'
+            while word.startswith("-") and len(tokens) < MAX_TOKENS:
+                tokens.append(("NOT", "-"))
+                word = word[1:]
+            if not word or len(tokens) >= MAX_TOKENS:
+                continue
+            if ":" in word and word.split(":", 1)[0].lower() in FIELD_COLUMNS:
+                tokens.append(("FIELD", word))
+            else:
+                tokens.append(("WORD", word))
+    return tokens[:MAX_TOKENS]
+
+
+def _and(items: List[Node]) -> Node:
+    # flatten nested ANDs so every conjunct is visible to compile_query
+    flat: List[Node] = []
+    for n in items:
+        flat.extend(n.children if isinstance(n, And) else [n])
+    return flat[0] if len(flat) == 1 else And(flat)
+
+
+def _or(items: List[Node]) -> Node:
+    flat: List[Node] = []
+    for n in items:
+        flat.extend(n.children if isinstance(n, Or) else [n])
+    return flat[0] if len(flat) == 1 else Or(flat)
+
+
+class _Parser:
+    def __init__(self, tokens: List[Tuple[str, str]]):
+        self.tokens = tokens
+        self.i = 0
+        self.depth = 0
+
+    def peek(self) -> Optional[str]:
+        return self.tokens[self.i][0] if self.i < len(self.tokens) else None
+
+    def take(self) -> Tuple[str, str]:
+        tok = self.tokens[self.i]
+        self.i += 1
+        return tok
+
+    def parse_or(self) -> Optional[Node]:
+        items = [self.parse_and()]
+        while self.peek() == "OR":
+            self.take()
+            items.append(self.parse_and())
+        items = [n for n in items if n is not None]
+        if not items:
+            return None
+        return _or(items)
+
+    def parse_and(self) -> Optional[Node]:
+        items: List[Node] = []
+        while self.peek() not in (None, "RP", "OR"):
+            if self.peek() == "AND":
+                self.take()
+                continue
+            n = self.parse_unary()
+            if n is not None:
+                items.append(n)
+        if not items:
+            return None
+        return _and(items)
+
+    def parse_unary(self) -> Optional[Node]:
+        # NOT chains are counted, not recursed into: NOT NOT x is x
+        negate = False
+        while self.peek() == "NOT":
+            self.take()
+            negate = not negate
+        child = self.parse_atom()
+        if child is None or not negate:
+            return child
+        return child.child if isinstance(child, Not) else Not(child)
+
+    def parse_atom(self) -> Optional[Node]:
+        if self.peek() is None:
+            return None
+        kind, value = self.take()
+        if kind == "LP":
+            if self.depth >= MAX_DEPTH:
+                # too deep: drop this '(' and read on at the current level
+                return None
+            self.depth += 1
+            try:
+                n = self.parse_or()
+            finally:
+                self.depth -= 1
+            if self.peek() == "RP":
+                self.take()
+            return n
+        if kind == "PHRASE":
+            return Term(value, phrase=True)
+        if kind == "FIELD":
+            name, _, val = value.partition(":")
+            return Term(val, field=name.lower()) if val else None
+        if kind == "WORD":
+            return Term(value)
+        # stray ')' or operator in operand position
+        return None
+
+
+def parse(query: str) -> Optional[Node]:
+    """Parse a boolean keyword query; malformed input degrades, it never raises."""
+    p = _Parser(tokenize(query))
+    node = p.parse_or()
+    while p.peek() is not None:
+        # skip an unmatched ')' and keep parsing the rest as an implicit AND
+        p.take()
+        rest = p.parse_or()
+        if rest is not None:
+            node = rest if node is None else _and([node, rest])
+    return node
+
+
+def has_operators(keyword: str) -> bool:
+    return bool(_OPERATOR_RE.search(keyword or ""))
+
+
+def doc_text(doc: Dict[str, Any]) -> str:
+    """Lower-cased text a residual term is matched against (same fields as the text index)."""
+    parts = [doc.get("title"), doc.get("author"), doc.get("isbn")]
+    if doc.get("text_blob"):
+        parts.append(doc.get("text_blob"))
+    else:
+        try:
+            bi = json.loads(doc.get("book_info") or "{}")
+        except Exception:
+            bi = {}
+        if isinstance(bi, dict):
+            parts += [bi.get(k) for k in ("publisher", "tags", "content", "book_intro", "catalog")]
+    return "\n".join(str(x) for x in parts if x).lower()
+
+
+def evaluate(node: Node, doc: Dict[str, Any], text: Optional[str] = None) -> bool:
+    if text is None:
+        text = doc_text(doc)
+    if isinstance(node, Term):
+        if node.field:
+            return str(doc.get(FIELD_COLUMNS[node.field]) or "") == node.text
+        return node.text.lower() in text
+    if isinstance(node, Not):
+        return not evaluate(node.child, doc, text)
+    if isinstance(node, And):
+        return all(evaluate(c, doc, text) for c in node.children)
+    return any(evaluate(c, doc, text) for c in node.children)
+
+
+def _quote(s: str) -> str:
+    return '"%s"' % s.replace('"', " ")
+
+
+def _exclude(s: str) -> str:
+    return "-" + (_quote(s) if len(s.split()) > 1 else s)
+
+
+def _necessary_words(node: Node) -> Optional[List[str]]:
+    """Words at least one of which every match contains; None if there are none."""
+    if isinstance(node, Term):
+        return None if node.field else node.text.split()
+    if isinstance(node, And):
+        for c in node.children:
+            words = _necessary_words(c)
+            if words:
+                return words
+        return None
+    if isinstance(node, Or):
+        out: List[str] = []
+        for c in node.children:
+            words = _necessary_words(c)
+            if not words:
+                return None
+            out += [w for w in words if w not in out]
+        return out
+    return None
+
+
+@dataclass
+class QueryPlan:
+    node: Node
+    # equality conditions on inventory columns
+    equals: Dict[str, str] = field(default_factory=dict)
+    # $text search string, None when nothing positive can be pushed down
+    text: Optional[str] = None
+    # contradictory equalities (isbn:a isbn:b): nothing can match
+    empty: bool = False
+
+    def matches(self, doc: Dict[str, Any]) -> bool:
+        return evaluate(self.node, doc)
+
+
+def compile_query(keyword: str) -> Optional[QueryPlan]:
+    if not has_operators(keyword):
+        return None
+    node = parse(keyword)
+    if node is None:
+        return None
+    plan = QueryPlan(node)
+    conjuncts = node.children if isinstance(node, And) else [node]
+    positives: List[str] = []
+    negatives: List[str] = []
+    ors: List[Or] = []
+    for c in conjuncts:
+        if isinstance(c, Term) and c.field:
+            col = FIELD_COLUMNS[c.field]
+            if plan.equals.get(col, c.text) != c.text:
+                plan.empty = True
+            plan.equals[col] = c.text
+        elif isinstance(c, Term):
+            positives.append(c.text)
+        elif isinstance(c, Not) and isinstance(c.child, Term) and not c.child.field:
+            negatives.append(c.child.text)
+        elif isinstance(c, Or):
+            ors.append(c)
+
+    excluded = [_exclude(n) for n in negatives]
+    if positives:
+        # phrases in a $text search are ANDed: an index intersection of every term
+        plan.text = " ".join([_quote(p) for p in positives] + excluded)
+    else:
+        # bare words in a $text search are ORed; one necessary word per branch
+        # gives a superset of the OR, which the residual check then trims
+        for o in ors:
+            words = _necessary_words(o)
+            if words:
+                plan.text = " ".join(words + excluded)
+                break
+    return plan
@@ -1,11 +1,91 @@
 import json
 import time
-from typing import Tuple
+from typing import List, Tuple
 
 from be.model import error
 from be.model import db_conn
 from be.model import mongo_store
-from pymongo.errors import DuplicateKeyError, PyMongoError
+from be.tracing import traced
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
+
+
+def build_inventory_doc(store_id: str, book_id: str, book_json_str, stock_level) -> dict:
+    """The inventory document add_book stores for one book.
+
+    Also used by bulk loaders that write fixtures without going through HTTP.
+    """
+    # Normalize types
+    try:
+        stock_level = int(stock_level)
+    except Exception:
+        stock_level = 0
+
+    # Load info for redundancy fields
+    try:
+        if isinstance(book_json_str, dict):
+            bi = book_json_str
+        elif isinstance(book_json_str, str):
+            bi = json.loads(book_json_str) if book_json_str else {}
+        else:
+            bi = {}
+    except Exception:
+        bi = {}
+
+    title = bi.get("title")
+    author = bi.get("author")
+    isbn = bi.get("isbn")
+
+    def _to_int(v):
+        try:
+            if v is None:
+                return None
+            return int(v)
+        except Exception:
+            return None
+
+    pub_year = _to_int(bi.get("pub_year"))
+    pages = _to_int(bi.get("pages"))
+    price = _to_int(bi.get("price"))
+
+    # Build a text blob for full-text index (tags/content/book_intro/catalog/publisher etc.)
+    try:
+        tags_val = bi.get("tags")
+        if isinstance(tags_val, list):
+            tags_text = " ".join(str(x) for x in tags_val)
+        else:
+            tags_text = str(tags_val or "")
+        content_text = " ".join(
+            str(x)
+            for x in [
+                bi.get("content"),
+                bi.get("book_intro"),
+                bi.get("catalog"),
+                bi.get("publisher"),
+                bi.get("original_title"),
+                bi.get("translator"),
+            ]
+            if x
+        )
+    except Exception:
+        tags_text = ""
+        content_text = ""
+    text_blob = " ".join(
+        str(x) for x in [title, author, isbn, tags_text, content_text] if x
+    )
+
+    return {
+        "store_id": store_id,
+        "book_id": book_id,
+        "book_info": book_json_str,
+        "stock_level": stock_level,
+        "title": title,
+        "author": author,
+        "isbn": isbn,
+        "pub_year": pub_year,
+        "pages": pages,
+        "price": price,
+        "text_blob": text_blob,
+    }
 
 
 class Seller(db_conn.DBConn):
@@ -36,6 +116,7 @@ class Seller(db_conn.DBConn):
         )
 
     # -------- APIs --------
+    @traced
     def create_store(self, user_id: str, store_id: str) -> Tuple[int, str]:
         try:
             if not self._user_exists(user_id):
@@ -54,6 +135,7 @@ class Seller(db_conn.DBConn):
             return 530, f"{e}"
         return 200, "ok"
 
+    @traced
     def add_book(
         self,
         user_id: str,
@@ -63,64 +145,7 @@ class Seller(db_conn.DBConn):
         stock_level: int,
     ) -> Tuple[int, str]:
         try:
-            # Normalize types
-            try:
-                stock_level = int(stock_level)
-            except Exception:
-                stock_level = 0
-
-            # Load info for redundancy fields
-            try:
-                if isinstance(book_json_str, dict):
-                    bi = book_json_str
-                elif isinstance(book_json_str, str):
-                    bi = json.loads(book_json_str) if book_json_str else {}
-                else:
-                    bi = {}
-            except Exception:
-                bi = {}
-
-            title = bi.get("title")
-            author = bi.get("author")
-            isbn = bi.get("isbn")
-
-            def _to_int(v):
-                try:
-                    if v is None:
-                        return None
-                    return int(v)
-                except Exception:
-                    return None
-
-            pub_year = _to_int(bi.get("pub_year"))
-            pages = _to_int(bi.get("pages"))
-            price = _to_int(bi.get("price"))
-
-            # Build a text blob for full-text index (tags/content/book_intro/catalog/publisher etc.)
-            try:
-                tags_val = bi.get("tags")
-                if isinstance(tags_val, list):
-                    tags_text = " ".join(str(x) for x in tags_val)
-                else:
-                    tags_text = str(tags_val or "")
-                content_text = " ".join(
-                    str(x)
-                    for x in [
-                        bi.get("content"),
-                        bi.get("book_intro"),
-                        bi.get("catalog"),
-                        bi.get("publisher"),
-                        bi.get("original_title"),
-                        bi.get("translator"),
-                    ]
-                    if x
-                )
-            except Exception:
-                tags_text = ""
-                content_text = ""
-            text_blob = " ".join(
-                str(x) for x in [title, author, isbn, tags_text, content_text] if x
-            )
+            doc = build_inventory_doc(store_id, book_id, book_json_str, stock_level)
 
             if not self._user_exists(user_id):
                 return error.error_non_exist_user_id(user_id)
@@ -130,21 +155,7 @@ class Seller(db_conn.DBConn):
                 return error.error_exist_book_id(book_id)
 
             # Primary write: Mongo inventory
-            self.col_inventory.insert_one(
-                {
-                    "store_id": store_id,
-                    "book_id": book_id,
-                    "book_info": book_json_str,
-                    "stock_level": stock_level,
-                    "title": title,
-                    "author": author,
-                    "isbn": isbn,
-                    "pub_year": pub_year,
-                    "pages": pages,
-                    "price": price,
-                    "text_blob": text_blob,
-                }
-            )
+            self.col_inventory.insert_one(doc)
 
             # SQLite mirroring removed
         except DuplicateKeyError:
@@ -155,6 +166,43 @@ class Seller(db_conn.DBConn):
             return 530, f"{e}"
         return 200, "ok"
 
+    @traced
+    def add_books(
+        self,
+        user_id: str,
+        store_id: str,
+        books: List[Tuple[str, str]],
+        stock_level: int,
+    ) -> Tuple[int, str]:
+        """Insert many (book_id, book_json_str) pairs with one insert_many.
+
+        Same documents as add_book; used to load bench fixtures. Books that
+        already exist are skipped and the first such id is reported with 516.
+        """
+        try:
+            if not self._user_exists(user_id):
+                return error.error_non_exist_user_id(user_id)
+            if not self._store_exists(store_id):
+                return error.error_non_exist_store_id(store_id)
+            docs = [
+                build_inventory_doc(store_id, book_id, book_json_str, stock_level)
+                for book_id, book_json_str in books
+            ]
+            if docs:
+                # ordered=False：遇到重复的书继续插入其余文档
+                self.col_inventory.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            dups = [w for w in e.details.get("writeErrors", []) if w.get("code") == 11000]
+            if dups and len(dups) == len(e.details.get("writeErrors", [])):
+                return error.error_exist_book_id(docs[dups[0]["index"]]["book_id"])
+            return 528, f"{e}"
+        except PyMongoError as e:
+            return 528, f"{e}"
+        except BaseException as e:
+            return 530, f"{e}"
+        return 200, "ok"
+
+    @traced
     def add_stock_level(
         self, user_id: str, store_id: str, book_id: str, add_stock_level: int
     ) -> Tuple[int, str]:
@@ -186,6 +234,7 @@ class Seller(db_conn.DBConn):
             return 530, f"{e}"
         return 200, "ok"
 
+    @traced
     def send_books(self, user_id: str, order_id: str) -> Tuple[int, str]:
         """Ship books for a paid order (Mongo-only)."""
         try:
@@ -0,0 +1,272 @@
+"""Slow MongoDB operation log with sampled explain plans.
+
+mongo_monitor hands every successful find / aggregate to LOG.observe(). When a
+command takes at least THRESHOLD_MS, one JSON line is appended to a rotating
+log file. The line carries:
+
+- database, collection, command and duration;
+- the URL rule of the request that sent it, if any, which tells
+  Search.search, Buyer.list_orders and the status lookups apart;
+- the query shape: filter, pipeline and sort with every literal replaced by
+  "?", so user ids, order ids and keywords never reach the log, and equal
+  shapes group together;
+- for a sample of the slow commands, a summary of the command re-run with
+  explain("executionStats"): winning plan stages, indexes used, keys and
+  docs examined, whether it scanned the collection or sorted in memory.
+
+Explains and file writes run on one background thread behind a bounded
+queue. A request thread only builds the shape and enqueues it. When the
+queue is full the entry is dropped and counted, so a storm of slow queries
+cannot back up into request latency. Each shape is explained at most once
+per EXPLAIN_INTERVAL_S, because explain re-runs the query.
+
+Configuration comes from the environment and is read at import.
+LOG.threshold_ms and LOG.explain_sample can also be changed at runtime:
+
+    BE_SLOW_OP_MS              threshold in ms, default 100; negative disables
+    BE_SLOW_OP_EXPLAIN_SAMPLE  share of slow commands explained, default 1.0
+    BE_SLOW_OP_LOG             log path, default <bookstore>/slow_ops.log
+"""
+import hashlib
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from be import metrics
+
+THRESHOLD_MS = float(os.getenv("BE_SLOW_OP_MS", "100"))
+EXPLAIN_SAMPLE = float(os.getenv("BE_SLOW_OP_EXPLAIN_SAMPLE", "1.0"))
+EXPLAIN_INTERVAL_S = 60.0
+LOG_PATH = os.getenv(
+    "BE_SLOW_OP_LOG", os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "slow_ops.log")
+)
+MAX_BYTES = 10 * 1024 * 1024
+BACKUP_COUNT = 5
+
+WATCHED_COMMANDS = ("find", "aggregate")
+
+# 会话、事务与集群元数据，不属于查询本身；explain 时也要去掉
+_COMMAND_META = ("lsid", "txnNumber", "autocommit", "startTransaction", "$db", "$clusterTime", "$readPreference")
+
+SLOW_OPS = metrics.Counter(
+    "bookstore_mongo_slow_ops_total", "find/aggregate commands over the slow-op threshold.", ("command", "collection")
+)
+DROPPED = metrics.Counter("bookstore_mongo_slow_ops_dropped_total", "Slow-op entries dropped because the log queue was full.")
+
+
+def _redact(value: Any) -> Any:
+    """Keep operators and field names, replace every literal with "?"."""
+    if isinstance(value, dict):
+        return {k: _redact(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        # $in / $nin 等：列表长度也是字面量，只保留一个占位
+        return [_redact(value[0])] if value else []
+    return "?"
+
+
+def _stage_shape(stage: Dict[str, Any]) -> Dict[str, Any]:
+    out = {}
+    for op, arg in stage.items():
+        if op in ("$sort", "$project", "$group", "$count", "$unwind"):
+            # 字段引用与排序方向，不含用户数据
+            out[op] = arg
+        else:
+            out[op] = _redact(arg)
+    return out
+
+
+def query_shape(command_name: str, command: Dict[str, Any]) -> Dict[str, Any]:
+    if command_name == "aggregate":
+        return {"pipeline": [_stage_shape(s) for s in command.get("pipeline") or []]}
+    shape: Dict[str, Any] = {"filter": _redact(command.get("filter") or {})}
+    if command.get("sort"):
+        shape["sort"] = command["sort"]
+    if command.get("projection"):
+        shape["projection"] = sorted(command["projection"])
+    for key in ("limit", "skip"):
+        if key in command:
+            shape[key] = "?"
+    return shape
+
+
+def shape_id(collection: str, command_name: str, shape: Dict[str, Any]) -> str:
+    text = json.dumps([collection, command_name, shape], sort_keys=True, default=str)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+
+
+def _walk_plan(node: Any) -> Iterable[Dict[str, Any]]:
+    # Works for classic plans (inputStage/inputStages) and SBE plans nested under queryPlan
+    if isinstance(node, dict):
+        if "stage" in node:
+            yield node
+        for key in ("queryPlan", "inputStage", "outerStage", "innerStage"):
+            if key in node:
+                yield from _walk_plan(node[key])
+        for child in node.get("inputStages", []) or []:
+            yield from _walk_plan(child)
+
+
+def summarize_explain(explain: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce an explain() document to plan stages and examined counts."""
+    if "queryPlanner" not in explain and explain.get("stages"):
+        # 未下推的聚合：计划在第一个 $cursor 阶段里
+        explain = explain["stages"][0].get("$cursor") or {}
+    winning = (explain.get("queryPlanner") or {}).get("winningPlan") or {}
+    stages = list(_walk_plan(winning))
+    stats = explain.get("executionStats") or {}
+    stage_names = [str(s.get("stage", "")).upper() for s in stages]
+    docs_examined = int(stats.get("totalDocsExamined", 0))
+    return {
+        "keys_examined": int(stats.get("totalKeysExamined", 0)),
+        "docs_examined": docs_examined,
+        "n_returned": int(stats.get("nReturned", 0)),
+        "millis": int(stats.get("executionTimeMillis", 0)),
+        "stages": stage_names,
+        "collscan": "COLLSCAN" in stage_names,
+        "in_memory_sort": "SORT" in stage_names,
+        "covered": docs_examined == 0 and not {"FETCH", "COLLSCAN"} & set(stage_names),
+        "indexes": [s["indexName"] for s in stages if s.get("indexName")],
+    }
+
+
+def explain_command(command_name: str, command: Dict[str, Any]) -> Dict[str, Any]:
+    """The explain command for a find/aggregate as sent, minus session metadata."""
+    inner = {k: v for k, v in command.items() if k not in _COMMAND_META}
+    return {"explain": inner, "verbosity": "executionStats"}
+
+
+def _run_explain(database: str, command_name: str, command: Dict[str, Any]) -> Dict[str, Any]:
+    from be.model import mongo_store
+
+    return mongo_store._get_client()[database].command(explain_command(command_name, command))
+
+
+class SlowOpLog:
+    def __init__(
+        self,
+        path: str = None,
+        threshold_ms: float = None,
+        explain_sample: float = None,
+        explain: Optional[Callable[[str, str, Dict[str, Any]], Dict[str, Any]]] = None,
+        queue_size: int = 1000,
+    ):
+        self.path = path or LOG_PATH
+        self.threshold_ms = THRESHOLD_MS if threshold_ms is None else threshold_ms
+        self.explain_sample = EXPLAIN_SAMPLE if explain_sample is None else explain_sample
+        self.explain = explain or _run_explain
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._explained_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._logger: Optional[logging.Logger] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_ms >= 0
+
+    def _want_explain(self, sid: str) -> bool:
+        if self.explain_sample <= 0 or random.random() >= self.explain_sample:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            last = self._explained_at.get(sid)
+            if last is not None and now - last < EXPLAIN_INTERVAL_S:
+                return False
+            self._explained_at[sid] = now
+        return True
+
+    def observe(
+        self, database: str, collection: str, command_name: str, command: Dict[str, Any], seconds: float,
+        route: Optional[str] = None,
+    ) -> bool:
+        """Log the command if it is slow; returns whether it was."""
+        if not self.enabled or command_name not in WATCHED_COMMANDS or seconds * 1000 < self.threshold_ms:
+            return False
+        SLOW_OPS.inc(command_name, collection)
+        shape = query_shape(command_name, command)
+        sid = shape_id(collection, command_name, shape)
+        entry = {
+            "ts": round(time.time(), 3),
+            "database": database,
+            "collection": collection,
+            "command": command_name,
+            "duration_ms": round(seconds * 1000, 3),
+            "threshold_ms": self.threshold_ms,
+            "route": route,
+            "shape_id": sid,
+            "shape": shape,
+        }
+        # 原始命令只交给 explain 使用，不写入日志
+        job = (entry, command if self._want_explain(sid) else None)
+        self._start()
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            DROPPED.inc()
+        return True
+
+    def _start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._work, name="slow-ops", daemon=True)
+            self._thread.start()
+
+    def _open(self) -> logging.Logger:
+        if self._logger is None:
+            logger = logging.getLogger("bookstore.slow_ops.{}".format(id(self)))
+            logger.propagate = False
+            logger.setLevel(logging.INFO)
+            handler = RotatingFileHandler(self.path, maxBytes=MAX_BYTES, backupCount=BACKUP_COUNT, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            self._logger = logger
+        return self._logger
+
+    def _work(self) -> None:
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                entry, command = job
+                if command is not None:
+                    try:
+                        entry["explain"] = summarize_explain(self.explain(entry["database"], entry["command"], command))
+                    except Exception as e:
+                        entry["explain_error"] = "{}: {}".format(type(e).__name__, e)
+                self._open().info(json.dumps(entry, ensure_ascii=False, default=str))
+            except Exception:
+                logging.exception("slow-op log entry failed")
+            finally:
+                self._queue.task_done()
+
+    def flush(self) -> None:
+        """Wait until every queued entry is written (tests, shutdown)."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+        if self._logger is not None:
+            for h in self._logger.handlers:
+                h.flush()
+
+    def close(self) -> None:
+        self.flush()
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        if self._logger is not None:
+            for h in list(self._logger.handlers):
+                h.close()
+                self._logger.removeHandler(h)
+            self._logger = None
+
+
+LOG = SlowOpLog()
@@ -6,10 +6,52 @@ collections and indexes for a phased migration.
 """
 from __future__ import annotations
 
+import threading
+import time
 from typing import Optional
 from pymongo import TEXT
 
 from pymongo.database import Database
+from pymongo.errors import OperationFailure
+
+# Bump when ensure_indexes changes; /readyz waits until the database is at
+# least at this version (see be/health.py)
+INDEX_VERSION = 1
+META_COLLECTION = "_meta"
+
+# Inventory indexes replaced by the ESR indexes in ensure_indexes
+SUPERSEDED_INVENTORY_INDEXES = (
+    "store_id_1_title_1",
+    "store_id_1_isbn_1",
+    "store_id_1_stock_level_1",
+    "title_1_book_id_1",
+    "isbn_1",
+    "inv_store_sort_range",
+)
+
+
+# (client, database) pairs already passed through ensure_indexes_once
+_ensured = set()
+_ensured_lock = threading.Lock()
+
+
+def ensure_indexes_once(db: Optional[Database]) -> None:
+    """ensure_indexes, but at most once per database per process.
+
+    Search() calls this on every request; each create_index is a round trip
+    even when the index exists, so repeating it cost twenty-odd commands per
+    search.
+    """
+    if db is None:
+        return
+    key = (id(db.client), db.name)
+    if key in _ensured:
+        return
+    with _ensured_lock:
+        if key in _ensured:
+            return
+        ensure_indexes(db)
+        _ensured.add(key)
 
 
 def ensure_indexes(db: Optional[Database]) -> None:
@@ -26,15 +68,42 @@ def ensure_indexes(db: Optional[Database]) -> None:
     # inventory per store/book
     # {store_id, book_id, book_info, stock_level, title, author, isbn, pub_year, pages, price}
     db["inventory"].create_index([("store_id", 1), ("book_id", 1)], unique=True)
-    db["inventory"].create_index([("store_id", 1), ("stock_level", 1)])
     # text/attribute indexes to speed search-like operations
-    db["inventory"].create_index([("store_id", 1), ("title", 1)])
     db["inventory"].create_index([("store_id", 1), ("author", 1)])
-    db["inventory"].create_index([("store_id", 1), ("isbn", 1)])
-    db["inventory"].create_index([("title", 1), ("book_id", 1)])
     db["inventory"].create_index("title")
     db["inventory"].create_index("author")
-    db["inventory"].create_index("isbn")
+    # Search.search shapes (see fe/bench/index_advisor.py), keys in ESR order:
+    # equality (store_id / isbn) -> sort (title, book_id) -> range filters.
+    # inv_store_listing also carries every filtered and returned field, so
+    # store-scoped listings with LISTING_PROJECTION are covered (no FETCH).
+    # It is the only index holding stock_level, so the $inc on every order
+    # line rewrites one index entry, as (store_id, stock_level) did before.
+    db["inventory"].create_index(
+        [
+            ("store_id", 1),
+            ("title", 1),
+            ("book_id", 1),
+            ("price", 1),
+            ("stock_level", 1),
+            ("pages", 1),
+            ("pub_year", 1),
+            ("author", 1),
+            ("isbn", 1),
+        ],
+        name="inv_store_listing",
+    )
+    db["inventory"].create_index(
+        [("store_id", 1), ("isbn", 1), ("title", 1), ("book_id", 1)],
+        name="inv_store_isbn_sort",
+    )
+    db["inventory"].create_index(
+        [("isbn", 1), ("title", 1), ("book_id", 1)],
+        name="inv_isbn_sort",
+    )
+    db["inventory"].create_index(
+        [("title", 1), ("book_id", 1), ("price", 1)],
+        name="inv_sort_price",
+    )
     db["inventory"].create_index("pub_year")
     db["inventory"].create_index("pages")
     db["inventory"].create_index("price")
@@ -51,6 +120,18 @@ def ensure_indexes(db: Optional[Database]) -> None:
         # Older Mongo versions or permissions may fail; search will fall back to regex
         pass
 
+    # Older deployments created these; each is a prefix of (or, for
+    # store_id_1_stock_level_1, a range already served by) an index above, and
+    # every extra index holding stock_level costs a write per order line.
+    # One listIndexes round trip, drops only when something is left over.
+    stale = set(SUPERSEDED_INVENTORY_INDEXES) & set(db["inventory"].index_information())
+    for name in sorted(stale):
+        try:
+            db["inventory"].drop_index(name)
+        except OperationFailure:
+            # dropped concurrently by another process
+            pass
+
     # orders header
     # {_id: order_id, user_id, store_id, created_ts}
     db["orders"].create_index("_id", unique=True)
@@ -65,3 +146,14 @@ def ensure_indexes(db: Optional[Database]) -> None:
     db["order_status"].create_index("order_id")
     db["order_status"].create_index([("order_id", 1), ("ts", 1)])
     db["order_status"].create_index([("order_id", 1), ("status", 1), ("ts", 1)])
+
+    # 记录索引版本，$max 保证旧版本进程不会把它改小
+    db[META_COLLECTION].update_one(
+        {"_id": "indexes"}, {"$max": {"version": INDEX_VERSION}, "$set": {"updated_ts": time.time()}}, upsert=True
+    )
+
+
+def index_version(db: Database) -> int:
+    """Index version recorded by the last ensure_indexes; 0 if never run."""
+    doc = db[META_COLLECTION].find_one({"_id": "indexes"}, {"version": 1})
+    return int(doc.get("version", 0)) if doc else 0
@@ -8,6 +8,7 @@ from typing import Tuple
 from be.model import error
 from be.model import db_conn
 from be.model import mongo_store
+from be.tracing import traced
 from pymongo.errors import DuplicateKeyError, PyMongoError
 
 
@@ -48,6 +49,7 @@ class User(db_conn.DBConn):
             logging.error(str(e))
             return False
 
+    @traced
     def register(self, user_id: str, password: str):
         attempts = 20
         last_err: Exception | None = None
@@ -81,6 +83,7 @@ class User(db_conn.DBConn):
             return 528, f"{last_err}"
         return 528, "register failed"
 
+    @traced
     def check_token(self, user_id: str, token: str) -> Tuple[int, str]:
         row = self.col_users.find_one({"_id": user_id}, {"token": 1})
         if not row:
@@ -90,6 +93,7 @@ class User(db_conn.DBConn):
             return error.error_authorization_fail()
         return 200, "ok"
 
+    @traced
     def check_password(self, user_id: str, password: str) -> Tuple[int, str]:
         row = self.col_users.find_one({"_id": user_id}, {"password": 1})
         if not row:
@@ -98,6 +102,7 @@ class User(db_conn.DBConn):
             return error.error_authorization_fail()
         return 200, "ok"
 
+    @traced
     def login(self, user_id: str, password: str, terminal: str) -> Tuple[int, str, str]:
         token = ""
         try:
@@ -118,6 +123,7 @@ class User(db_conn.DBConn):
             return 530, f"{e}", ""
         return 200, "ok", token
 
+    @traced
     def logout(self, user_id: str, token: str) -> Tuple[int, str]:
         try:
             code, message = self.check_token(user_id, token)
@@ -139,6 +145,7 @@ class User(db_conn.DBConn):
             return 530, f"{e}"
         return 200, "ok"
 
+    @traced
     def unregister(self, user_id: str, password: str) -> Tuple[int, str]:
         try:
             code, message = self.check_password(user_id, password)
@@ -155,6 +162,7 @@ class User(db_conn.DBConn):
             return 530, f"{e}"
         return 200, "ok"
 
+    @traced
     def change_password(
         self, user_id: str, old_password: str, new_password: str
     ) -> Tuple[int, str]:
@@ -1,26 +1,39 @@
-import logging
 import os
+import signal
 import threading
 from flask import Flask
 from flask import Blueprint
 from flask import request
+from werkzeug.serving import make_server
 from be.view import auth
 from be.view import seller
 from be.view import buyer
 from be.view import admin
 from be.view import search
+from be.view import metrics as metrics_view
+from be.view import health as health_view
 init_completed_event = threading.Event()
 from be.model import mongo_store
-from be.model import store_mongo
+from be import metrics
+from be import tracing
+from be import access_log
+from be import health
+
+# 启动时最多等待索引创建的秒数；超时后继续启动，由 /readyz 报告未就绪
+INDEX_WAIT_S = float(os.getenv("BE_INDEX_WAIT_S", "10"))
 
 bp_shutdown = Blueprint("shutdown", __name__)
 
 
 def shutdown_server():
     func = request.environ.get("werkzeug.server.shutdown")
-    if func is None:
+    if func is not None:
+        func()
+        return
+    # Werkzeug 2.1+ 不再提供 werkzeug.server.shutdown，改用 be_run 保存的服务器句柄
+    if health.STATE.server is None:
         raise RuntimeError("Not running with the Werkzeug Server")
-    func()
+    health.STATE.stop_server()
 
 
 @bp_shutdown.route("/shutdown")
@@ -34,29 +47,34 @@ def be_run():
     parent_path = os.path.dirname(this_path)
     log_file = os.path.join(parent_path, "app.log")
     # SQLite initialization removed (Mongo-only)
-    # Ensure Mongo collections have required indexes (idempotent)
-    try:
-        db = mongo_store.get_db()
-        mongo_store.ensure_indexes(db)
-        store_mongo.ensure_indexes(db)
-    except Exception:
-        # Mongo may be unavailable in certain test runs; index creation is best-effort
-        pass
-
-    logging.basicConfig(filename=log_file, level=logging.ERROR)
-    handler = logging.StreamHandler()
-    formatter = logging.Formatter(
-        "%(asctime)s [%(threadName)-12.12s] [%(levelname)-5.5s]  %(message)s"
-    )
-    handler.setFormatter(formatter)
-    logging.getLogger().addHandler(handler)
+    # 日志经队列交给后台线程写文件/控制台，请求线程不做 IO
+    access_log.start(log_file)
+    # Ensure Mongo collections have required indexes (idempotent) on a background
+    # thread: a slow or unreachable Mongo no longer blocks startup in server
+    # selection; /readyz reports 503 until the build has succeeded
+    health.start_index_build(mongo_store.get_db).join(INDEX_WAIT_S)
 
     app = Flask(__name__)
+    metrics.init_app(app)
+    tracing.init_app(app)
+    access_log.init_app(app)
+    health.init_app(app)
     app.register_blueprint(bp_shutdown)
     app.register_blueprint(auth.bp_auth)
     app.register_blueprint(seller.bp_seller)
     app.register_blueprint(buyer.bp_buyer)
     app.register_blueprint(admin.bp_admin)
     app.register_blueprint(search.bp_search)
+    app.register_blueprint(metrics_view.bp_metrics)
+    app.register_blueprint(health_view.bp_health)
+    # 与 app.run() 相同的多线程开发服务器，但保留句柄以便排空后停止
+    server = make_server("127.0.0.1", 5000, app, threaded=True)
+    health.STATE.server = server
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, lambda signum, frame: health.STATE.drain())
     init_completed_event.set()
-    app.run()
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        access_log.stop()
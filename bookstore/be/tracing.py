@@ -0,0 +1,400 @@
+"""Request tracing with spans exported as OpenTelemetry (OTLP/JSON) traces.
+
+init_app(app) opens a root span (kind SERVER) for each sampled request. The
+span is named after the URL rule, e.g. "POST /buyer/payment". Under the root
+span:
+
+- every model method decorated with @traced (Buyer.payment,
+  Seller.add_book, User.login, Search.search, ...) is a child span;
+- every MongoDB command sent while the span is open is a child span (kind
+  CLIENT) named "mongo.<command>". mongo_monitor records these from the
+  pymongo command events, with the server-reported duration.
+
+When the root span ends, all spans of the request are handed to the
+exporter as one ExportTraceServiceRequest
+(resourceSpans -> scopeSpans -> spans):
+
+- FileExporter appends one JSON line per trace from a background thread
+  behind a bounded queue. Traces are dropped and counted when the queue is
+  full.
+- MemoryCollector keeps the last traces in process, for tests and bench
+  runs that start the backend in their own process.
+
+Requests that are not sampled get no spans. For them, @traced and the
+Mongo listener only check a ContextVar. An incoming W3C `traceparent`
+header is honoured: the trace id and parent span id are kept, and a
+sampled flag forces sampling. Sampled responses carry `X-Trace-Id`.
+
+Configuration comes from the environment. TRACER.sample_rate,
+TRACER.route_rates and TRACER.exporter can also be changed at runtime:
+
+    BE_TRACE_SAMPLE         share of requests traced, default 0 (off)
+    BE_TRACE_SAMPLE_ROUTES  per-rule overrides, e.g. "/buyer/payment=1,/search/books=0.01"
+    BE_TRACE_EXPORT         "file" (default) or "memory"
+    BE_TRACE_FILE           file exporter path, default <bookstore>/traces.jsonl
+
+fe/bench/trace_report.py turns the exported traces into per-route,
+per-phase latency breakdowns.
+"""
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from flask import Flask, g, request
+
+from be import metrics
+
+SAMPLE_RATE = float(os.getenv("BE_TRACE_SAMPLE", "0"))
+EXPORT = os.getenv("BE_TRACE_EXPORT", "file")
+TRACE_FILE = os.getenv(
+    "BE_TRACE_FILE", os.path.join(os.path.dirname(os.path.dirname(__file__)), "traces.jsonl")
+)
+SERVICE_NAME = "bookstore"
+SCOPE_NAME = "be.tracing"
+
+# OTLP SpanKind / StatusCode
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+# 单个请求最多记录的 span 数，超出的只计数
+MAX_SPANS_PER_TRACE = 500
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+EXPORTED = metrics.Counter("bookstore_trace_exported_total", "Traces handed to the exporter.")
+DROPPED = metrics.Counter("bookstore_trace_dropped_total", "Traces dropped because the export queue was full.")
+
+
+def parse_route_rates(text: str) -> Dict[str, float]:
+    rates: Dict[str, float] = {}
+    for part in (text or "").split(","):
+        if "=" in part:
+            rule, rate = part.rsplit("=", 1)
+            rates[rule.strip()] = float(rate)
+    return rates
+
+
+def _new_id(nbytes: int) -> str:
+    return "{:0{}x}".format(random.getrandbits(nbytes * 8) or 1, nbytes * 2)
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns", "attributes", "status",
+                 "_t0")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], kind: int,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.trace = trace
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.status = STATUS_OK
+        # 墙钟时间只取一次，时长用单调时钟计算
+        self.start_ns = time.time_ns()
+        self._t0 = time.perf_counter_ns()
+        self.end_ns = 0
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def error(self, message: str) -> None:
+        self.status = STATUS_ERROR
+        self.attributes["error.message"] = message
+
+    def end(self) -> None:
+        self.end_ns = self.start_ns + (time.perf_counter_ns() - self._t0)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        out = {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": [_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": self.status},
+        }
+        if self.parent_id:
+            out["parentSpanId"] = self.parent_id
+        return out
+
+
+def _attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        v = {"boolValue": value}
+    elif isinstance(value, int):
+        # OTLP/JSON 中 int64 编码为字符串
+        v = {"intValue": str(value)}
+    elif isinstance(value, float):
+        v = {"doubleValue": value}
+    else:
+        v = {"stringValue": str(value)}
+    return {"key": key, "value": v}
+
+
+class Trace:
+    """Spans of one sampled request, exported together when the root ends."""
+
+    __slots__ = ("trace_id", "spans", "overflow")
+
+    def __init__(self, trace_id: Optional[str] = None):
+        self.trace_id = trace_id or _new_id(16)
+        self.spans: List[Span] = []
+        self.overflow = 0
+
+    def add(self, span: Span) -> None:
+        if len(self.spans) < MAX_SPANS_PER_TRACE:
+            self.spans.append(span)
+        else:
+            self.overflow += 1
+
+    def to_otlp(self) -> Dict[str, Any]:
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": [_attribute("service.name", SERVICE_NAME)]},
+                    "scopeSpans": [
+                        {"scope": {"name": SCOPE_NAME}, "spans": [s.to_otlp() for s in self.spans]}
+                    ],
+                }
+            ]
+        }
+
+
+class MemoryCollector:
+    """Keeps the last `max_traces` exported traces (OTLP dicts) in memory."""
+
+    def __init__(self, max_traces: int = 1000):
+        self._traces: Deque[Dict[str, Any]] = deque(maxlen=max_traces)
+
+    def export(self, trace: Trace) -> None:
+        self._traces.append(trace.to_otlp())
+
+    def traces(self) -> List[Dict[str, Any]]:
+        return list(self._traces)
+
+    def clear(self) -> None:
+        self._traces.clear()
+
+
+class FileExporter:
+    """Appends one OTLP/JSON line per trace to `path` from a background thread."""
+
+    def __init__(self, path: str = None, queue_size: int = 1000):
+        self.path = path or TRACE_FILE
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def export(self, trace: Trace) -> None:
+        self._start()
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            DROPPED.inc()
+
+    def _start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._work, name="trace-export", daemon=True)
+            self._thread.start()
+
+    def _work(self) -> None:
+        fh = None
+        try:
+            while True:
+                trace = self._queue.get()
+                try:
+                    if trace is None:
+                        return
+                    if fh is None:
+                        fh = open(self.path, "a", encoding="utf-8")
+                    fh.write(json.dumps(trace.to_otlp(), ensure_ascii=False, default=str) + "\n")
+                    # 队列排空时才 flush，突发时合并写入
+                    if self._queue.empty():
+                        fh.flush()
+                except Exception:
+                    logging.exception("trace export failed")
+                finally:
+                    self._queue.task_done()
+        finally:
+            if fh is not None:
+                fh.close()
+
+    def flush(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def close(self) -> None:
+        self.flush()
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("trace_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+class Tracer:
+    def __init__(self, sample_rate: float = None, route_rates: Optional[Dict[str, float]] = None, exporter=None):
+        self.sample_rate = SAMPLE_RATE if sample_rate is None else sample_rate
+        self.route_rates = parse_route_rates(os.getenv("BE_TRACE_SAMPLE_ROUTES", "")) if route_rates is None \
+            else route_rates
+        if exporter is None:
+            exporter = MemoryCollector() if EXPORT == "memory" else FileExporter()
+        self.exporter = exporter
+
+    def should_sample(self, route: str) -> bool:
+        rate = self.route_rates.get(route, self.sample_rate)
+        return rate > 0 and (rate >= 1 or random.random() < rate)
+
+    def start_trace(self, name: str, route: str, traceparent: Optional[str] = None,
+                    attributes: Optional[Dict[str, Any]] = None) -> Optional[Tuple[Span, contextvars.Token]]:
+        """Open the root span of a request if it is sampled."""
+        trace_id = parent_id = None
+        forced = False
+        m = _TRACEPARENT.match(traceparent or "")
+        if m:
+            trace_id, parent_id = m.group(1), m.group(2)
+            forced = int(m.group(3), 16) & 1 == 1
+        if not forced and not self.should_sample(route):
+            return None
+        trace = Trace(trace_id)
+        root = Span(trace, name, parent_id, KIND_SERVER, attributes)
+        trace.add(root)
+        return root, _current.set(root)
+
+    def finish_trace(self, root: Span, token: contextvars.Token) -> None:
+        _current.reset(token)
+        root.end()
+        if root.trace.overflow:
+            root.set("trace.dropped_spans", root.trace.overflow)
+        try:
+            self.exporter.export(root.trace)
+            EXPORTED.inc()
+        except Exception:
+            logging.exception("trace export failed")
+
+    @contextlib.contextmanager
+    def span(self, name: str, kind: int = KIND_INTERNAL, attributes: Optional[Dict[str, Any]] = None
+             ) -> Iterator[Optional[Span]]:
+        """Child span of the current span; does nothing outside a sampled trace."""
+        parent = _current.get()
+        if parent is None:
+            yield None
+            return
+        s = Span(parent.trace, name, parent.span_id, kind, attributes)
+        parent.trace.add(s)
+        token = _current.set(s)
+        try:
+            yield s
+        except BaseException as e:
+            s.error("{}: {}".format(type(e).__name__, e))
+            raise
+        finally:
+            _current.reset(token)
+            s.end()
+
+    def record(self, name: str, start_ns: int, duration_ns: int, kind: int = KIND_CLIENT,
+               attributes: Optional[Dict[str, Any]] = None, ok: bool = True,
+               parent: Optional[Span] = None) -> Optional[Span]:
+        """Add an already finished child span (e.g. a Mongo command) under `parent`."""
+        parent = parent or _current.get()
+        if parent is None:
+            return None
+        s = Span(parent.trace, name, parent.span_id, kind, attributes)
+        s.start_ns = start_ns
+        s.end_ns = start_ns + duration_ns
+        if not ok:
+            s.status = STATUS_ERROR
+        parent.trace.add(s)
+        return s
+
+
+TRACER = Tracer()
+
+
+def traced(fn: Callable) -> Callable:
+    """Run a model method in a child span named after its class and method.
+
+    Model methods return (code, message, ...); a code other than 200 marks
+    the span as an error and is recorded as `bookstore.code`.
+    """
+    name = fn.__qualname__
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if _current.get() is None:
+            return fn(*args, **kwargs)
+        with TRACER.span(name) as s:
+            result = fn(*args, **kwargs)
+            if isinstance(result, tuple) and result and isinstance(result[0], int):
+                s.set("bookstore.code", result[0])
+                if result[0] != 200:
+                    s.status = STATUS_ERROR
+            return result
+
+    return wrapper
+
+
+def _before() -> None:
+    rule = request.url_rule
+    route = rule.rule if rule is not None else metrics.UNMATCHED
+    started = TRACER.start_trace(
+        "{} {}".format(request.method, route),
+        route,
+        request.headers.get("traceparent"),
+        {"http.method": request.method, "http.route": route, "http.target": request.path},
+    )
+    if started is not None:
+        g._trace_root, g._trace_token = started
+
+
+def _after(response):
+    root = g.get("_trace_root")
+    if root is not None:
+        root.set("http.status_code", response.status_code)
+        if response.status_code >= 500:
+            root.status = STATUS_ERROR
+        response.headers["X-Trace-Id"] = root.trace.trace_id
+    return response
+
+
+def _teardown(exc: Optional[BaseException]) -> None:
+    root = g.pop("_trace_root", None)
+    token = g.pop("_trace_token", None)
+    if root is None:
+        return
+    if exc is not None:
+        root.error("{}: {}".format(type(exc).__name__, exc))
+    TRACER.finish_trace(root, token)
+
+
+def init_app(app: Flask) -> None:
+    """Trace sampled requests handled by `app` (all blueprints)."""
+    app.before_request(_before)
+    app.after_request(_after)
+    app.teardown_request(_teardown)
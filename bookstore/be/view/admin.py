@@ -1,4 +1,9 @@
-from flask import Blueprint, request, jsonify
+import hmac
+import os
+
+from flask import Blueprint, Response, request, jsonify
+from be import health
+from be import profiler
 from be.model.buyer import Buyer
 
 bp_admin = Blueprint("admin", __name__, url_prefix="/admin")
@@ -12,3 +17,50 @@ def set_config():
         Buyer.ORDER_TIMEOUT_SECONDS = timeout
         return jsonify({"message": "ok"}), 200
     return jsonify({"message": "invalid timeout"}), 401
+
+
+def _admin_allowed() -> bool:
+    # 配置了 BE_ADMIN_TOKEN 时校验 X-Admin-Token；未配置时只允许本机访问
+    token = os.getenv("BE_ADMIN_TOKEN")
+    if token:
+        return hmac.compare_digest(request.headers.get("X-Admin-Token", ""), token)
+    return request.remote_addr in ("127.0.0.1", "::1")
+
+
+def _flag(name: str) -> bool:
+    return request.args.get(name, "0").lower() in ("1", "true", "yes")
+
+
+@bp_admin.route("/profile", methods=["GET"])
+def profile():
+    # 采样所有线程的调用栈，返回 collapsed stacks（火焰图输入）
+    if not _admin_allowed():
+        return jsonify({"message": "forbidden"}), 403
+    try:
+        seconds = float(request.args.get("seconds", profiler.DEFAULT_SECONDS))
+        hz = float(request.args.get("hz", profiler.DEFAULT_HZ))
+    except ValueError:
+        return jsonify({"message": "invalid seconds or hz"}), 400
+    if not (0 < seconds <= profiler.MAX_SECONDS and 0 < hz <= profiler.MAX_HZ):
+        return jsonify({"message": "invalid seconds or hz"}), 400
+    try:
+        text, rounds = profiler.profile(seconds, hz, idle=_flag("idle"), lines=_flag("lines"))
+    except profiler.ProfilerBusy:
+        return jsonify({"message": "profile already running"}), 409
+    resp = Response(text, mimetype="text/plain")
+    resp.headers["X-Profile-Samples"] = str(rounds)
+    return resp
+
+
+@bp_admin.route("/drain", methods=["POST"])
+def drain():
+    # 进入排空模式：/readyz 返回 503，拒绝新请求，在途请求完成或到期后停止服务
+    if not _admin_allowed():
+        return jsonify({"message": "forbidden"}), 403
+    body = request.get_json(silent=True) or {}
+    deadline = body.get("deadline_s", health.DRAIN_DEADLINE_S)
+    if not isinstance(deadline, (int, float)) or isinstance(deadline, bool) or deadline < 0:
+        return jsonify({"message": "invalid deadline_s"}), 400
+    if not health.STATE.drain(float(deadline), stop=body.get("stop", True) is not False):
+        return jsonify({"message": "already draining"}), 409
+    return jsonify({"message": "draining", "in_flight": health.STATE.in_flight, "deadline_s": deadline}), 202
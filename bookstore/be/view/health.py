@@ -0,0 +1,20 @@
+from flask import Blueprint, jsonify
+
+from be import health
+
+bp_health = Blueprint("health", __name__)
+
+
+@bp_health.route("/healthz", methods=["GET"])
+def healthz():
+    # 存活探针：进程能处理请求即 200，排空期间也是
+    state = health.STATE
+    return jsonify(
+        {"status": "ok", "draining": state.draining, "in_flight": state.in_flight, "last_drain": state.last_drain}
+    ), 200
+
+
+@bp_health.route("/readyz", methods=["GET"])
+def readyz():
+    ready, checks = health.readiness()
+    return jsonify({"ready": ready, "checks": checks}), 200 if ready else 503
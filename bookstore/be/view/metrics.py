@@ -0,0 +1,10 @@
+from flask import Blueprint, Response
+
+from be import metrics
+
+bp_metrics = Blueprint("metrics", __name__)
+
+
+@bp_metrics.route("/metrics", methods=["GET"])
+def export():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
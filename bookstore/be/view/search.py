@@ -1,21 +1,28 @@
+import json
 from be.model import search_mongo as search
+from be.model import singleflight
 
 # Back-compat: expose Search/Filter at module level for monkeypatch in tests
 Search = search.Search
 Filter = search.Filter
 from flask import Blueprint
+from flask import Response
 from flask import request
 from flask import jsonify
+from flask import stream_with_context
 
 bp_search = Blueprint("search", __name__, url_prefix="/search")
 
+# Rows per Mongo cursor batch and per flushed NDJSON chunk for /search/export
+EXPORT_BATCH_SIZE = 500
+EXPORT_MAX_BATCH_SIZE = 10000
+
+# Concurrent identical /search/keyword requests share one in-flight Search.search
+COALESCE_SEARCH = True
+_search_flight = singleflight.Group()
 
-@bp_search.route("/keyword", methods=["POST"])
-def search_books():
-    s = Search()
-    body = request.get_json(silent=True) or {}
-    keyword = body.get("keyword") or ""
 
+def _parse_filter(body) -> Filter:
     f = Filter()
     raw_filter = body.get("filter") or {}
     # defensive get with defaults
@@ -29,19 +36,44 @@ def search_books():
     f.stock_level[0] = raw_filter.get("stock_from")
     f.stock_level[1] = raw_filter.get("stock_to")
     f.store_id = raw_filter.get("store_id")
+    return f
+
 
+def _search_key(keyword: str, f: Filter) -> str:
+    # JSON text so unhashable values from the request body still make a valid key
+    return json.dumps([keyword, f.store_id, f.isbn, f.pages, f.price, f.publish_date, f.stock_level], default=str)
+
+
+def _close(s):
+    # allow tests to monkeypatch a close that raises; fall back to conn.close
     try:
-        code, message, results = s.search(keyword, f)
-    finally:
-        # allow tests to monkeypatch a close that raises; fall back to conn.close
+        if hasattr(s, "close"):
+            s.close()
+        elif hasattr(s, "conn") and hasattr(s.conn, "close"):
+            s.conn.close()
+    except Exception:
+        # swallow close errors by design
+        pass
+
+
+@bp_search.route("/keyword", methods=["POST"])
+def search_books():
+    body = request.get_json(silent=True) or {}
+    keyword = body.get("keyword") or ""
+    f = _parse_filter(body)
+
+    def _run():
+        s = Search()
         try:
-            if hasattr(s, "close"):
-                s.close()
-            elif hasattr(s, "conn") and hasattr(s.conn, "close"):
-                s.conn.close()
-        except Exception:
-            # swallow close errors by design
-            pass
+            return s.search(keyword, f)
+        finally:
+            _close(s)
+
+    if COALESCE_SEARCH:
+        # identical concurrent requests wait for one execution and share its rows
+        (code, message, results), _ = _search_flight.do(_search_key(keyword, f), _run)
+    else:
+        code, message, results = _run()
 
     # simple pagination support (optional)
     page = int(body.get("page") or 1)
@@ -53,4 +85,53 @@ def search_books():
     start = (page - 1) * size
     paged = results[start : start + size]
 
-    return jsonify({"message": message, "count": len(results), "results": paged}), code
\ No newline at end of file
+    return jsonify({"message": message, "count": len(results), "results": paged}), code
+
+
+@bp_search.route("/export", methods=["POST"])
+def export_books():
+    """Stream every match as newline-delimited JSON, one cursor batch per chunk.
+
+    Body is the same as /search/keyword (keyword, filter) plus an optional
+    batch_size; page/size are ignored. The first row is read before the response
+    starts, so a failure there answers 528 like /search/keyword. A failure after
+    that can no longer change the status code and is reported as a final
+    {"error": ...} line.
+    """
+    body = request.get_json(silent=True) or {}
+    keyword = body.get("keyword") or ""
+    f = _parse_filter(body)
+    try:
+        batch_size = int(body.get("batch_size") or EXPORT_BATCH_SIZE)
+    except (TypeError, ValueError):
+        batch_size = EXPORT_BATCH_SIZE
+    batch_size = min(max(batch_size, 1), EXPORT_MAX_BATCH_SIZE)
+    s = Search()
+    rows = s.iter_search(keyword, f, batch_size=batch_size)
+    try:
+        # pulls the first cursor batch: query errors and $text fallback happen here
+        first = next(rows, None)
+    except Exception as e:
+        _close(s)
+        return jsonify({"message": str(e), "count": 0, "results": []}), 528
+
+    def generate():
+        chunk = []
+        try:
+            if first is not None:
+                chunk.append(json.dumps(first, ensure_ascii=False))
+            for row in rows:
+                chunk.append(json.dumps(row, ensure_ascii=False))
+                if len(chunk) >= batch_size:
+                    yield "\n".join(chunk) + "\n"
+                    chunk = []
+            if chunk:
+                yield "\n".join(chunk) + "\n"
+        except Exception as e:
+            if chunk:
+                yield "\n".join(chunk) + "\n"
+            yield json.dumps({"error": str(e)}, ensure_ascii=False) + "\n"
+        finally:
+            _close(s)
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
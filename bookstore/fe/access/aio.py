@@ -0,0 +1,184 @@
+"""Asyncio versions of the fe.access clients.
+
+AsyncAuth, AsyncBuyer and AsyncSeller match Auth, Buyer and Seller call for
+call, with the same arguments and return values, except that every method is
+awaited. All of them send through one AsyncClient: an aiohttp ClientSession
+whose connector keeps at most `limit` keep-alive connections. Thousands of
+coroutines can share it in one process. A request that finds every
+connection busy waits for one, and that wait counts in its latency.
+
+aiohttp is optional (pip install aiohttp); the synchronous clients do not
+need it. Like fe/access/http_session.py, only connection errors are retried,
+since the API is POST-only and not idempotent.
+
+    async with AsyncClient(conf.URL) as client:
+        buyer = await AsyncBuyer.connect(client, user_id, password)
+        code, order_id = await buyer.new_order(store_id, [(book_id, 1)])
+"""
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urljoin
+
+from fe import conf
+from fe.access import book
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover - 可选依赖
+    aiohttp = None
+
+
+class AsyncClient:
+    def __init__(self, url_prefix: str = None, limit: int = None, retries: int = None):
+        if aiohttp is None:
+            raise RuntimeError("the async client needs aiohttp: pip install aiohttp")
+        self.url_prefix = url_prefix or conf.URL
+        self.limit = limit or conf.Http_Pool_Size
+        self.retries = conf.Http_Retries if retries is None else retries
+        self._session: Optional["aiohttp.ClientSession"] = None
+
+    @property
+    def session(self) -> "aiohttp.ClientSession":
+        if self._session is None:
+            # 必须在事件循环内创建；连接数上限即并发请求数上限
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.limit))
+        return self._session
+
+    async def post(self, url: str, json: Dict[str, Any], token: str = None) -> Tuple[int, Optional[Dict[str, Any]]]:
+        """POST and return (status, parsed JSON body or None)."""
+        headers = {"token": token} if token is not None else None
+        attempt = 0
+        while True:
+            try:
+                async with self.session.post(url, json=json, headers=headers) as r:
+                    try:
+                        body = await r.json(content_type=None)
+                    except ValueError:
+                        body = None
+                    return r.status, body
+            except aiohttp.ClientConnectorError:
+                # 连接没建立起来，请求未送达服务端，可以安全重试
+                attempt += 1
+                if attempt > self.retries:
+                    raise
+                await asyncio.sleep(0.05 * attempt)
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self) -> "AsyncClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+
+class AsyncAuth:
+    def __init__(self, client: AsyncClient):
+        self.client = client
+        self.url_prefix = urljoin(client.url_prefix, "auth/")
+
+    async def login(self, user_id: str, password: str, terminal: str) -> Tuple[int, str]:
+        json = {"user_id": user_id, "password": password, "terminal": terminal}
+        code, body = await self.client.post(urljoin(self.url_prefix, "login"), json)
+        return code, (body or {}).get("token")
+
+    async def register(self, user_id: str, password: str) -> int:
+        json = {"user_id": user_id, "password": password}
+        code, _ = await self.client.post(urljoin(self.url_prefix, "register"), json)
+        return code
+
+    async def password(self, user_id: str, old_password: str, new_password: str) -> int:
+        json = {"user_id": user_id, "oldPassword": old_password, "newPassword": new_password}
+        code, _ = await self.client.post(urljoin(self.url_prefix, "password"), json)
+        return code
+
+    async def logout(self, user_id: str, token: str) -> int:
+        code, _ = await self.client.post(urljoin(self.url_prefix, "logout"), {"user_id": user_id}, token)
+        return code
+
+    async def unregister(self, user_id: str, password: str) -> int:
+        json = {"user_id": user_id, "password": password}
+        code, _ = await self.client.post(urljoin(self.url_prefix, "unregister"), json)
+        return code
+
+
+class _LoggedIn:
+    """Common part of AsyncBuyer / AsyncSeller: log in once, then send the token."""
+
+    _path = ""
+
+    def __init__(self, client: AsyncClient, user_id: str, password: str):
+        self.client = client
+        self.url_prefix = urljoin(client.url_prefix, self._path)
+        self.user_id = user_id
+        self.password = password
+        self.terminal = "my terminal"
+        self.token = ""
+        self.auth = AsyncAuth(client)
+
+    async def login(self) -> int:
+        code, token = await self.auth.login(self.user_id, self.password, self.terminal)
+        if code == 200:
+            self.token = token
+        return code
+
+    @classmethod
+    async def connect(cls, client: AsyncClient, user_id: str, password: str):
+        """Construct and log in; fails like the sync constructor when login fails."""
+        self = cls(client, user_id, password)
+        code = await self.login()
+        assert code == 200
+        return self
+
+    async def _post(self, path: str, json: Dict[str, Any]) -> Tuple[int, Optional[Dict[str, Any]]]:
+        return await self.client.post(urljoin(self.url_prefix, path), json, self.token)
+
+
+class AsyncBuyer(_LoggedIn):
+    _path = "buyer/"
+
+    async def new_order(self, store_id: str, book_id_and_count: List[Tuple[str, int]]) -> Tuple[int, str]:
+        books = [{"id": book_id, "count": count} for book_id, count in book_id_and_count]
+        code, body = await self._post("new_order", {"user_id": self.user_id, "store_id": store_id, "books": books})
+        return code, (body or {}).get("order_id")
+
+    async def payment(self, order_id: str) -> int:
+        json = {"user_id": self.user_id, "password": self.password, "order_id": order_id}
+        return (await self._post("payment", json))[0]
+
+    async def add_funds(self, add_value: int) -> int:
+        json = {"user_id": self.user_id, "password": self.password, "add_value": add_value}
+        return (await self._post("add_funds", json))[0]
+
+    async def receive_books(self, order_id: str) -> int:
+        return (await self._post("receive_book", {"user_id": self.user_id, "order_id": order_id}))[0]
+
+    async def cancel_order(self, order_id: str) -> int:
+        return (await self._post("cancel_order", {"user_id": self.user_id, "order_id": order_id}))[0]
+
+    async def list_orders(self, page: int = 1, size: int = 20, status: str = None) -> Tuple[int, Optional[dict]]:
+        json = {"user_id": self.user_id, "page": page, "size": size}
+        if status:
+            json["status"] = status
+        return await self._post("orders", json)
+
+
+class AsyncSeller(_LoggedIn):
+    _path = "seller/"
+
+    async def create_store(self, store_id: str) -> int:
+        return (await self._post("create_store", {"user_id": self.user_id, "store_id": store_id}))[0]
+
+    async def add_book(self, store_id: str, stock_level: int, book_info: book.Book) -> int:
+        json = {"user_id": self.user_id, "store_id": store_id, "book_info": book_info.to_dict(), "stock_level": stock_level}
+        return (await self._post("add_book", json))[0]
+
+    async def add_stock_level(self, seller_id: str, store_id: str, book_id: str, add_stock_num: int) -> int:
+        json = {"user_id": seller_id, "store_id": store_id, "book_id": book_id, "add_stock_level": add_stock_num}
+        return (await self._post("add_stock_level", json))[0]
+
+    async def send_books(self, order_id: str) -> int:
+        return (await self._post("send_books", {"user_id": self.user_id, "order_id": order_id}))[0]
@@ -1,5 +1,5 @@
-import requests
 from urllib.parse import urljoin
+from fe.access import http_session
 
 
 class Auth:
@@ -9,13 +9,13 @@ class Auth:
     def login(self, user_id: str, password: str, terminal: str) -> (int, str):
         json = {"user_id": user_id, "password": password, "terminal": terminal}
         url = urljoin(self.url_prefix, "login")
-        r = requests.post(url, json=json)
+        r = http_session.post(url, json=json)
         return r.status_code, r.json().get("token")
 
     def register(self, user_id: str, password: str) -> int:
         json = {"user_id": user_id, "password": password}
         url = urljoin(self.url_prefix, "register")
-        r = requests.post(url, json=json)
+        r = http_session.post(url, json=json)
         return r.status_code
 
     def password(self, user_id: str, old_password: str, new_password: str) -> int:
@@ -25,18 +25,18 @@ class Auth:
             "newPassword": new_password,
         }
         url = urljoin(self.url_prefix, "password")
-        r = requests.post(url, json=json)
+        r = http_session.post(url, json=json)
         return r.status_code
 
     def logout(self, user_id: str, token: str) -> int:
         json = {"user_id": user_id}
         headers = {"token": token}
         url = urljoin(self.url_prefix, "logout")
-        r = requests.post(url, headers=headers, json=json)
+        r = http_session.post(url, headers=headers, json=json)
         return r.status_code
 
     def unregister(self, user_id: str, password: str) -> int:
         json = {"user_id": user_id, "password": password}
         url = urljoin(self.url_prefix, "unregister")
-        r = requests.post(url, json=json)
+        r = http_session.post(url, json=json)
         return r.status_code
@@ -2,17 +2,52 @@ import os
 import random
 import base64
 import simplejson as json
+from pymongo.errors import BulkWriteError
+
 from be.model import mongo_store
 
 
+# 已确认过样例数据的 (库名, 集合名)：同一进程里 BookDB() 不再重复检查
+_ensured = set()
+
+
+def _sample_book(i: int) -> dict:
+    return {
+        "id": f"bk_{i:05d}",
+        "title": f"Sample Book {i}",
+        "author": "Author",
+        "publisher": "Publisher",
+        "original_title": "",
+        "translator": "",
+        "pub_year": "2024",
+        # 覆盖测试用页数范围 [120, 350]
+        "pages": 120 + (i % 300),
+        "price": 1000 + (i % 500),  # cents
+        "currency_unit": "CNY",
+        "binding": "paperback",
+        "isbn": f"9780000{i:05d}",
+        "author_intro": "",
+        "book_intro": "",
+        "content": "",
+        "tags": ["sample", "fiction"],
+        "picture": None,
+    }
+
+
 def _ensure_book_db(col_name: str, sample_size: int = 200):
     """Ensure MongoDB collection exists with at least `sample_size` deterministic rows.
 
     - If collection already has >= sample_size docs, do nothing.
-    - Otherwise, upsert deterministic rows with ids bk_00000..bk_{sample_size-1}.
+    - Otherwise, insert the missing deterministic rows with ids
+      bk_00000..bk_{sample_size-1} in one unordered insert_many.
     - Create a unique index on `id` for fast lookup and to avoid duplicates.
+    - Done once per process and collection. Larger synthetic catalogs come
+      from fe/access/book_gen.py.
     """
     db = mongo_store.get_db()
+    key = (db.name, col_name)
+    if key in _ensured:
+        return
     col = db[col_name]
     try:
         col.create_index("id", unique=True)
@@ -20,41 +55,55 @@ def _ensure_book_db(col_name: str, sample_size: int = 200):
         pass
     try:
         if col.estimated_document_count() >= sample_size:
+            _ensured.add(key)
             return
     except Exception:
         # if estimation fails, continue to upsert
         pass
 
-    for i in range(sample_size):
-        bid = f"bk_{i:05d}"
-        doc = {
-            "id": bid,
-            "title": f"Sample Book {i}",
-            "author": "Author",
-            "publisher": "Publisher",
-            "original_title": "",
-            "translator": "",
-            "pub_year": "2024",
-            # 覆盖测试用页数范围 [120, 350]
-            "pages": 120 + (i % 300),
-            "price": 1000 + (i % 500),  # cents
-            "currency_unit": "CNY",
-            "binding": "paperback",
-            "isbn": f"9780000{i:05d}",
-            "author_intro": "",
-            "book_intro": "",
-            "content": "",
-            "tags": ["sample", "fiction"],
-            "picture": None,
-        }
-        try:
-            col.update_one({"id": bid}, {"$setOnInsert": doc}, upsert=True)
-        except Exception:
-            # ignore sporadic duplicate races in parallel test runs
-            pass
+    # 只插入缺少的行：已有的行保持不变（等价于逐条 $setOnInsert upsert）
+    docs = [_sample_book(i) for i in range(sample_size)]
+    existing = set(col.distinct("id", {"id": {"$in": [d["id"] for d in docs]}}))
+    missing = [d for d in docs if d["id"] not in existing]
+    try:
+        if missing:
+            col.insert_many(missing, ordered=False)
+    except BulkWriteError:
+        # ignore sporadic duplicate races in parallel test runs
+        pass
+    _ensured.add(key)
+
+
+BOOK_FIELDS = (
+    "id",
+    "title",
+    "author",
+    "publisher",
+    "original_title",
+    "translator",
+    "pub_year",
+    "pages",
+    "price",
+    "currency_unit",
+    "binding",
+    "isbn",
+    "author_intro",
+    "book_intro",
+    "content",
+    "tags",
+)
 
 
 class Book:
+    """One catalog row.
+
+    __slots__ keeps a full-catalog load small. The pictures are kept as the raw
+    bytes and a copy count: the base64 text is only built when `pictures` is
+    first read, and every copy shares that one string.
+    """
+
+    __slots__ = BOOK_FIELDS + ("_pictures", "_picture", "_picture_count")
+
     id: str
     title: str
     author: str
@@ -71,11 +120,40 @@ class Book:
     book_intro: str
     content: str
     tags: list[str]
-    pictures: list[bytes]
 
     def __init__(self):
         self.tags = []
-        self.pictures = []
+        self._pictures = []
+        self._picture = None
+        self._picture_count = 0
+
+    @property
+    def pictures(self) -> list[str]:
+        if self._pictures is None:
+            encoded = base64.b64encode(self._picture).decode("utf-8")
+            self._pictures = [encoded] * self._picture_count
+            self._picture = None
+        return self._pictures
+
+    @pictures.setter
+    def pictures(self, value: list[str]):
+        self._pictures = value
+        self._picture = None
+
+    def set_picture(self, picture: bytes, count: int):
+        """Attach `count` copies of `picture`, base64-encoded on first access."""
+        if picture is None or count <= 0:
+            self.pictures = []
+        else:
+            self._pictures = None
+            self._picture = picture
+            self._picture_count = count
+
+    def to_dict(self) -> dict:
+        """The JSON body the seller API expects for book_info."""
+        d = {f: getattr(self, f, None) for f in BOOK_FIELDS}
+        d["pictures"] = self.pictures
+        return d
 
 
 class BookDB:
@@ -92,42 +170,70 @@ class BookDB:
         self.col = self.db[self.col_name_large if large else self.col_name_small]
         # For small dataset used by unit tests, restrict to synthetic ids (bk_*) to ensure determinism
         self._synthetic_only = not large
+        # (下一次顺序读取的起始位置, 上次读到的最后一个 id)
+        self._resume = None
+
+    def _query(self) -> dict:
+        return {"id": {"$regex": "^bk_"}} if self._synthetic_only else {}
 
     def get_book_count(self):
-        q = {"id": {"$regex": "^bk_"}} if self._synthetic_only else {}
-        return self.col.count_documents(q)
+        return self.col.count_documents(self._query())
 
     def get_book_info(self, start, size) -> list[Book]:
-        books: list[Book] = []
-        q = {"id": {"$regex": "^bk_"}} if self._synthetic_only else {}
-        cursor = (
-            self.col.find(q, projection=None)
-            .sort([("id", 1)])
-            .skip(int(start))
-            .limit(int(size))
-        )
-        for d in cursor:
-            b = Book()
-            b.id = d["id"]
-            b.title = d["title"]
-            b.author = d["author"]
-            b.publisher = d["publisher"]
-            b.original_title = d["original_title"]
-            b.translator = d["translator"]
-            b.pub_year = d["pub_year"]
-            b.pages = d["pages"]
-            b.price = d["price"]
-            b.currency_unit = d["currency_unit"]
-            b.binding = d["binding"]
-            b.isbn = d["isbn"]
-            b.author_intro = d["author_intro"]
-            b.book_intro = d["book_intro"]
-            b.content = d["content"]
-            b.tags = list(d.get("tags") or [])
-            b.pictures = []
-            picture = d.get("picture")
-            for _ in range(0, random.randint(0, 9)):
-                if picture is not None:
-                    b.pictures.append(base64.b64encode(picture).decode("utf-8"))
-            books.append(b)
+        """`size` books from position `start` in id order.
+
+        A call that starts where the previous one ended continues after the
+        last id read (keyset), so a sequential pass does not pay for skip().
+        """
+        start, size = int(start), int(size)
+        q = self._query()
+        skip = start
+        if start and self._resume is not None and self._resume[0] == start:
+            q["id"] = {**q.get("id", {}), "$gt": self._resume[1]}
+            skip = 0
+        cursor = self.col.find(q, projection=None).sort([("id", 1)]).skip(skip).limit(size)
+        books = [self._to_book(d) for d in cursor]
+        self._resume = (start + len(books), books[-1].id) if books else None
         return books
+
+    def iter_books(self, after_id: str = None, batch_size: int = 1000, pictures: bool = True):
+        """Every book with an id greater than `after_id`, in id order.
+
+        Reads `batch_size` rows per query, resuming after the last id, so a
+        full pass is linear and holds one batch at a time. pictures=False
+        leaves the picture bytes out of the query.
+        """
+        projection = None if pictures else {"picture": 0}
+        last = after_id
+        while True:
+            q = self._query()
+            if last is not None:
+                q["id"] = {**q.get("id", {}), "$gt": last}
+            batch = list(self.col.find(q, projection=projection).sort([("id", 1)]).limit(int(batch_size)))
+            for d in batch:
+                yield self._to_book(d)
+            if len(batch) < batch_size:
+                return
+            last = batch[-1]["id"]
+
+    def _to_book(self, d: dict) -> Book:
+        b = Book()
+        b.id = d["id"]
+        b.title = d["title"]
+        b.author = d["author"]
+        b.publisher = d["publisher"]
+        b.original_title = d["original_title"]
+        b.translator = d["translator"]
+        b.pub_year = d["pub_year"]
+        b.pages = d["pages"]
+        b.price = d["price"]
+        b.currency_unit = d["currency_unit"]
+        b.binding = d["binding"]
+        b.isbn = d["isbn"]
+        b.author_intro = d["author_intro"]
+        b.book_intro = d["book_intro"]
+        b.content = d["content"]
+        b.tags = list(d.get("tags") or [])
+        # 与原先一样随机 0-9 份图片，但只保存原始字节，读取 pictures 时才编码
+        b.set_picture(d.get("picture"), random.randint(0, 9))
+        return b
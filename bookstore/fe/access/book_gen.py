@@ -0,0 +1,210 @@
+"""Deterministic synthetic book catalog for scaling tests.
+
+Books have the same fields as the rows imported from book.db. Their contents
+are meant to look like the real catalog:
+
+- Chinese titles built from common words, e.g. "夜色中的城市" or "长安往事".
+- Chinese author names, and sometimes a foreign author with a translator.
+- Tags with Zipf-like popularity, so a few tags (小说, 历史 ...) cover most books.
+- Log-normal prices and page counts, and publication years skewed toward recent ones.
+- An optional small picture per book.
+
+Book i depends only on (seed, i): the catalog is generated in fixed blocks of
+BLOCK books, each with its own RNG. Any range can therefore be regenerated
+without generating the whole catalog, and the output does not depend on how
+many processes did the work. generate() splits the ids over a process pool.
+Each worker bulk-inserts its blocks with insert_many(ordered=False) and skips
+ids that are already present, so an interrupted run can simply be repeated.
+
+Usage:
+    python -m fe.access.book_gen --count 1000000 --processes 8
+    python -m fe.access.book_gen --count 200000 --collection bookdb_scale --seed 7 --pictures 0.1 --drop
+"""
+import argparse
+import logging
+import math
+import multiprocessing
+import random
+import time
+from itertools import accumulate
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pymongo.errors import BulkWriteError
+
+from be.model import mongo_store
+
+BLOCK = 1000
+ID_PREFIX = "sg_"
+PNG_HEADER = b"\x89PNG\r\n\x1a\n"
+
+_WORDS = (
+    "夜色 城市 长安 往事 时间 河流 故乡 远方 星空 月光 风雪 山海 少年 江湖 春天 秋水 "
+    "记忆 灯火 森林 雨季 花园 沉默 旅人 孤岛 黎明 钟声 迷宫 镜子 信使 王朝 边城 草原 "
+    "海岸 石头 飞鸟 火焰 深渊 归途 白昼 黑夜 故事 秘密 梦境 彼岸 人间 岁月 烟火 尘埃"
+).split()
+_PATTERNS = ("{a}{b}", "{a}中的{b}", "{a}与{b}", "{a}的{b}", "{a}往事", "{a}简史", "{a}", "最后的{a}", "{a}三部曲")
+_SURNAMES = "王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘于蒋蔡余杜叶程苏魏吕丁任沈姚卢"
+_GIVEN = "伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚桂英华玉兰萍红建文辉力斌宇浩凯晨欣怡梓涵子轩"
+_FOREIGN = ("村上春树", "东野圭吾", "加西亚·马尔克斯", "卡夫卡", "乔治·奥威尔", "阿加莎·克里斯蒂", "卡尔维诺", "毛姆", "川端康成", "托尔斯泰")
+_PUBLISHERS = (
+    "人民文学出版社", "上海译文出版社", "中信出版社", "译林出版社", "作家出版社", "北京十月文艺出版社",
+    "生活·读书·新知三联书店", "商务印书馆", "中华书局", "南海出版公司", "广西师范大学出版社", "机械工业出版社",
+)
+# 按流行度排序：排在前面的标签被选中的概率高得多
+_TAGS = (
+    "小说 文学 历史 中国 外国文学 日本 经典 散文 科幻 推理 哲学 心理学 传记 社会学 漫画 诗歌 "
+    "经济学 艺术 政治 悬疑 青春 爱情 成长 旅行 美食 编程 计算机 管理 投资 科普 宗教 建筑 "
+    "摄影 音乐 电影 设计 教育 童话 武侠 奇幻 军事 法律 医学 数学 物理 天文 生物 地理 语言"
+).split()
+_TAG_CUM = list(accumulate(1.0 / (i + 1) ** 1.1 for i in range(len(_TAGS))))
+_BINDINGS = ("平装", "精装", "平装", "平装", "简装本")
+
+
+def _isbn13(n: int) -> str:
+    body = "978" + "{:09d}".format(n % 10 ** 9)
+    check = (10 - sum((1 if k % 2 == 0 else 3) * int(c) for k, c in enumerate(body)) % 10) % 10
+    return body + str(check)
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return "，".join(rng.choice(_WORDS) + rng.choice(_WORDS) for _ in range(words)) + "。"
+
+
+def _book(rng: random.Random, i: int, pictures: float, picture_bytes: int) -> Dict[str, Any]:
+    a, b = rng.sample(_WORDS, 2)
+    title = rng.choice(_PATTERNS).format(a=a, b=b)
+    translator = ""
+    original_title = ""
+    if rng.random() < 0.2:
+        author = rng.choice(_FOREIGN)
+        translator = rng.choice(_SURNAMES) + rng.choice(_GIVEN) + rng.choice(_GIVEN)
+        original_title = "The {} of {}".format(rng.choice(("Book", "House", "Garden", "Night")), i)
+    else:
+        author = rng.choice(_SURNAMES) + "".join(rng.choice(_GIVEN) for _ in range(rng.randint(1, 2)))
+    # 出版年份偏向近年；页数、价格（分）为对数正态
+    year = 2024 - min(int(rng.expovariate(1 / 8.0)), 74)
+    pages = max(32, min(int(rng.lognormvariate(math.log(280), 0.45)), 2000))
+    price = max(100, min(int(rng.lognormvariate(math.log(4500), 0.6)) // 10 * 10, 100000))
+    tags = list(dict.fromkeys(rng.choices(_TAGS, cum_weights=_TAG_CUM, k=rng.randint(1, 5))))
+    picture = None
+    if pictures and rng.random() < pictures:
+        picture = PNG_HEADER + rng.randbytes(picture_bytes)
+    return {
+        "id": "{}{:08d}".format(ID_PREFIX, i),
+        "title": title,
+        "author": author,
+        "publisher": rng.choice(_PUBLISHERS),
+        "original_title": original_title,
+        "translator": translator,
+        "pub_year": str(year),
+        "pages": pages,
+        "price": price,
+        "currency_unit": "元",
+        "binding": rng.choice(_BINDINGS),
+        "isbn": _isbn13(i),
+        "author_intro": author + "，" + _sentence(rng, 2),
+        "book_intro": _sentence(rng, rng.randint(3, 8)),
+        "content": "\n".join("第{}章 {}".format(k + 1, rng.choice(_WORDS)) for k in range(rng.randint(3, 12))),
+        "tags": tags,
+        "picture": picture,
+    }
+
+
+def iter_books(
+    start: int,
+    count: int,
+    seed: int = 0,
+    pictures: float = 0.0,
+    picture_bytes: int = 2048,
+) -> Iterator[Dict[str, Any]]:
+    """Books start .. start+count-1; the same (seed, i) always gives the same book."""
+    end = start + count
+    for block in range(start // BLOCK, (end + BLOCK - 1) // BLOCK):
+        rng = random.Random("{}:{}".format(seed, block))
+        for i in range(block * BLOCK, (block + 1) * BLOCK):
+            doc = _book(rng, i, pictures, picture_bytes)
+            if start <= i < end:
+                yield doc
+
+
+def _insert_range(args: Tuple[str, int, int, int, float, int, int]) -> int:
+    collection, start, count, seed, pictures, picture_bytes, batch_size = args
+    col = mongo_store.get_db()[collection]
+    inserted = 0
+    batch: List[Dict[str, Any]] = []
+    for doc in iter_books(start, count, seed, pictures, picture_bytes):
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            inserted += _insert(col, batch)
+            batch = []
+    if batch:
+        inserted += _insert(col, batch)
+    return inserted
+
+
+def _insert(col, docs: List[Dict[str, Any]]) -> int:
+    try:
+        return len(col.insert_many(docs, ordered=False).inserted_ids)
+    except BulkWriteError as e:
+        # 重复运行：已存在的 id 跳过，其它错误照常抛出
+        errors = e.details.get("writeErrors", [])
+        if any(w.get("code") != 11000 for w in errors):
+            raise
+        return e.details.get("nInserted", 0)
+
+
+def generate(
+    count: int,
+    collection: str = "bookdb_large",
+    seed: int = 0,
+    start: int = 0,
+    processes: Optional[int] = None,
+    pictures: float = 0.0,
+    picture_bytes: int = 2048,
+    batch_size: int = 1000,
+    drop: bool = False,
+) -> int:
+    """Insert books start .. start+count-1 into `collection`; returns how many were new."""
+    col = mongo_store.get_db()[collection]
+    if drop:
+        col.drop()
+    col.create_index("id", unique=True)
+    processes = processes or multiprocessing.cpu_count()
+    # 每个任务是整数个 BLOCK，保证各进程生成的书与单进程一致
+    step = BLOCK * max(1, batch_size // BLOCK)
+    tasks = [
+        (collection, lo, min(step, start + count - lo), seed, pictures, picture_bytes, batch_size)
+        for lo in range(start, start + count, step)
+    ]
+    if processes <= 1 or len(tasks) <= 1:
+        return sum(_insert_range(t) for t in tasks)
+    # spawn：子进程各自创建 MongoClient，不继承父进程的连接
+    with multiprocessing.get_context("spawn").Pool(processes) as pool:
+        return sum(pool.imap_unordered(_insert_range, tasks))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Generate a deterministic synthetic book catalog in MongoDB")
+    ap.add_argument("--count", type=int, required=True)
+    ap.add_argument("--collection", default="bookdb_large", help="Target collection (BookDB(large=True) reads bookdb_large)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--start", type=int, default=0, help="First book number, to extend an existing catalog")
+    ap.add_argument("--processes", type=int, default=None)
+    ap.add_argument("--pictures", type=float, default=0.0, help="Share of books with a picture")
+    ap.add_argument("--picture-bytes", type=int, default=2048)
+    ap.add_argument("--batch-size", type=int, default=1000)
+    ap.add_argument("--drop", action="store_true", help="Drop the collection first")
+    args = ap.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    began = time.time()
+    n = generate(
+        args.count, args.collection, args.seed, args.start, args.processes,
+        args.pictures, args.picture_bytes, args.batch_size, args.drop,
+    )
+    elapsed = time.time() - began
+    print("inserted {} books into '{}' in {:.1f}s ({:.0f}/s)".format(n, args.collection, elapsed, n / elapsed if elapsed else 0))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
-import requests
 import simplejson
 from urllib.parse import urljoin
+from fe.access import http_session
 from fe.access.auth import Auth
 
 
@@ -23,7 +23,7 @@ class Buyer:
         # print(simplejson.dumps(json))
         url = urljoin(self.url_prefix, "new_order")
         headers = {"token": self.token}
-        r = requests.post(url, headers=headers, json=json)
+        r = http_session.post(url, headers=headers, json=json)
         response_json = r.json()
         return r.status_code, response_json.get("order_id")
 
@@ -35,7 +35,7 @@ class Buyer:
         }
         url = urljoin(self.url_prefix, "payment")
         headers = {"token": self.token}
-        r = requests.post(url, headers=headers, json=json)
+        r = http_session.post(url, headers=headers, json=json)
         return r.status_code
 
     def add_funds(self, add_value: str) -> int:
@@ -46,19 +46,28 @@ class Buyer:
         }
         url = urljoin(self.url_prefix, "add_funds")
         headers = {"token": self.token}
-        r = requests.post(url, headers=headers, json=json)
+        r = http_session.post(url, headers=headers, json=json)
         return r.status_code
 
     def receive_books(self, order_id: str) -> int:
         json = {"user_id": self.user_id, "order_id": order_id}
         url = urljoin(self.url_prefix, "receive_book")
         headers = {"token": self.token}
-        r = requests.post(url, headers=headers, json=json)
+        r = http_session.post(url, headers=headers, json=json)
         return r.status_code
 
     def cancel_order(self, order_id: str) -> int:
         json = {"user_id": self.user_id, "order_id": order_id}
         url = urljoin(self.url_prefix, "cancel_order")
         headers = {"token": self.token}
-        r = requests.post(url, headers=headers, json=json)
+        r = http_session.post(url, headers=headers, json=json)
         return r.status_code
+
+    def list_orders(self, page: int = 1, size: int = 20, status: str = None) -> tuple[int, dict]:
+        json = {"user_id": self.user_id, "page": page, "size": size}
+        if status:
+            json["status"] = status
+        url = urljoin(self.url_prefix, "orders")
+        headers = {"token": self.token}
+        r = http_session.post(url, headers=headers, json=json)
+        return r.status_code, r.json()
@@ -0,0 +1,94 @@
+"""Shared keep-alive HTTP session for the fe.access clients.
+
+requests.post() builds a throwaway Session per call, so every request opens a
+new TCP connection, and the server is left with a socket in TIME_WAIT. The
+clients call post() here instead. It goes through one requests.Session per
+process, whose HTTPAdapter keeps up to conf.Http_Pool_Size idle connections
+per host, so concurrent bench threads each reuse one.
+
+The session is shared by all threads. urllib3's pool is thread-safe and the
+clients never change session state (headers, auth and cookies are passed per
+request). A forked child builds its own session, because a pooled socket must
+not be shared between processes.
+
+Only connection errors are retried (conf.Http_Retries times). At that point
+nothing has reached the server yet. Read errors and 5xx responses are never
+retried: the API is POST-only and not idempotent, so a replayed new_order or
+payment could apply twice.
+
+conf.Http_Pool = False switches back to one connection per request, which
+fe/bench/http_pool.py uses for its comparison.
+"""
+import os
+import threading
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from fe import conf
+
+_lock = threading.Lock()
+_session: Optional[requests.Session] = None
+_session_pid: Optional[int] = None
+
+
+def _build(pool_size: int, retries: int) -> requests.Session:
+    s = requests.Session()
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=0,
+        status=0,
+        other=0,
+        redirect=0,
+        allowed_methods=None,
+        backoff_factor=0.05,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    return s
+
+
+def get_session() -> requests.Session:
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _lock:
+            if _session is None or _session_pid != pid:
+                _session = _build(conf.Http_Pool_Size, conf.Http_Retries)
+                _session_pid = pid
+    return _session
+
+
+def reset_session() -> None:
+    """Close the pooled connections; the next request builds a new session from conf."""
+    global _session, _session_pid
+    with _lock:
+        if _session is not None and _session_pid == os.getpid():
+            _session.close()
+        _session = None
+        _session_pid = None
+
+
+def connections_opened() -> int:
+    """TCP connections the current pooled session has opened so far."""
+    if _session is None or _session_pid != os.getpid():
+        return 0
+    total = 0
+    for adapter in set(_session.adapters.values()):
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                total += pool.num_connections
+    return total
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    if not conf.Http_Pool:
+        return requests.post(url, **kwargs)
+    return get_session().post(url, **kwargs)
@@ -0,0 +1,13 @@
+from urllib.parse import urljoin
+from fe.access import http_session
+
+
+class Search:
+    def __init__(self, url_prefix):
+        self.url_prefix = urljoin(url_prefix, "search/")
+
+    def keyword(self, keyword: str, filter: dict = None, page: int = 1, size: int = 20) -> (int, dict):
+        json = {"keyword": keyword, "filter": filter or {}, "page": page, "size": size}
+        url = urljoin(self.url_prefix, "keyword")
+        r = http_session.post(url, json=json)
+        return r.status_code, r.json()
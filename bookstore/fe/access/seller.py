@@ -1,5 +1,5 @@
-import requests
 from urllib.parse import urljoin
+from fe.access import http_session
 from fe.access import book
 from fe.access.auth import Auth
 
@@ -22,20 +22,20 @@ class Seller:
         # print(simplejson.dumps(json))
         url = urljoin(self.url_prefix, "create_store")
         headers = {"token": self.token}
-        r = requests.post(url, headers=headers, json=json)
+        r = http_session.post(url, headers=headers, json=json)
         return r.status_code
 
     def add_book(self, store_id: str, stock_level: int, book_info: book.Book) -> int:
         json = {
             "user_id": self.seller_id,
             "store_id": store_id,
-            "book_info": book_info.__dict__,
+            "book_info": book_info.to_dict(),
             "stock_level": stock_level,
         }
         # print(simplejson.dumps(json))
         url = urljoin(self.url_prefix, "add_book")
         headers = {"token": self.token}
-        r = requests.post(url, headers=headers, json=json)
+        r = http_session.post(url, headers=headers, json=json)
         return r.status_code
 
     def add_stock_level(
@@ -50,12 +50,12 @@ class Seller:
         # print(simplejson.dumps(json))
         url = urljoin(self.url_prefix, "add_stock_level")
         headers = {"token": self.token}
-        r = requests.post(url, headers=headers, json=json)
+        r = http_session.post(url, headers=headers, json=json)
         return r.status_code
 
     def send_books(self, order_id: str) -> int:
         json = {"user_id": self.seller_id, "order_id": order_id}
         url = urljoin(self.url_prefix, "send_books")
         headers = {"token": self.token}
-        r = requests.post(url, headers=headers, json=json)
+        r = http_session.post(url, headers=headers, json=json)
         return r.status_code
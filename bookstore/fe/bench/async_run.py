@@ -0,0 +1,161 @@
+"""Asyncio bench: many virtual users in one process and one thread.
+
+Session runs one OS thread per virtual user, so a few hundred users already
+cost a few hundred threads. AsyncRunner runs every virtual user as a
+coroutine on one event loop instead. They share one AsyncClient
+(fe/access/aio.py), which keeps at most --connections keep-alive
+connections. That makes thousands of users affordable. A user loops
+new_order -> payment of the new order, with an optional think time in
+between, until it has sent --requests orders or --duration has passed.
+
+A buyer logs in once, the first time one of its orders comes up. Every login
+replaces the previous token, so per-request logins would invalidate each
+other.
+
+The loop itself can become the bottleneck: JSON encoding and response parsing
+for thousands of users all run on one core. A monitor task sleeps in short
+intervals and records how late it wakes up. The largest delay is reported
+as max_loop_lag_ms. When that is more than a few milliseconds, latency
+includes time spent queued in the client, and more client processes
+(fe.bench.multiproc) are needed rather than more users.
+
+Usage:
+    python -m fe.bench.async_run --users 2000 --connections 64 --duration 30 --json async.json
+    python -m fe.bench.async_run --users 200 --requests 50 --think 0.1
+"""
+import argparse
+import asyncio
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from fe import conf
+from fe.access.aio import AsyncBuyer, AsyncClient
+from fe.bench.stats import BenchStats, format_report
+from fe.bench.workload import Workload
+
+
+class AsyncRunner:
+    def __init__(
+        self,
+        wl: Workload,
+        users: int,
+        duration: Optional[float] = None,
+        requests: Optional[int] = None,
+        connections: int = 64,
+        think: float = 0.0,
+        lag_interval: float = 0.01,
+    ):
+        if duration is None and requests is None:
+            requests = wl.procedure_per_session
+        self.wl = wl
+        self.users = users
+        self.duration = duration
+        self.requests = requests
+        self.connections = connections
+        self.think = think
+        self.lag_interval = lag_interval
+        self._buyers: Dict[str, "asyncio.Task"] = {}
+
+    def run(self) -> Dict[str, Any]:
+        return asyncio.run(self._main())
+
+    async def _main(self) -> Dict[str, Any]:
+        self.stats = BenchStats(start=time.time())
+        self.max_lag = 0.0
+        self._deadline = None if self.duration is None else time.perf_counter() + self.duration
+        async with AsyncClient(conf.URL, limit=self.connections) as client:
+            self.client = client
+            monitor = asyncio.ensure_future(self._monitor_lag())
+            start = time.perf_counter()
+            try:
+                await asyncio.gather(*(self._user() for _ in range(self.users)))
+            finally:
+                monitor.cancel()
+            elapsed = time.perf_counter() - start
+        return self.stats.report(
+            {
+                "mode": "async",
+                "users": self.users,
+                "connections": self.connections,
+                "think_s": self.think,
+                "elapsed_s": round(elapsed, 3),
+                "max_loop_lag_ms": round(self.max_lag * 1000, 3),
+                "threads": threading.active_count(),
+            }
+        )
+
+    async def _monitor_lag(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            before = loop.time()
+            await asyncio.sleep(self.lag_interval)
+            self.max_lag = max(self.max_lag, loop.time() - before - self.lag_interval)
+
+    def _buyer(self, buyer_id: str, password: str) -> "asyncio.Task":
+        # 同一买家的并发请求等待同一个登录任务，每个买家只登录一次
+        task = self._buyers.get(buyer_id)
+        if task is None:
+            task = self._buyers[buyer_id] = asyncio.ensure_future(AsyncBuyer.connect(self.client, buyer_id, password))
+        return task
+
+    def _more(self, sent: int) -> bool:
+        if self._deadline is not None:
+            return time.perf_counter() < self._deadline
+        return sent < self.requests
+
+    async def _timed(self, op: str, call):
+        before = time.perf_counter()
+        try:
+            result = await call
+            code = result[0] if isinstance(result, tuple) else result
+            status, ok = code, code == 200
+        except Exception as e:
+            # 与 Session._timed 一致：异常计为错误，虚拟用户继续运行
+            result, status, ok = None, type(e).__name__, False
+        self.stats.record(op, time.perf_counter() - before, status, ok)
+        return result if ok else None
+
+    async def _user(self) -> None:
+        sent = 0
+        while self._more(sent):
+            sent += 1
+            buyer_id, password, store_id, items = self.wl.new_order_args()
+            try:
+                buyer = await self._buyer(buyer_id, password)
+            except Exception as e:
+                self.stats.record("new_order", 0.0, type(e).__name__, False)
+                continue
+            result = await self._timed("new_order", buyer.new_order(store_id, items))
+            if result is not None:
+                await self._timed("payment", buyer.payment(result[1]))
+            if self.think:
+                await asyncio.sleep(self.think)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Asyncio bench: virtual users as coroutines on one event loop")
+    ap.add_argument("--users", type=int, default=1000, help="Concurrent virtual users")
+    ap.add_argument("--connections", type=int, default=64, help="Keep-alive connections shared by all users")
+    ap.add_argument("--duration", type=float, default=None, help="Run for this many seconds")
+    ap.add_argument("--requests", type=int, default=None, help="Orders per user (default conf.Request_Per_Session)")
+    ap.add_argument("--think", type=float, default=0.0, help="Seconds each user waits between orders")
+    ap.add_argument("--json", dest="json_path", default=None, help="Write the report to this file")
+    args = ap.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    wl = Workload()
+    wl.gen_database()
+    result = AsyncRunner(wl, args.users, args.duration, args.requests, args.connections, args.think).run()
+    print(format_report(result))
+    print("{} users on {} connections, {} threads, max loop lag {} ms".format(
+        result["users"], result["connections"], result["threads"], result["max_loop_lag_ms"]))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
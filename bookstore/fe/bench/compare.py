@@ -0,0 +1,331 @@
+"""Compare two sets of bench reports and flag regressions.
+
+Each side is one or more JSON reports (run.py / multiproc.py / open_loop.py /
+mix.py) of the same workload: a file, a directory of *.json files or a glob.
+For every operation present on both sides the tool compares throughput and the
+latency mean and percentiles, and decides whether the difference is larger
+than the noise:
+
+- Repeat runs (two or more reports on each side): Welch's t-test over the
+  per-run values, with a confidence interval for the difference of the means.
+- A single run on either side: the runs of each side are merged. Percentiles
+  get a distribution-free confidence interval from the histogram (order
+  statistic ranks n*p +- z*sqrt(n*p*(1-p))) and differ when the intervals do
+  not overlap. The mean uses Welch's test on histogram moments, and
+  throughput uses it on the per-window completion counts. The first and last
+  windows are dropped because they are partial.
+
+A metric regresses when it is worse by more than --threshold percent and the
+difference is significant. The command exits with 1 when any gated metric
+(--metrics) regresses, or when an operation named by --ops is missing from
+either side, so it can fail a CI job.
+
+Usage:
+    python -m fe.bench.compare base.json new.json
+    python -m fe.bench.compare runs/base/ runs/new/ --threshold 5 --metrics throughput,p99
+    python -m fe.bench.compare 'base_*.json' 'new_*.json' --ops new_order,payment --json cmp.json
+"""
+import argparse
+import glob
+import json
+import math
+import os
+import statistics
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from fe.bench.stats import LatencyHistogram
+
+LATENCY_METRICS = ("mean", "p50", "p90", "p99", "p99.9")
+METRICS = ("throughput",) + LATENCY_METRICS
+DEFAULT_GATED = ("throughput", "p50", "p99")
+
+
+# ---- Student t 分布（不依赖 scipy） ----
+
+
+def _betacf(a: float, b: float, x: float) -> float:
+    # 不完全 Beta 函数的连分式（Lentz 算法）
+    tiny = 1e-300
+    c, d = 1.0, 1.0 - (a + b) * x / (a + 1.0)
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    h = d
+    for m in range(1, 300):
+        m2 = 2 * m
+        for num in (m * (b - m) * x / ((a + m2 - 1) * (a + m2)), -(a + m) * (a + b + m) * x / ((a + m2) * (a + m2 + 1))):
+            d = 1.0 + num * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + num / c
+            c = c if abs(c) > tiny else tiny
+            h *= d * c
+        if abs(d * c - 1.0) < 1e-12:
+            break
+    return h
+
+
+def _betainc(a: float, b: float, x: float) -> float:
+    """Regularized incomplete beta I_x(a, b)."""
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log(1.0 - x))
+    if x < (a + 1.0) / (a + b + 2.0):
+        return front * _betacf(a, b, x) / a
+    return 1.0 - front * _betacf(b, a, 1.0 - x) / b
+
+
+def t_cdf(t: float, df: float) -> float:
+    tail = 0.5 * _betainc(df / 2.0, 0.5, df / (df + t * t))
+    return 1.0 - tail if t > 0 else tail
+
+
+def t_quantile(q: float, df: float) -> float:
+    """Inverse of t_cdf by bisection; q in (0, 1)."""
+    if q == 0.5:
+        return 0.0
+    if q < 0.5:
+        return -t_quantile(1.0 - q, df)
+    lo, hi = 0.0, 1.0
+    while t_cdf(hi, df) < q:
+        hi *= 2.0
+    for _ in range(100):
+        mid = (lo + hi) / 2.0
+        if t_cdf(mid, df) < q:
+            lo = mid
+        else:
+            hi = mid
+    return (lo + hi) / 2.0
+
+
+def welch(base: Sequence[float], new: Sequence[float], confidence: float) -> Optional[Dict[str, float]]:
+    """CI for mean(new) - mean(base) from two samples; None when either has < 2 values."""
+    if len(base) < 2 or len(new) < 2:
+        return None
+    return welch_moments(
+        statistics.fmean(base), statistics.variance(base), len(base),
+        statistics.fmean(new), statistics.variance(new), len(new),
+        confidence,
+    )
+
+
+def welch_moments(mb: float, vb: float, nb: int, mn: float, vn: float, nn: int, confidence: float) -> Dict[str, float]:
+    diff = mn - mb
+    se2 = vb / nb + vn / nn
+    if se2 <= 0:
+        return {"diff": diff, "low": diff, "high": diff, "significant": diff != 0}
+    se = math.sqrt(se2)
+    # Welch–Satterthwaite 自由度
+    den = (vb / nb) ** 2 / (nb - 1) + (vn / nn) ** 2 / (nn - 1)
+    df = se2 ** 2 / den if den > 0 else float(nb + nn - 2)
+    half = t_quantile(0.5 + confidence / 2.0, df) * se
+    return {"diff": diff, "low": diff - half, "high": diff + half, "significant": abs(diff) > half}
+
+
+# ---- 读取报告 ----
+
+
+def expand(spec: str) -> List[str]:
+    """A file, a directory (its *.json files) or a glob pattern."""
+    if os.path.isdir(spec):
+        paths = sorted(glob.glob(os.path.join(spec, "*.json")))
+    elif os.path.exists(spec):
+        paths = [spec]
+    else:
+        paths = sorted(glob.glob(spec))
+    if not paths:
+        raise ValueError("no bench reports match {}".format(spec))
+    return paths
+
+
+def load_reports(spec: str) -> List[Dict[str, Any]]:
+    reports = []
+    for path in expand(spec):
+        with open(path, encoding="utf-8") as fh:
+            report = json.load(fh)
+        if not isinstance(report, dict) or "operations" not in report:
+            raise ValueError("{} is not a bench report (no 'operations')".format(path))
+        reports.append(report)
+    return reports
+
+
+def _value(op: Dict[str, Any], metric: str) -> float:
+    if metric == "throughput":
+        return float(op["throughput"])
+    return float(op["latency_ms"][metric])
+
+
+def _histogram(reports: List[Dict[str, Any]], name: str) -> LatencyHistogram:
+    merged = None
+    for r in reports:
+        h = LatencyHistogram.from_dict(r["operations"][name]["histogram"])
+        if merged is None:
+            merged = h
+        else:
+            merged.merge(h)
+    return merged
+
+
+def _moments(h: LatencyHistogram) -> Tuple[float, float, int]:
+    """Mean and variance in ms from the bucket midpoints."""
+    mean = h.mean() * 1000
+    if h.count < 2:
+        return mean, 0.0, h.count
+    ss = sum(n * (h._value(i) * 1000 - mean) ** 2 for i, n in h.buckets.items())
+    return mean, ss / (h.count - 1), h.count
+
+
+def _window_rates(reports: List[Dict[str, Any]], name: str) -> List[float]:
+    rates = []
+    for r in reports:
+        windows = r.get("windows") or []
+        step = r.get("window_seconds") or 1.0
+        # 首尾窗口不完整，不计入
+        for w in windows[1:-1]:
+            rates.append(w.get(name, 0) / step)
+    return rates
+
+
+def _quantile_interval(h: LatencyHistogram, p: float, z: float) -> Tuple[float, float]:
+    n = h.count
+    spread = z * math.sqrt(n * (p / 100.0) * (1 - p / 100.0))
+    lo_rank = max(1.0, math.floor(n * p / 100.0 - spread))
+    hi_rank = min(float(n), math.ceil(n * p / 100.0 + spread))
+    return h.percentile(100.0 * lo_rank / n) * 1000, h.percentile(100.0 * hi_rank / n) * 1000
+
+
+def compare_metric(
+    base: List[Dict[str, Any]],
+    new: List[Dict[str, Any]],
+    name: str,
+    metric: str,
+    confidence: float,
+) -> Dict[str, Any]:
+    b_vals = [_value(r["operations"][name], metric) for r in base]
+    n_vals = [_value(r["operations"][name], metric) for r in new]
+    b_mean, n_mean = statistics.fmean(b_vals), statistics.fmean(n_vals)
+    test = None
+    method = "none"
+    if len(base) >= 2 and len(new) >= 2:
+        test, method = welch(b_vals, n_vals, confidence), "welch_runs"
+    elif metric == "throughput":
+        test = welch(_window_rates(base, name), _window_rates(new, name), confidence)
+        method = "welch_windows" if test else "none"
+    else:
+        hb, hn = _histogram(base, name), _histogram(new, name)
+        if hb.count >= 2 and hn.count >= 2:
+            if metric == "mean":
+                test, method = welch_moments(*_moments(hb), *_moments(hn), confidence), "welch_histogram"
+            else:
+                z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2.0)
+                p = float(metric[1:])
+                b_lo, b_hi = _quantile_interval(hb, p, z)
+                n_lo, n_hi = _quantile_interval(hn, p, z)
+                diff = n_mean - b_mean
+                test = {
+                    "diff": diff,
+                    "low": n_lo - b_hi,
+                    "high": n_hi - b_lo,
+                    "significant": n_lo > b_hi or n_hi < b_lo,
+                }
+                method = "quantile_ci"
+    scale = 100.0 / b_mean if b_mean else 0.0
+    delta_pct = (n_mean - b_mean) * scale if b_mean else (0.0 if n_mean == b_mean else math.inf)
+    out = {
+        "base": round(b_mean, 3),
+        "new": round(n_mean, 3),
+        "delta_pct": round(delta_pct, 2),
+        "ci_pct": None,
+        "significant": bool(test and test["significant"]),
+        "method": method,
+        "runs": [len(base), len(new)],
+    }
+    if test and b_mean:
+        out["ci_pct"] = [round(test["low"] * scale, 2), round(test["high"] * scale, 2)]
+    return out
+
+
+def compare(
+    base: List[Dict[str, Any]],
+    new: List[Dict[str, Any]],
+    threshold: float = 5.0,
+    metrics: Sequence[str] = DEFAULT_GATED,
+    ops: Optional[Sequence[str]] = None,
+    confidence: float = 0.95,
+) -> Dict[str, Any]:
+    """Per operation and metric comparison; `regressions` lists the failing gated metrics."""
+    unknown = sorted(set(metrics) - set(METRICS))
+    if unknown:
+        raise ValueError("unknown metrics {}; expected some of {}".format(unknown, list(METRICS)))
+    for side, reports in (("base", base), ("new", new)):
+        if not reports:
+            raise ValueError("no {} reports to compare".format(side))
+    common = set.intersection(*(set(r["operations"]) for r in base + new))
+    names = [o for o in ops if o in common] if ops else sorted(common)
+    rows = []
+    regressions = []
+    for name in names:
+        for metric in METRICS:
+            row = {"op": name, "metric": metric, **compare_metric(base, new, name, metric, confidence)}
+            # 吞吐量越高越好，延迟越低越好
+            worse = -row["delta_pct"] if metric == "throughput" else row["delta_pct"]
+            row["gated"] = metric in metrics
+            row["regression"] = row["gated"] and row["significant"] and worse > threshold
+            if row["regression"]:
+                regressions.append("{} {}".format(name, metric))
+            rows.append(row)
+    return {
+        "threshold_pct": threshold,
+        "confidence": confidence,
+        "metrics": list(metrics),
+        "rows": rows,
+        "missing_ops": sorted(set(ops or []) - common),
+        "regressions": regressions,
+    }
+
+
+def format_comparison(result: Dict[str, Any]) -> str:
+    lines = ["{:<12} {:<10} {:>10} {:>10} {:>8} {:>20} {:>4}".format(
+        "op", "metric", "base", "new", "delta", "{:g}% CI".format(result["confidence"] * 100), "sig")]
+    for r in result["rows"]:
+        ci = "[{:+.1f}%, {:+.1f}%]".format(*r["ci_pct"]) if r["ci_pct"] else "n/a"
+        lines.append("{:<12} {:<10} {:>10} {:>10} {:>+7.1f}% {:>20} {:>4}{}".format(
+            r["op"], r["metric"], r["base"], r["new"], r["delta_pct"], ci,
+            "yes" if r["significant"] else "no", "  REGRESSION" if r["regression"] else ""))
+    if result["missing_ops"]:
+        lines.append("missing on one side: {}".format(", ".join(result["missing_ops"])))
+    lines.append("{} regression(s) over {}%".format(len(result["regressions"]), result["threshold_pct"]))
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Compare bench reports; exit 1 on a significant regression")
+    ap.add_argument("base", help="Base report: a file, a directory of *.json or a glob (several = repeat runs)")
+    ap.add_argument("new", help="New report(s), same forms as base")
+    ap.add_argument("--threshold", type=float, default=5.0, help="Percent a gated metric may get worse")
+    ap.add_argument("--metrics", default=",".join(DEFAULT_GATED), help="Gated metrics, from {}".format(",".join(METRICS)))
+    ap.add_argument("--ops", default="", help="Comma separated operations to compare (default: all common)")
+    ap.add_argument("--confidence", type=float, default=0.95)
+    ap.add_argument("--json", dest="json_path", default=None, help="Write the comparison to this file")
+    args = ap.parse_args(argv)
+
+    try:
+        result = compare(
+            load_reports(args.base),
+            load_reports(args.new),
+            args.threshold,
+            [m for m in args.metrics.split(",") if m],
+            [o for o in args.ops.split(",") if o] or None,
+            args.confidence,
+        )
+    except ValueError as e:
+        ap.error(str(e))
+    print(format_comparison(result))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, indent=2)
+    # 改名或删除的操作不能悄悄通过门禁
+    return 1 if result["regressions"] or result["missing_ops"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,123 @@
+"""Pooled vs unpooled HTTP: the same closed-loop bench with and without keep-alive.
+
+The workload is loaded once. The same number of sessions then runs
+new_order + payment in two modes. With conf.Http_Pool = False every request
+opens its own TCP connection, as requests.post does. The pooled mode uses the
+shared session from fe/access/http_session.py. Each mode runs --rounds times,
+and the order alternates because every run leaves more orders behind. The
+report has both modes, the throughput ratio per operation and the connections
+each mode opened.
+
+Usage:
+    python -m fe.bench.http_pool --sessions 8 --requests 500 --rounds 4 --json http_pool.json
+"""
+import argparse
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from fe import conf
+from fe.access import http_session
+from fe.bench.session import Session
+from fe.bench.stats import BenchStats, format_report
+from fe.bench.workload import Workload
+
+
+def _run(wl: Workload, sessions: int, pooled: bool) -> Dict[str, Any]:
+    old = conf.Http_Pool
+    conf.Http_Pool = pooled
+    http_session.reset_session()
+    try:
+        # 先生成请求（买家已登录并缓存），再统一开始计时
+        ss = [Session(wl) for _ in range(sessions)]
+        wl.bench_start = time.time()
+        began = time.perf_counter()
+        for s in ss:
+            s.start()
+        for s in ss:
+            s.join()
+        elapsed = time.perf_counter() - began
+        stats = BenchStats.merged([s.stats for s in ss])
+        sent = sum(h.count for h in stats.latency.values())
+        # 不复用连接时每个请求都新建一条 TCP 连接
+        connections = http_session.connections_opened() if pooled else sent
+        return {"stats": stats, "elapsed": elapsed, "requests": sent, "connections": connections}
+    finally:
+        http_session.reset_session()
+        conf.Http_Pool = old
+
+
+def _combine(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    elapsed = sum(r["elapsed"] for r in runs)
+    report = BenchStats.merged([r["stats"] for r in runs]).report()
+    # 各轮之间隔着另一种模式的运行，吞吐量按本模式自己的运行时间计算
+    for op, o in report["operations"].items():
+        o["throughput"] = round(o["ok"] / elapsed, 3) if elapsed else 0.0
+    report["elapsed_s"] = round(elapsed, 3)
+    report["requests"] = sum(r["requests"] for r in runs)
+    report["connections_opened"] = sum(r["connections"] for r in runs)
+    return report
+
+
+def compare_pooling(
+    sessions: int,
+    requests: Optional[int] = None,
+    wl: Optional[Workload] = None,
+    rounds: int = 2,
+) -> Dict[str, Any]:
+    """Run both modes `rounds` times each, alternating which goes first.
+
+    Every run adds orders, and the later runs get slower as the collections
+    grow. The order alternates (ABBA), so neither mode always gets the emptier
+    database.
+    """
+    if wl is None:
+        wl = Workload()
+        wl.gen_database()
+    if requests:
+        wl.procedure_per_session = requests
+    runs: Dict[bool, List[Dict[str, Any]]] = {False: [], True: []}
+    for i in range(max(1, rounds)):
+        for pooled in ((False, True) if i % 2 == 0 else (True, False)):
+            runs[pooled].append(_run(wl, sessions, pooled))
+    unpooled, pooled = _combine(runs[False]), _combine(runs[True])
+    speedup = {}
+    for op, o in pooled["operations"].items():
+        base = unpooled["operations"].get(op, {}).get("throughput")
+        if base:
+            speedup[op] = round(o["throughput"] / base, 3)
+    return {
+        "mode": "http_pool",
+        "sessions": sessions,
+        "requests_per_session": wl.procedure_per_session,
+        "rounds": max(1, rounds),
+        "pool_size": conf.Http_Pool_Size,
+        "unpooled": unpooled,
+        "pooled": pooled,
+        "throughput_ratio": speedup,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Compare bench throughput with and without pooled keep-alive HTTP")
+    ap.add_argument("--sessions", type=int, default=conf.Session)
+    ap.add_argument("--requests", type=int, default=None, help="Orders per session (default conf.Request_Per_Session)")
+    ap.add_argument("--rounds", type=int, default=2, help="Runs per mode, alternating which mode goes first")
+    ap.add_argument("--json", dest="json_path", default=None, help="Write both reports to this file")
+    args = ap.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    result = compare_pooling(args.sessions, args.requests, rounds=args.rounds)
+    for name in ("unpooled", "pooled"):
+        r = result[name]
+        print("== {} ({} requests, {} connections)".format(name, r["requests"], r["connections_opened"]))
+        print(format_report(r))
+    print("throughput pooled / unpooled: {}".format(result["throughput_ratio"]))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""Replay Search.search query shapes, record explain() plans and propose indexes.
+
+Every shape in the corpus is a (keyword, Filter) pair. The tool turns it into the
+exact Mongo query `Search.search` sends (`Search._base_query` + `SORT_KEYS`),
+runs `explain()` and records keys/docs examined, whether the winning plan
+needs an in-memory SORT stage and whether it is covered (no FETCH). Proposals
+follow the ESR rule: equality fields, then the sort keys, then range fields.
+With --bytes it also reports the BSON bytes each shape returns with the old
+full projection (book_info included) and with LISTING_PROJECTION.
+
+Usage:
+    # explain the corpus against the current indexes
+    python -m fe.bench.index_advisor
+    # before/after: hide the shipped ESR indexes for the baseline, build missing
+    # proposals, then explain again with everything visible
+    python -m fe.bench.index_advisor --hide inv_store_listing,inv_isbn_sort --apply --json report.json
+    # bytes transferred per query, full vs listing projection
+    python -m fe.bench.index_advisor --bytes
+"""
+import argparse
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+
+from be.model import mongo_store
+from be.model.slow_ops import summarize_explain  # shared with the slow-op log
+from be.model.search_mongo import FULL_PROJECTION, LISTING_PROJECTION, Filter, Search, SORT_KEYS
+
+IndexKeys = List[Tuple[str, int]]
+
+# Fields Search.search matches by equality; everything else in the base query is a range
+EQUALITY_FIELDS = ("store_id", "isbn")
+
+
+@dataclass
+class QueryShape:
+    name: str
+    keyword: str = ""
+    filter: Filter = field(default_factory=Filter)
+
+
+def default_corpus(store_id: str, isbn: str) -> List[QueryShape]:
+    """Filter combinations seen from the search view, with literal values from live data."""
+
+    def f(**kw) -> Filter:
+        flt = Filter()
+        for k, v in kw.items():
+            setattr(flt, k, v)
+        return flt
+
+    return [
+        QueryShape("all_sorted"),
+        QueryShape("store", filter=f(store_id=store_id)),
+        QueryShape("store_price", filter=f(store_id=store_id, price=[1000, 1300])),
+        QueryShape("store_stock", filter=f(store_id=store_id, stock_level=[1, None])),
+        QueryShape("store_price_stock", filter=f(store_id=store_id, price=[None, 1200], stock_level=[1, None])),
+        QueryShape("store_pages_year", filter=f(store_id=store_id, pages=[150, 300], publish_date=[2000, 2030])),
+        QueryShape("isbn", filter=f(isbn=isbn)),
+        QueryShape("store_isbn", filter=f(store_id=store_id, isbn=isbn)),
+        QueryShape("price_only", filter=f(price=[1000, 1100])),
+        QueryShape("store_keyword", keyword="Sample", filter=f(store_id=store_id)),
+    ]
+
+
+def propose_index(query: Dict[str, Any], sort: IndexKeys = SORT_KEYS) -> Optional[IndexKeys]:
+    """ESR key order for a query; None when only a text index can serve it."""
+    if "$text" in query:
+        return None
+    keys: IndexKeys = [(k, 1) for k in EQUALITY_FIELDS if k in query and not isinstance(query[k], dict)]
+    keys += [(k, d) for k, d in sort if k not in dict(keys)]
+    keys += [(k, 1) for k, v in query.items() if isinstance(v, dict) and k not in dict(keys)]
+    return keys
+
+
+def merge_proposals(proposals: Iterable[Optional[IndexKeys]]) -> List[IndexKeys]:
+    """Drop duplicates and any proposal that is a prefix of a longer one."""
+    unique: List[IndexKeys] = []
+    for p in proposals:
+        if p and p not in unique:
+            unique.append(p)
+    return [p for p in unique if not any(len(o) > len(p) and o[: len(p)] == p for o in unique)]
+
+
+def _is_served(keys: IndexKeys, existing: Iterable[IndexKeys], sort: IndexKeys = SORT_KEYS) -> bool:
+    """True if an index has the equality + sort prefix and holds every range field after it."""
+    names = [k for k, _ in keys]
+    # range fields follow the last sort key, so (as in ESR generally) they bound
+    # the scan by key filtering wherever they sit after it
+    fixed = max((names.index(k) + 1 for k, _ in sort if k in names), default=len(keys))
+    prefix, ranges = keys[:fixed], {k for k, _ in keys[fixed:]}
+    for e in existing:
+        if e[:fixed] == prefix and ranges <= {k for k, _ in e[fixed:]}:
+            return True
+    return False
+
+
+def _existing_indexes(col) -> Dict[str, IndexKeys]:
+    out: Dict[str, IndexKeys] = {}
+    for name, info in col.index_information().items():
+        out[name] = [(k, d) for k, d in info.get("key", [])]
+    return out
+
+
+def _set_hidden(db, collection: str, names: Iterable[str], hidden: bool) -> List[str]:
+    done = []
+    for name in names:
+        try:
+            db.command("collMod", collection, index={"name": name, "hidden": hidden})
+            done.append(name)
+        except Exception:
+            # index missing or server < 4.4: nothing to hide
+            pass
+    return done
+
+
+def _shape_query(search: Search, shape: QueryShape) -> Dict[str, Any]:
+    query = search._base_query(shape.filter)
+    if shape.keyword:
+        query["$text"] = {"$search": shape.keyword}
+    return query
+
+
+def explain_corpus(search: Search, corpus: List[QueryShape]) -> List[Dict[str, Any]]:
+    rows = []
+    for shape in corpus:
+        query = _shape_query(search, shape)
+        started = time.perf_counter()
+        explain = search.col_inventory.find(query, projection=LISTING_PROJECTION).sort(SORT_KEYS).explain()
+        row = {"shape": shape.name, "query_fields": sorted(query.keys())}
+        row.update(summarize_explain(explain))
+        row["wall_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        row["proposal"] = propose_index(query)
+        rows.append(row)
+    return rows
+
+
+def wire_bytes(search: Search, corpus: List[QueryShape]) -> List[Dict[str, Any]]:
+    """BSON bytes returned per shape with the full and the listing projection."""
+    raw = search.col_inventory.with_options(codec_options=CodecOptions(document_class=RawBSONDocument))
+    rows = []
+    for shape in corpus:
+        query = _shape_query(search, shape)
+        row: Dict[str, Any] = {"shape": shape.name}
+        for key, projection in (("bytes_full", FULL_PROJECTION), ("bytes_listing", LISTING_PROJECTION)):
+            n = 0
+            total = 0
+            for doc in raw.find(query, projection=projection).sort(SORT_KEYS):
+                n += 1
+                total += len(doc.raw)
+            row[key] = total
+            row["n"] = n
+        rows.append(row)
+    return rows
+
+
+def _sample_literals(col) -> Tuple[str, str]:
+    doc = col.find_one({"store_id": {"$ne": None}, "isbn": {"$ne": None}}, {"store_id": 1, "isbn": 1}) or {}
+    return doc.get("store_id") or "store_none", doc.get("isbn") or "isbn_none"
+
+
+def analyze(
+    corpus: Optional[List[QueryShape]] = None,
+    hide: Iterable[str] = (),
+    apply: bool = False,
+    measure_bytes: bool = False,
+) -> Dict[str, Any]:
+    """Explain the corpus before and after; returns a JSON-serializable report."""
+    search = Search()
+    col = search.col_inventory
+    if corpus is None:
+        corpus = default_corpus(*_sample_literals(col))
+
+    hidden = _set_hidden(search.mongo_db, col.name, hide, True)
+    try:
+        before = explain_corpus(search, corpus)
+    finally:
+        _set_hidden(search.mongo_db, col.name, hidden, False)
+
+    existing = _existing_indexes(col)
+    proposals = merge_proposals(r["proposal"] for r in before)
+    missing = [p for p in proposals if not _is_served(p, existing.values())]
+    created = []
+    if apply:
+        for keys in missing:
+            created.append(col.create_index(keys))
+    after = explain_corpus(search, corpus) if (apply or hidden) else []
+    return {
+        "hidden_for_baseline": hidden,
+        "proposals": proposals,
+        "missing": missing,
+        "created": created,
+        "before": before,
+        "after": after,
+        "bytes": wire_bytes(search, corpus) if measure_bytes else [],
+    }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = []
+    after = {r["shape"]: r for r in report.get("after", [])}
+    header = "{:<20} {:>8} {:>8} {:>6} {:>5} {:>7}".format("shape", "keys", "docs", "nret", "sort", "covered")
+    lines.append(header + ("   -> after keys/docs/sort" if after else ""))
+    for r in report["before"]:
+        line = "{:<20} {:>8} {:>8} {:>6} {:>5} {:>7}".format(
+            r["shape"],
+            r["keys_examined"],
+            r["docs_examined"],
+            r["n_returned"],
+            "MEM" if r["in_memory_sort"] else "idx",
+            "yes" if r["covered"] else "no",
+        )
+        a = after.get(r["shape"])
+        if a:
+            line += "   -> {}/{}/{}".format(a["keys_examined"], a["docs_examined"], "MEM" if a["in_memory_sort"] else "idx")
+        lines.append(line)
+    for b in report.get("bytes", []):
+        per_query = "{:<20} bytes/query full={} listing={} ({} docs)".format(
+            b["shape"], b["bytes_full"], b["bytes_listing"], b["n"]
+        )
+        lines.append(per_query)
+    for keys in report["proposals"]:
+        flag = "missing" if keys in report["missing"] else "served"
+        lines.append("proposal [{}]: {}".format(flag, ", ".join(k for k, _ in keys)))
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Explain Search.search query shapes and propose compound indexes")
+    ap.add_argument("--hide", default="", help="Comma separated index names hidden while measuring the baseline")
+    ap.add_argument("--apply", action="store_true", help="Create missing proposals and re-explain")
+    ap.add_argument("--bytes", action="store_true", help="Report BSON bytes returned per shape, full vs listing projection")
+    ap.add_argument("--json", dest="json_path", default=None, help="Write the full report to this file")
+    args = ap.parse_args(argv)
+
+    hide = [n for n in args.hide.split(",") if n]
+    report = analyze(hide=hide, apply=args.apply, measure_bytes=args.bytes)
+    print(format_report(report))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=2)
+    print("db:", mongo_store.get_db_name())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""Model-layer microbenchmarks: database cost without Flask, HTTP or JSON.
+
+Each benchmark calls one model method in a loop on a dataset of a chosen
+scale:
+
+    new_order      Buyer.new_order with 1-3 books from one store
+    payment        Buyer.payment of orders created (untimed) just before
+    list_orders    Buyer.list_orders, first page, for users with orders_per_user orders
+    add_book       Seller.add_book of a new book into a store of books_per_store books
+    search         Search.search with a keyword matching `selectivity` of a store's books
+    check_token    User.check_token with a fresh login token
+
+It reports ops/s, latency percentiles and MongoDB round trips per call. A
+pymongo CommandListener counts the commands each call sends. The listener
+has to be registered before the client is created, which main() does.
+
+Running the same methods through fe/bench (HTTP) and comparing shows how much
+of a request is framework overhead. Reports use the operations layout of
+the other bench reports, so fe.bench.compare can diff two runs.
+
+The data is written directly to MONGO_URI / MONGO_DB and tagged with a run
+uuid. --keep leaves it in place; by default it is removed afterwards.
+
+Usage:
+    python -m fe.bench.micro --scale small
+    python -m fe.bench.micro --scale medium --only search,list_orders --json micro.json
+    python -m fe.bench.micro --scale small --books-per-store 5000 --selectivity 0.2
+"""
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, replace
+from typing import Any, Dict, List, Optional
+
+from pymongo import monitoring
+
+from fe.bench.stats import BenchStats, format_report
+
+# 探测关键字：按 selectivity 比例出现在书名里
+NEEDLE = "needle"
+
+
+@dataclass
+class Scale:
+    stores: int
+    books_per_store: int
+    users: int
+    orders_per_user: int
+    selectivity: float
+    iterations: int
+
+
+SCALES: Dict[str, Scale] = {
+    "small": Scale(stores=2, books_per_store=200, users=10, orders_per_user=20, selectivity=0.05, iterations=200),
+    "medium": Scale(stores=4, books_per_store=2000, users=50, orders_per_user=100, selectivity=0.01, iterations=1000),
+    "large": Scale(stores=8, books_per_store=20000, users=200, orders_per_user=500, selectivity=0.001, iterations=2000),
+}
+
+
+class RoundTripCounter(monitoring.CommandListener):
+    """Counts commands started by the calling thread (sync pymongo notifies inline)."""
+
+    def __init__(self):
+        self._local = threading.local()
+        self.seen = False
+
+    def count(self) -> int:
+        return getattr(self._local, "n", 0)
+
+    def started(self, event):
+        self.seen = True
+        self._local.n = self.count() + 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+class MicroBench:
+    def __init__(self, scale: Scale, counter: Optional[RoundTripCounter] = None, seed: int = 0):
+        # 模型层只在这里导入：压测端直接连后端的数据库
+        from be.model import buyer_mongo, search_mongo, seller_mongo, user_mongo
+
+        self.scale = scale
+        self.counter = counter
+        self.rng = random.Random(seed)
+        self.uuid = str(uuid.uuid1())
+        self.user = user_mongo.User()
+        self.buyer = buyer_mongo.Buyer()
+        self.seller = seller_mongo.Seller()
+        # 与 be/view/search.py 相同的实现，不经过 be.model.search 的兼容层
+        self.search_model = search_mongo.Search()
+        self.Filter = search_mongo.Filter
+        self.seller_id = "micro_seller_{}".format(self.uuid)
+        self.user_ids = ["micro_buyer_{}_{}".format(i, self.uuid) for i in range(scale.users)]
+        self.store_ids = ["micro_store_{}_{}".format(i, self.uuid) for i in range(scale.stores)]
+        self.book_ids = ["micro_bk_{:06d}".format(i) for i in range(scale.books_per_store)]
+        self._new_books = 0
+
+    def _book(self, book_id: str, i: int) -> str:
+        every = max(1, round(1 / self.scale.selectivity)) if self.scale.selectivity > 0 else 0
+        title = "{} {}".format(NEEDLE if every and i % every == 0 else "plain", i)
+        info = {"id": book_id, "title": title, "author": "author {}".format(i % 97), "isbn": "978{:010d}".format(i),
+                "price": 1000 + i % 5000, "pages": 100 + i % 400, "pub_year": str(1990 + i % 30), "tags": ["micro"]}
+        return json.dumps(info)
+
+    def _ok(self, result, what: str):
+        if result[0] != 200:
+            raise RuntimeError("{} failed during setup: {} {}".format(what, result[0], result[1]))
+        return result
+
+    def setup(self) -> None:
+        s = self.scale
+        logging.info("micro setup %s: %s", self.uuid, asdict(s))
+        self._ok(self.user.register(self.seller_id, "pw"), "register seller")
+        rows = [(b, self._book(b, i)) for i, b in enumerate(self.book_ids)]
+        for store_id in self.store_ids:
+            self._ok(self.seller.create_store(self.seller_id, store_id), "create_store")
+            for k in range(0, len(rows), 1000):
+                self._ok(self.seller.add_books(self.seller_id, store_id, rows[k : k + 1000], 10 ** 9), "add_books")
+        for user_id in self.user_ids:
+            self._ok(self.user.register(user_id, "pw"), "register buyer")
+            self._ok(self.buyer.add_funds(user_id, "pw", 10 ** 12), "add_funds")
+            for _ in range(s.orders_per_user):
+                self._ok(self.buyer.new_order(user_id, self.rng.choice(self.store_ids), self._items()), "new_order")
+
+    def cleanup(self) -> None:
+        db = self.user.mongo_db
+        order_ids = [d["_id"] for d in db["orders"].find({"user_id": {"$in": self.user_ids}}, {"_id": 1})]
+        db["order_details"].delete_many({"order_id": {"$in": order_ids}})
+        db["order_status"].delete_many({"user_id": {"$in": self.user_ids}})
+        db["orders"].delete_many({"user_id": {"$in": self.user_ids}})
+        db["inventory"].delete_many({"store_id": {"$in": self.store_ids}})
+        db["stores"].delete_many({"_id": {"$in": self.store_ids}})
+        db["user"].delete_many({"_id": {"$in": self.user_ids + [self.seller_id]}})
+
+    def _items(self):
+        books = self.rng.sample(self.book_ids, min(len(self.book_ids), self.rng.randint(1, 3)))
+        return [(b, 1) for b in books]
+
+    # 每个基准返回 (准备函数, 被计时的调用)；准备部分不计时
+    def bench_new_order(self):
+        return None, lambda: self.buyer.new_order(self.rng.choice(self.user_ids), self.rng.choice(self.store_ids), self._items())
+
+    def bench_payment(self):
+        pending: List = []
+
+        def prepare(n):
+            for _ in range(n):
+                user_id = self.rng.choice(self.user_ids)
+                order_id = self._ok(self.buyer.new_order(user_id, self.rng.choice(self.store_ids), self._items()), "new_order")[2]
+                pending.append((user_id, order_id))
+
+        def call():
+            user_id, order_id = pending.pop()
+            return self.buyer.payment(user_id, "pw", order_id)
+
+        return prepare, call
+
+    def bench_list_orders(self):
+        return None, lambda: self.buyer.list_orders(self.rng.choice(self.user_ids), 1, 20)
+
+    def bench_add_book(self):
+        def call():
+            self._new_books += 1
+            book_id = "micro_new_{:08d}".format(self._new_books)
+            return self.seller.add_book(self.seller_id, self.rng.choice(self.store_ids), book_id,
+                                        self._book(book_id, self._new_books), 10)
+
+        return None, call
+
+    def bench_search(self):
+        return None, lambda: self.search_model.search(NEEDLE, self.Filter(store_id=self.rng.choice(self.store_ids)))
+
+    def bench_check_token(self):
+        tokens = {}
+
+        def prepare(n):
+            for user_id in self.user_ids:
+                tokens[user_id] = self._ok(self.user.login(user_id, "pw", "micro"), "login")[2]
+
+        def call():
+            user_id = self.rng.choice(self.user_ids)
+            return self.user.check_token(user_id, tokens[user_id])
+
+        return prepare, call
+
+    def run_one(self, name: str, iterations: int) -> Dict[str, Any]:
+        prepare, call = getattr(self, "bench_" + name)()
+        if prepare is not None:
+            prepare(iterations)
+        stats = BenchStats()
+        round_trips = 0
+        started = time.perf_counter()
+        for _ in range(iterations):
+            before_rt = self.counter.count() if self.counter else 0
+            t0 = time.perf_counter()
+            result = call()
+            t1 = time.perf_counter()
+            if self.counter:
+                round_trips += self.counter.count() - before_rt
+            stats.record(name, t1 - t0, result[0], result[0] == 200)
+        elapsed = time.perf_counter() - started
+        op = stats.report()["operations"][name]
+        op["throughput"] = round(op["ok"] / elapsed, 3) if elapsed > 0 else 0.0
+        op["round_trips_per_call"] = round(round_trips / iterations, 2) if self.counter and self.counter.seen else None
+        return op
+
+
+BENCHMARKS = ("new_order", "payment", "list_orders", "add_book", "search", "check_token")
+
+
+def run_suite(
+    scale: Scale,
+    only: Optional[List[str]] = None,
+    counter: Optional[RoundTripCounter] = None,
+    keep: bool = False,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    names = list(only or BENCHMARKS)
+    unknown = sorted(set(names) - set(BENCHMARKS))
+    if unknown:
+        raise ValueError("unknown benchmarks {}; expected some of {}".format(unknown, list(BENCHMARKS)))
+    mb = MicroBench(scale, counter, seed)
+    started = time.time()
+    try:
+        mb.setup()
+        operations = {name: mb.run_one(name, scale.iterations) for name in names}
+    finally:
+        if not keep:
+            mb.cleanup()
+    return {
+        "mode": "micro",
+        "started_at": started,
+        "duration_s": round(time.time() - started, 3),
+        "scale": asdict(scale),
+        "uuid": mb.uuid,
+        "operations": operations,
+    }
+
+
+def _add_round_trips(report: Dict[str, Any]) -> str:
+    lines = [format_report(report), "", "{:<12} {:>12}".format("op", "round trips")]
+    for name, op in report["operations"].items():
+        rt = op.get("round_trips_per_call")
+        lines.append("{:<12} {:>12}".format(name, "n/a" if rt is None else rt))
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Model-layer microbenchmarks (no HTTP)")
+    ap.add_argument("--scale", choices=sorted(SCALES), default="small")
+    ap.add_argument("--only", default="", help="Comma separated subset of {}".format(",".join(BENCHMARKS)))
+    for field in ("stores", "books_per_store", "users", "orders_per_user", "iterations"):
+        ap.add_argument("--" + field.replace("_", "-"), type=int, default=None, help="Override the scale's " + field)
+    ap.add_argument("--selectivity", type=float, default=None, help="Share of a store's books the search keyword matches")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--keep", action="store_true", help="Leave the generated data in the database")
+    ap.add_argument("--json", dest="json_path", default=None, help="Write the report to this file")
+    args = ap.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    overrides = {k: v for k, v in vars(args).items() if k in Scale.__dataclass_fields__ and v is not None}
+    scale = replace(SCALES[args.scale], **overrides)
+    # 必须在第一次创建 MongoClient 之前注册监听器
+    counter = RoundTripCounter()
+    monitoring.register(counter)
+    report = run_suite(scale, [n for n in args.only.split(",") if n] or None, counter, args.keep, args.seed)
+    print(_add_round_trips(report))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
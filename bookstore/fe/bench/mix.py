@@ -0,0 +1,309 @@
+"""Weighted operation mixes for the bench.
+
+run.py only sends new_order + payment. A profile describes the rest of the
+traffic as weights over operations:
+
+    search        /search/keyword with a keyword from KeywordPool, optionally store scoped
+    list_orders   /buyer/orders, first page
+    add_funds     /buyer/add_funds
+    checkout      new_order then payment
+    lifecycle     new_order, payment, send_books (store owner), receive_book
+    hot_checkout  checkout of one copy of one of `hot_items` books in the first store
+
+Each HTTP call is recorded under its endpoint name (new_order, payment,
+send_books, ...) so the report has percentiles per endpoint, whichever flow
+issued it.
+
+Profiles are JSON, or YAML when PyYAML is installed:
+
+    {"name": "my-mix",
+     "weights": {"search": 60, "list_orders": 20, "checkout": 20},
+     "search": {"store_scoped": 0.5, "page_size": 20, "miss_ratio": 0.05, "skew": 1.0},
+     "add_funds": 10000,
+     "hot_items": 1}
+
+Usage:
+    python -m fe.bench.mix --profile browse-heavy --sessions 8 --duration 60 --json mix.json
+    python -m fe.bench.mix --profile my_mix.json --sessions 4 --requests 500
+"""
+import argparse
+import copy
+import json
+import logging
+import random
+import threading
+import time
+from itertools import accumulate
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from fe import conf
+from fe.access import search as access_search
+from fe.bench.stats import BenchStats, format_report
+from fe.bench.workload import Workload
+
+OPERATIONS = ("search", "list_orders", "add_funds", "checkout", "lifecycle", "hot_checkout")
+
+SEARCH_DEFAULTS = {"store_scoped": 0.5, "page_size": 20, "miss_ratio": 0.05, "skew": 1.0}
+
+PROFILES: Dict[str, Dict[str, Any]] = {
+    # 浏览为主：大部分是搜索和订单列表
+    "browse-heavy": {
+        "name": "browse-heavy",
+        "weights": {"search": 70, "list_orders": 15, "checkout": 10, "add_funds": 5},
+    },
+    # 下单为主：包括完整的发货/收货流程
+    "checkout-heavy": {
+        "name": "checkout-heavy",
+        "weights": {"checkout": 45, "lifecycle": 25, "search": 20, "list_orders": 5, "add_funds": 5},
+    },
+    # 秒杀：大量买家抢同一本书，考察 stock_level 上的写冲突
+    "flash-sale": {
+        "name": "flash-sale",
+        "weights": {"hot_checkout": 70, "search": 20, "list_orders": 10},
+        "search": {"store_scoped": 1.0},
+        "hot_items": 1,
+    },
+}
+
+
+def validate_profile(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """Check a profile and fill in defaults; raises ValueError."""
+    if not isinstance(profile, dict):
+        raise ValueError("profile must be a mapping")
+    weights = profile.get("weights")
+    if not isinstance(weights, dict) or not weights:
+        raise ValueError("profile needs a non-empty 'weights' mapping")
+    unknown = sorted(set(weights) - set(OPERATIONS))
+    if unknown:
+        raise ValueError("unknown operations {}; expected some of {}".format(unknown, list(OPERATIONS)))
+    try:
+        weights = {op: float(w) for op, w in weights.items()}
+    except (TypeError, ValueError):
+        raise ValueError("operation weights must be numbers")
+    if any(w < 0 for w in weights.values()) or not any(weights.values()):
+        raise ValueError("operation weights must be >= 0 and not all zero")
+    out = dict(profile)
+    out["name"] = str(profile.get("name") or "custom")
+    out["weights"] = {op: w for op, w in weights.items() if w > 0}
+    out["search"] = {**SEARCH_DEFAULTS, **(profile.get("search") or {})}
+    out["add_funds"] = int(profile.get("add_funds", 10000))
+    out["hot_items"] = int(profile.get("hot_items", 1 if "hot_checkout" in out["weights"] else 0))
+    if "hot_checkout" in out["weights"] and out["hot_items"] < 1:
+        raise ValueError("hot_checkout needs hot_items >= 1")
+    return out
+
+
+def load_profile(name_or_path: str) -> Dict[str, Any]:
+    """A built-in profile name, or a .json / .yaml / .yml file."""
+    if name_or_path in PROFILES:
+        return validate_profile(copy.deepcopy(PROFILES[name_or_path]))
+    with open(name_or_path, encoding="utf-8") as fh:
+        text = fh.read()
+    if name_or_path.endswith((".yaml", ".yml")):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError("PyYAML is not installed; write the profile as JSON instead")
+        data = yaml.safe_load(text)
+    else:
+        data = json.loads(text)
+    return validate_profile(data)
+
+
+class KeywordPool:
+    """Search keywords drawn from BookDB titles and tags with Zipf-like popularity.
+
+    The first keywords are the most popular; with skew s the i-th one is picked
+    with weight 1 / (i + 1) ** s. A `miss_ratio` share of searches use a keyword
+    that matches nothing.
+    """
+
+    def __init__(self, keywords: Iterable[str], skew: float = 1.0, miss_ratio: float = 0.0):
+        self.keywords = list(dict.fromkeys(k for k in keywords if k))
+        if not self.keywords:
+            raise ValueError("keyword pool is empty")
+        self.miss_ratio = miss_ratio
+        self._cum = list(accumulate(1.0 / (i + 1) ** skew for i in range(len(self.keywords))))
+
+    @classmethod
+    def from_books(cls, books, seed: Optional[int] = None, **kw) -> "KeywordPool":
+        words: List[str] = []
+        for b in books:
+            title = (getattr(b, "title", "") or "").strip()
+            words.append(title)
+            words.extend(title.split())
+            words.extend(str(t) for t in (getattr(b, "tags", None) or []))
+        words = list(dict.fromkeys(w for w in words if w))
+        # 热门词随机分布在书目中，而不是总是排在前面的几本书
+        random.Random(seed).shuffle(words)
+        return cls(words, **kw)
+
+    @classmethod
+    def from_bookdb(cls, book_db, limit: int = 500, **kw) -> "KeywordPool":
+        return cls.from_books(book_db.get_book_info(0, limit), **kw)
+
+    def sample(self, rng: random.Random) -> str:
+        if self.miss_ratio and rng.random() < self.miss_ratio:
+            return "zz_no_such_book_{}".format(rng.randint(0, 1 << 30))
+        return rng.choices(self.keywords, cum_weights=self._cum)[0]
+
+
+class MixSession(threading.Thread):
+    """Runs profile operations until `duration` elapses or `requests` operations are done."""
+
+    def __init__(
+        self,
+        wl: Workload,
+        profile: Dict[str, Any],
+        keywords: KeywordPool,
+        duration: Optional[float] = None,
+        requests: Optional[int] = None,
+        seed: Optional[int] = None,
+    ):
+        threading.Thread.__init__(self)
+        self.workload = wl
+        self.profile = profile
+        self.keywords = keywords
+        self.duration = duration
+        self.requests = requests if requests is not None else wl.procedure_per_session
+        self.rng = random.Random(seed)
+        self.ops = list(profile["weights"])
+        self.cum_weights = list(accumulate(profile["weights"][op] for op in self.ops))
+        self.searcher = access_search.Search(conf.URL)
+        self.hot = [(wl.store_ids[0], b) for b in wl.book_ids[wl.store_ids[0]][: profile["hot_items"]]] if profile["hot_items"] else []
+        self.stats = BenchStats(start=wl.bench_start)
+        self.op_counts: Dict[str, int] = {}
+
+    def pick(self) -> str:
+        return self.rng.choices(self.ops, cum_weights=self.cum_weights)[0]
+
+    def run(self):
+        if self.workload.bench_start is not None:
+            self.stats = BenchStats(start=self.workload.bench_start)
+        deadline = time.time() + self.duration if self.duration is not None else None
+        done = 0
+        while (time.time() < deadline) if deadline is not None else (done < self.requests):
+            op = self.pick()
+            self.op_counts[op] = self.op_counts.get(op, 0) + 1
+            getattr(self, "_op_" + op)()
+            done += 1
+
+    def _call(self, name: str, fn: Callable[[], Any]) -> Tuple[bool, Any]:
+        before = time.time()
+        try:
+            result = fn()
+            code = result[0] if isinstance(result, tuple) else result
+        except Exception as e:
+            # 连接失败等异常计为错误，不中断会话
+            result = None
+            code = type(e).__name__
+        after = time.time()
+        self.stats.record(name, after - before, code, code == 200, after)
+        return code == 200, result
+
+    def _buyer(self):
+        n = self.rng.randint(1, self.workload.buyer_num)
+        return self.workload.get_buyer(*self.workload.to_buyer_id_and_password(n))
+
+    def _op_search(self):
+        cfg = self.profile["search"]
+        flt = {}
+        if self.rng.random() < cfg["store_scoped"]:
+            stores = [self.hot[0][0]] if self.hot else self.workload.store_ids
+            flt["store_id"] = self.rng.choice(stores)
+        kw = self.keywords.sample(self.rng)
+        self._call("search", lambda: self.searcher.keyword(kw, flt, 1, cfg["page_size"]))
+
+    def _op_list_orders(self):
+        buyer = self._buyer()
+        self._call("list_orders", lambda: buyer.list_orders(1, 20))
+
+    def _op_add_funds(self):
+        buyer = self._buyer()
+        self._call("add_funds", lambda: buyer.add_funds(self.profile["add_funds"]))
+
+    def _checkout(self, buyer, store_id, book_id_and_count) -> Optional[str]:
+        ok, result = self._call("new_order", lambda: buyer.new_order(store_id, book_id_and_count))
+        if not ok:
+            return None
+        order_id = result[1]
+        ok, _ = self._call("payment", lambda: buyer.payment(order_id))
+        return order_id if ok else None
+
+    def _op_checkout(self):
+        no = self.workload.get_new_order()
+        self._checkout(no.buyer, no.store_id, no.book_id_and_count)
+
+    def _op_lifecycle(self):
+        no = self.workload.get_new_order()
+        order_id = self._checkout(no.buyer, no.store_id, no.book_id_and_count)
+        if order_id is None:
+            return
+        seller = self.workload.get_seller(no.store_id)
+        ok, _ = self._call("send_books", lambda: seller.send_books(order_id))
+        if ok:
+            self._call("receive_book", lambda: no.buyer.receive_books(order_id))
+
+    def _op_hot_checkout(self):
+        store_id, book_id = self.rng.choice(self.hot)
+        self._checkout(self._buyer(), store_id, [(book_id, 1)])
+
+
+def run_mix(
+    profile: Dict[str, Any],
+    sessions: int,
+    duration: Optional[float] = None,
+    requests: Optional[int] = None,
+    wl: Optional[Workload] = None,
+    keywords: Optional[KeywordPool] = None,
+) -> Dict[str, Any]:
+    if wl is None:
+        wl = Workload()
+        wl.gen_database()
+    if keywords is None:
+        cfg = profile["search"]
+        keywords = KeywordPool.from_bookdb(wl.book_db, skew=cfg["skew"], miss_ratio=cfg["miss_ratio"])
+    ss = [MixSession(wl, profile, keywords, duration, requests, seed=i) for i in range(sessions)]
+    wl.bench_start = time.time()
+    for s in ss:
+        s.start()
+    for s in ss:
+        s.join()
+    op_counts: Dict[str, int] = {}
+    for s in ss:
+        for op, n in s.op_counts.items():
+            op_counts[op] = op_counts.get(op, 0) + n
+    return BenchStats.merged([s.stats for s in ss]).report(
+        {
+            "mode": "mix",
+            "profile": profile["name"],
+            "weights": profile["weights"],
+            "operations_issued": op_counts,
+            "sessions": sessions,
+            "duration_s": duration,
+            "uuid": wl.uuid,
+        }
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Run a weighted operation mix against the backend")
+    ap.add_argument("--profile", default="browse-heavy", help="Built-in name ({}) or a JSON/YAML file".format(", ".join(PROFILES)))
+    ap.add_argument("--sessions", type=int, default=conf.Session)
+    ap.add_argument("--duration", type=float, default=None, help="Seconds per session; overrides --requests")
+    ap.add_argument("--requests", type=int, default=None, help="Operations per session (default conf.Request_Per_Session)")
+    ap.add_argument("--json", dest="json_path", default=conf.Bench_Report_Path, help="Write the report to this file")
+    args = ap.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    profile = load_profile(args.profile)
+    report = run_mix(profile, args.sessions, args.duration, args.requests)
+    print("profile {}: {}".format(report["profile"], report["operations_issued"]))
+    print(format_report(report))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
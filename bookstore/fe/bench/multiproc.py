@@ -0,0 +1,199 @@
+"""Multi-process bench driver.
+
+run.py runs every Session as a thread in one process, and building and parsing
+the JSON of each request holds the GIL, so with enough sessions the client pins
+one core before the backend is busy. Here the coordinator loads the dataset once
+(Workload.gen_database), then starts N worker processes; each restores the
+Workload from a snapshot, runs its own sessions and sends back its merged
+BenchStats.to_dict(). The coordinator merges the histograms, so percentiles
+are computed over every request of every process.
+
+Workers log in and pre-generate requests first, then all start together. Each
+worker reports the CPU time it used over the run; a worker close to one full
+core means the client, not the server, is the bottleneck and more processes are
+needed.
+
+Usage:
+    # 4 processes x 8 sessions for 60 seconds each
+    python -m fe.bench.multiproc --processes 4 --sessions 8 --duration 60 --json multiproc.json
+    # fixed request count per session instead of a duration
+    python -m fe.bench.multiproc --processes 2 --sessions 4 --requests 500
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from fe import conf
+from fe.bench.session import Session
+from fe.bench.stats import BenchStats, format_report
+from fe.bench.workload import Workload
+
+# worker CPU time / wall time above this means the client is saturated
+CLIENT_BOUND_UTILIZATION = 0.85
+RESULT_TIMEOUT_GRACE = 120.0
+# 登录全部买家并预生成请求的上限；超时则打破屏障，所有 worker 退出
+READY_TIMEOUT = 600.0
+RESULT_POLL_S = 1.0
+
+
+def _worker(index, snapshot, sessions, duration, requests, ready, go, start_at, out):
+    try:
+        wl = Workload.restore(snapshot)
+        if requests:
+            wl.procedure_per_session = requests
+        # 先登录全部买家并预生成请求，计时开始后不再有准备工作
+        for n in range(1, wl.buyer_num + 1):
+            wl.get_buyer(*wl.to_buyer_id_and_password(n))
+        ss = [Session(wl, duration) for _ in range(sessions)]
+    except BaseException as e:
+        out.put({"index": index, "error": repr(e)})
+        ready.abort()
+        return
+    try:
+        ready.wait()
+    except threading.BrokenBarrierError:
+        out.put({"index": index, "error": "another worker failed to start"})
+        return
+    go.wait()
+    wl.bench_start = start_at.value
+    cpu_before = time.process_time()
+    wall_before = time.time()
+    for s in ss:
+        s.start()
+    for s in ss:
+        s.join()
+    cpu = time.process_time() - cpu_before
+    wall = time.time() - wall_before
+    out.put(
+        {
+            "index": index,
+            "stats": BenchStats.merged([s.stats for s in ss]).to_dict(),
+            "cpu_s": round(cpu, 3),
+            "wall_s": round(wall, 3),
+        }
+    )
+
+
+def _collect(procs, out, deadline: Optional[float]) -> List[Dict[str, Any]]:
+    """One result per worker; raises if a worker exits without putting one."""
+    results: List[Dict[str, Any]] = []
+    pending = set(range(len(procs)))
+    while pending:
+        try:
+            r = out.get(timeout=RESULT_POLL_S)
+        except queue.Empty:
+            dead = {i: procs[i].exitcode for i in sorted(pending) if not procs[i].is_alive()}
+            if dead:
+                # 进程退出时结果可能还在管道里，再等一个轮询周期
+                try:
+                    r = out.get(timeout=RESULT_POLL_S)
+                except queue.Empty:
+                    raise RuntimeError("bench workers exited without a result, exit codes: {}".format(dead))
+            elif deadline is not None and time.monotonic() > deadline:
+                break
+            else:
+                continue
+        results.append(r)
+        pending.discard(r["index"])
+    return results
+
+
+def run_multiproc(
+    processes: int,
+    sessions: int,
+    duration: Optional[float] = None,
+    requests: Optional[int] = None,
+    wl: Optional[Workload] = None,
+) -> Dict[str, Any]:
+    if wl is None:
+        wl = Workload()
+        wl.gen_database()
+    # spawn：子进程不继承父进程的 MongoClient / 连接池状态
+    ctx = multiprocessing.get_context("spawn")
+    ready = ctx.Barrier(processes + 1)
+    go = ctx.Event()
+    start_at = ctx.Value("d", 0.0)
+    out = ctx.Queue()
+    procs = [
+        ctx.Process(
+            target=_worker,
+            args=(i, wl.snapshot(), sessions, duration, requests, ready, go, start_at, out),
+            name="bench-worker-{}".format(i),
+        )
+        for i in range(processes)
+    ]
+    for p in procs:
+        p.start()
+    results: List[Dict[str, Any]] = []
+    try:
+        try:
+            ready.wait(timeout=READY_TIMEOUT)
+            started = True
+        except threading.BrokenBarrierError:
+            # 某个 worker 准备失败或超时，仍存活的 worker 都会把错误放进结果队列
+            started = False
+        start_at.value = time.time()
+        go.set()
+        # 按请求数运行时无法预估时长，只在按时长运行或启动失败时设截止时间
+        deadline = None
+        if duration or not started:
+            deadline = time.monotonic() + (duration or 0) + RESULT_TIMEOUT_GRACE
+        results = _collect(procs, out, deadline)
+    finally:
+        for p in procs:
+            p.join(timeout=5)
+            if p.is_alive():
+                p.terminate()
+
+    errors = [r for r in results if "error" in r]
+    if errors or len(results) < processes:
+        raise RuntimeError("bench workers failed: {}".format(errors or "missing results"))
+
+    total = BenchStats.merged([BenchStats.from_dict(r["stats"]) for r in results])
+    workers = []
+    for r in sorted(results, key=lambda r: r["index"]):
+        util = r["cpu_s"] / r["wall_s"] if r["wall_s"] else 0.0
+        workers.append({"index": r["index"], "cpu_s": r["cpu_s"], "wall_s": r["wall_s"], "cpu_util": round(util, 3)})
+    client_bound = [w["index"] for w in workers if w["cpu_util"] >= CLIENT_BOUND_UTILIZATION]
+    if client_bound:
+        logging.warning("bench workers %s used >= %d%% of a core; add processes", client_bound, CLIENT_BOUND_UTILIZATION * 100)
+    return total.report(
+        {
+            "mode": "multiproc",
+            "processes": processes,
+            "sessions_per_process": sessions,
+            "duration_s": duration,
+            "requests_per_session": None if duration else (requests or wl.procedure_per_session),
+            "uuid": wl.uuid,
+            "workers": workers,
+            "client_bound_workers": client_bound,
+        }
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Run bench sessions in several processes and merge their histograms")
+    ap.add_argument("--processes", type=int, default=multiprocessing.cpu_count())
+    ap.add_argument("--sessions", type=int, default=conf.Session, help="Sessions (threads) per process")
+    ap.add_argument("--duration", type=float, default=None, help="Seconds each session runs; overrides --requests")
+    ap.add_argument("--requests", type=int, default=None, help="Orders per session (default conf.Request_Per_Session)")
+    ap.add_argument("--json", dest="json_path", default=conf.Bench_Report_Path, help="Write the merged report to this file")
+    args = ap.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    report = run_multiproc(args.processes, args.sessions, args.duration, args.requests)
+    print(format_report(report))
+    for w in report["workers"]:
+        print("worker {index}: cpu {cpu_s}s / wall {wall_s}s ({cpu_util:.0%})".format(**w))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""Open-loop, rate-controlled load generation for the bench.
+
+Session.run_gut is closed-loop: a thread sends its next request only after the
+previous one returns, so when the backend slows down the offered load drops with
+it and the queueing delay never shows up in the numbers (coordinated omission).
+
+OpenLoopRunner fixes the arrival schedule up front (constant spacing or a Poisson
+process at the target rate) and hands each request to a worker pool at its
+intended send time. Latency is measured from that intended time, so time spent
+waiting for a free worker or for the server counts. The service time (from the
+actual send) is reported next to it. A payment is scheduled as soon as its order
+succeeds instead of in the every-100-orders bursts of the closed loop.
+
+The achieved rate counts new_order responses that completed inside the
+scheduling window, divided by its length; the tail drained after the last
+arrival is not part of it. Business rejections (auth, stock or funds exhausted,
+see be/model/error.py) are completed responses: they count toward the achieved
+rate and are reported separately as the business error rate. Only exceptions and
+server errors are counted as errors.
+
+sweep() runs increasing rates and stops at the knee: the first rate the backend
+cannot sustain (achieved rate below target, or p99 far above the low-rate p99).
+
+Usage:
+    python -m fe.bench.open_loop --rate 50 --duration 30 --process poisson --json open_loop.json
+    python -m fe.bench.open_loop --sweep 10,20,40,80,160 --duration 20
+"""
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from be.model import error
+from fe.bench.stats import BenchStats, format_report
+from fe.bench.workload import Payment, Workload
+
+ARRIVAL_PROCESSES = ("constant", "poisson")
+
+
+def arrival_offsets(rate: float, duration: float, process: str = "constant", rng: Optional[random.Random] = None) -> List[float]:
+    """Intended send times in seconds from the start, for `rate` requests per second."""
+    if rate <= 0 or duration <= 0:
+        return []
+    if process == "constant":
+        return [i / rate for i in range(int(rate * duration))]
+    if process == "poisson":
+        rng = rng or random.Random()
+        out = []
+        t = rng.expovariate(rate)
+        while t < duration:
+            out.append(t)
+            t += rng.expovariate(rate)
+        return out
+    raise ValueError("unknown arrival process: {}".format(process))
+
+
+def is_business_error(status: Any) -> bool:
+    """An application-level rejection (be/model/error.py codes or 4xx), not a backend failure."""
+    return isinstance(status, int) and (400 <= status < 500 or status in error.error_code)
+
+
+class OpenLoopRunner:
+    def __init__(
+        self,
+        wl: Workload,
+        rate: float,
+        duration: float,
+        process: str = "constant",
+        workers: int = 64,
+        seed: Optional[int] = None,
+    ):
+        self.workload = wl
+        self.rate = rate
+        self.duration = duration
+        self.process = process
+        self.workers = workers
+        self.offsets = arrival_offsets(rate, duration, process, random.Random(seed))
+        # 与 Session 一样提前生成请求，避免在调度循环里登录/随机选书
+        self.requests = [wl.get_new_order() for _ in self.offsets]
+        self.stats: Optional[BenchStats] = None
+        self.service: Optional[BenchStats] = None
+        self.max_lag = 0.0
+        self.completed = 0
+        self.business_errors = 0
+        self._window_end = 0.0
+        self._pending = 0
+        self._idle = threading.Condition()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _submit(self, op: str, procedure, intended: float) -> None:
+        with self._idle:
+            self._pending += 1
+        self._executor.submit(self._fire, op, procedure, intended)
+
+    def _fire(self, op: str, procedure, intended: float) -> None:
+        try:
+            started = time.perf_counter()
+            try:
+                result = procedure.run()
+                status = getattr(procedure, "status", None)
+            except Exception as e:
+                result = (False, None) if op == "new_order" else False
+                status = type(e).__name__
+            done = time.perf_counter()
+            ok = bool(result[0] if isinstance(result, tuple) else result)
+            now = time.time()
+            self.stats.record(op, done - intended, status, ok, now)
+            self.service.record(op, done - started, status, ok, now)
+            if op == "new_order":
+                business = not ok and is_business_error(status)
+                with self._idle:
+                    if business:
+                        self.business_errors += 1
+                    # 只统计调度窗口内完成的响应，排空阶段不计入吞吐量
+                    if (ok or business) and done <= self._window_end:
+                        self.completed += 1
+            if op == "new_order" and ok:
+                # 付款紧跟下单，预定发送时间就是现在
+                self._submit("payment", Payment(procedure.buyer, result[1]), time.perf_counter())
+        finally:
+            with self._idle:
+                self._pending -= 1
+                self._idle.notify_all()
+
+    def run(self) -> Dict[str, Any]:
+        start_wall = time.time()
+        self.stats = BenchStats(start=start_wall)
+        self.service = BenchStats(start=start_wall)
+        self.max_lag = 0.0
+        self.completed = 0
+        self.business_errors = 0
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="open-loop")
+        start = time.perf_counter()
+        self._window_end = start + self.duration
+        try:
+            for offset, procedure in zip(self.offsets, self.requests):
+                intended = start + offset
+                delay = intended - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                # 调度线程自身的滞后：过大说明压测端（而不是后端）已饱和
+                self.max_lag = max(self.max_lag, time.perf_counter() - intended)
+                self._submit("new_order", procedure, intended)
+            with self._idle:
+                while self._pending:
+                    self._idle.wait()
+        finally:
+            self._executor.shutdown(wait=True)
+        elapsed = time.perf_counter() - start
+        return self._report(elapsed)
+
+    def _report(self, elapsed: float) -> Dict[str, Any]:
+        service = self.service.report()["operations"]
+        responses = self.stats.ok.get("new_order", 0) + self.business_errors
+        return self.stats.report(
+            {
+                "mode": "open_loop",
+                "process": self.process,
+                "target_rate": self.rate,
+                "offered": len(self.offsets),
+                "achieved_rate": round(self.completed / self.duration, 3) if self.duration > 0 else 0.0,
+                "business_errors": self.business_errors,
+                "business_error_rate": round(self.business_errors / responses, 4) if responses else 0.0,
+                "elapsed_s": round(elapsed, 3),
+                "max_schedule_lag_ms": round(self.max_lag * 1000, 3),
+                "workers": self.workers,
+                "service_latency_ms": {op: o["latency_ms"] for op, o in service.items()},
+            }
+        )
+
+
+def find_knee(rows: List[Dict[str, Any]], tolerance: float = 0.1, latency_factor: float = 5.0) -> Dict[str, Any]:
+    """First rate the backend could not sustain, and the highest one before it.
+
+    A rate is saturated when the achieved order rate falls more than `tolerance`
+    below the target, or p99 exceeds `latency_factor` times the p99 at the lowest rate.
+    Business errors are completed responses and do not count as saturation.
+    """
+    knee = None
+    sustainable = None
+    baseline = None
+    for row in sorted(rows, key=lambda r: r["rate"]):
+        if baseline is None:
+            baseline = row["p99_ms"]
+        slow = bool(baseline) and row["p99_ms"] > baseline * latency_factor
+        if row["achieved"] < row["rate"] * (1 - tolerance) or slow:
+            knee = row["rate"]
+            break
+        sustainable = row["rate"]
+    return {"knee_rate": knee, "max_sustainable_rate": sustainable}
+
+
+def sweep(
+    wl: Workload,
+    rates: List[float],
+    duration: float,
+    process: str = "constant",
+    workers: int = 64,
+    tolerance: float = 0.1,
+    latency_factor: float = 5.0,
+) -> Dict[str, Any]:
+    rows = []
+    for rate in sorted(rates):
+        report = OpenLoopRunner(wl, rate, duration, process, workers).run()
+        no = report["operations"].get("new_order") or {"latency_ms": {}, "errors": 0}
+        rows.append(
+            {
+                "rate": rate,
+                "achieved": report["achieved_rate"],
+                "p50_ms": no["latency_ms"].get("p50", 0.0),
+                "p99_ms": no["latency_ms"].get("p99", 0.0),
+                "errors": no["errors"] - report["business_errors"],
+                "business_error_rate": report["business_error_rate"],
+                "max_schedule_lag_ms": report["max_schedule_lag_ms"],
+            }
+        )
+        logging.info("open loop rate=%s achieved=%s p99=%sms", rate, rows[-1]["achieved"], rows[-1]["p99_ms"])
+        if find_knee(rows, tolerance, latency_factor)["knee_rate"] is not None:
+            break
+    return {"mode": "open_loop_sweep", "process": process, "duration_s": duration, "rows": rows, **find_knee(rows, tolerance, latency_factor)}
+
+
+def format_sweep(result: Dict[str, Any]) -> str:
+    lines = ["{:>10} {:>10} {:>9} {:>9} {:>7} {:>9}".format("rate/s", "achieved", "p50ms", "p99ms", "errors", "business")]
+    for r in result["rows"]:
+        lines.append("{:>10} {:>10} {:>9} {:>9} {:>7} {:>8.1%}".format(
+            r["rate"], r["achieved"], r["p50_ms"], r["p99_ms"], r["errors"], r["business_error_rate"]))
+    lines.append("knee: {}  max sustainable: {}".format(result["knee_rate"], result["max_sustainable_rate"]))
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Open-loop bench: fixed arrival rate, latency from intended send time")
+    ap.add_argument("--rate", type=float, default=20.0, help="Target new_order arrivals per second")
+    ap.add_argument("--duration", type=float, default=30.0, help="Seconds of scheduled arrivals per rate")
+    ap.add_argument("--process", choices=ARRIVAL_PROCESSES, default="constant")
+    ap.add_argument("--workers", type=int, default=64, help="Concurrent requests in flight at most")
+    ap.add_argument("--sweep", default="", help="Comma separated rates; stops at the saturation knee")
+    ap.add_argument("--seed", type=int, default=None)
+    ap.add_argument("--json", dest="json_path", default=None, help="Write the report to this file")
+    args = ap.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    wl = Workload()
+    wl.gen_database()
+    if args.sweep:
+        rates = [float(r) for r in args.sweep.split(",") if r]
+        result = sweep(wl, rates, args.duration, args.process, args.workers)
+        print(format_sweep(result))
+    else:
+        result = OpenLoopRunner(wl, args.rate, args.duration, args.process, args.workers, args.seed).run()
+        print(format_report(result))
+        print("achieved {}/s of {}/s, business errors {:.1%}, max schedule lag {} ms".format(
+            result["achieved_rate"], args.rate, result["business_error_rate"], result["max_schedule_lag_ms"]))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
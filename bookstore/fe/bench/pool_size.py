@@ -0,0 +1,248 @@
+"""Buyer.payment throughput by MongoClient pool size and worker count.
+
+For every (pool size, workers) cell the bench:
+
+1. sets MONGO_MAX_POOL_SIZE and re-creates the backend's client
+   (mongo_store.reset_client);
+2. creates workers x --payments unpaid orders, untimed;
+3. starts `workers` threads together, each paying its own buyer's orders;
+4. reports payments/s, latency percentiles and errors.
+
+main() also registers a pymongo ConnectionPoolListener, so each cell also
+reports the mean and max time a thread waited to check out a connection and
+how many connections were opened. With fewer connections than workers the
+wait grows while throughput flattens. The useful pool size is where adding
+connections no longer moves throughput for the worker count you run.
+
+Every payment credits the same seller's balance, so high worker counts
+also show contention on that hot document, as a single busy store would.
+
+The data is written directly to MONGO_URI / MONGO_DB like fe/bench/micro.py
+and removed afterwards. The previous MONGO_MAX_POOL_SIZE is restored at the
+end.
+
+Usage:
+    python -m fe.bench.pool_size --pool-sizes 1,2,4,8,16,100 --workers 1,4,16,64 --payments 50
+    python -m fe.bench.pool_size --pool-sizes 4,32 --workers 32 --json pool.json
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from pymongo import monitoring
+
+from fe.bench.micro import MicroBench, Scale
+from fe.bench.stats import BenchStats
+
+
+class PoolWaitListener(monitoring.ConnectionPoolListener):
+    """Checkout wait time and connections created, across all threads."""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.checkouts = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+            self.created = 0
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "checkout_wait_ms_mean": round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "checkout_wait_ms_max": round(self.wait_max * 1000, 3),
+                "connections_created": self.created,
+            }
+
+    def connection_check_out_started(self, event):
+        self._local.t0 = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        t0 = getattr(self._local, "t0", None)
+        if t0 is None:
+            return
+        waited = time.perf_counter() - t0
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+    def connection_created(self, event):
+        with self._lock:
+            self.created += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        pass
+
+    def connection_checked_in(self, event):
+        pass
+
+
+def _use_pool_size(value: Optional[str]) -> None:
+    from be.model import mongo_store
+
+    if value is None:
+        os.environ.pop("MONGO_MAX_POOL_SIZE", None)
+    else:
+        os.environ["MONGO_MAX_POOL_SIZE"] = value
+    mongo_store.reset_client()
+
+
+def run_cell(mb: MicroBench, pool_size: int, workers: int, payments: int,
+             listener: Optional[PoolWaitListener] = None) -> Dict[str, Any]:
+    from be.model import buyer_mongo
+
+    _use_pool_size(str(pool_size))
+    # 模型对象持有旧客户端的集合引用，换连接池后重新创建
+    buyer = buyer_mongo.Buyer()
+    users = mb.user_ids[:workers]
+    pending = {u: [mb._ok(buyer.new_order(u, mb.rng.choice(mb.store_ids), mb._items()), "new_order")[2]
+                   for _ in range(payments)] for u in users}
+    stats = BenchStats()
+    start = threading.Barrier(workers + 1)
+
+    def work(user_id: str) -> None:
+        start.wait()
+        for order_id in pending[user_id]:
+            t0 = time.perf_counter()
+            code = buyer.payment(user_id, "pw", order_id)[0]
+            stats.record("payment", time.perf_counter() - t0, code, code == 200)
+
+    threads = [threading.Thread(target=work, args=(u,), name="pay-{}".format(i)) for i, u in enumerate(users)]
+    for t in threads:
+        t.start()
+    if listener is not None:
+        listener.reset()
+    start.wait()
+    started = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    op = stats.report()["operations"]["payment"]
+    cell = {
+        "pool_size": pool_size,
+        "workers": workers,
+        "payments": workers * payments,
+        "ok": op["ok"],
+        "errors": op["errors"],
+        "throughput": round(op["ok"] / elapsed, 3) if elapsed > 0 else 0.0,
+        "latency_ms": op["latency_ms"],
+    }
+    if listener is not None:
+        cell.update(listener.summary())
+    return cell
+
+
+def run_pool_bench(pool_sizes: List[int], workers: List[int], payments: int = 50, stores: int = 2,
+                   books_per_store: int = 200, listener: Optional[PoolWaitListener] = None, seed: int = 0
+                   ) -> Dict[str, Any]:
+    from be.model import user_mongo
+
+    previous = os.environ.get("MONGO_MAX_POOL_SIZE")
+    scale = Scale(stores=stores, books_per_store=books_per_store, users=max(workers), orders_per_user=0,
+                  selectivity=0.0, iterations=0)
+    mb = MicroBench(scale, seed=seed)
+    started = time.time()
+    cells = []
+    try:
+        mb.setup()
+        for pool_size in pool_sizes:
+            for n in workers:
+                logging.info("pool_size=%d workers=%d", pool_size, n)
+                cells.append(run_cell(mb, pool_size, n, payments, listener))
+    finally:
+        _use_pool_size(previous)
+        # 清理用恢复后的客户端
+        mb.user = user_mongo.User()
+        mb.cleanup()
+    return {
+        "mode": "pool_size",
+        "started_at": started,
+        "duration_s": round(time.time() - started, 3),
+        "payments_per_worker": payments,
+        "uuid": mb.uuid,
+        "cells": cells,
+    }
+
+
+def format_pool_report(report: Dict[str, Any]) -> str:
+    cells = report["cells"]
+    pool_sizes = sorted({c["pool_size"] for c in cells})
+    workers = sorted({c["workers"] for c in cells})
+    by_key = {(c["pool_size"], c["workers"]): c for c in cells}
+    lines = ["payments/s (p99 ms) by pool size (columns) and workers (rows)",
+             "{:>8} ".format("workers") + "".join("{:>20}".format("pool={}".format(p)) for p in pool_sizes)]
+    for n in workers:
+        row = "{:>8} ".format(n)
+        for p in pool_sizes:
+            c = by_key.get((p, n))
+            row += "{:>20}".format("{:.1f} ({:.1f})".format(c["throughput"], c["latency_ms"]["p99"]) if c else "-")
+        lines.append(row)
+    if any("checkout_wait_ms_mean" in c for c in cells):
+        lines += ["", "{:>6} {:>8} {:>16} {:>16} {:>12}".format("pool", "workers", "wait mean ms", "wait max ms",
+                                                                  "connections")]
+        for c in cells:
+            lines.append("{:>6} {:>8} {:>16} {:>16} {:>12}".format(
+                c["pool_size"], c["workers"], c["checkout_wait_ms_mean"], c["checkout_wait_ms_max"],
+                c["connections_created"]))
+    errors = sum(c["errors"] for c in cells)
+    if errors:
+        lines += ["", "errors: {}".format(errors)]
+    return "\n".join(lines)
+
+
+def _ints(text: str) -> List[int]:
+    return [int(v) for v in text.split(",") if v]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Buyer.payment throughput by MongoClient pool size and worker count")
+    ap.add_argument("--pool-sizes", default="1,2,4,8,16,100", help="Comma separated maxPoolSize values")
+    ap.add_argument("--workers", default="1,4,16,64", help="Comma separated worker thread counts")
+    ap.add_argument("--payments", type=int, default=50, help="Payments per worker per cell")
+    ap.add_argument("--stores", type=int, default=2)
+    ap.add_argument("--books-per-store", type=int, default=200)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--json", dest="json_path", default=None, help="Write the report to this file")
+    args = ap.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    # 必须在第一次创建 MongoClient 之前注册监听器
+    listener = PoolWaitListener()
+    monitoring.register(listener)
+    report = run_pool_bench(_ints(args.pool_sizes), _ints(args.workers), args.payments, args.stores,
+                            args.books_per_store, listener, args.seed)
+    print(format_pool_report(report))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,15 @@
+import json
+import logging
+import time
+from fe import conf
 from fe.bench.workload import Workload
 from fe.bench.session import Session
+from fe.bench.stats import BenchStats, format_report
 
 
-def run_bench():
+def run_bench(report_path=None) -> dict:
+    if report_path is None:
+        report_path = conf.Bench_Report_Path
     wl = Workload()
     wl.gen_database()
 
@@ -11,12 +18,28 @@ def run_bench():
         ss = Session(wl)
         sessions.append(ss)
 
+    # 所有 Session 共用同一个起点，时间窗口吞吐量才能逐窗合并
+    wl.bench_start = time.time()
     for ss in sessions:
         ss.start()
 
     for ss in sessions:
         ss.join()
 
+    total = BenchStats.merged([ss.stats for ss in sessions])
+    report = total.report(
+        {
+            "sessions": wl.session,
+            "requests_per_session": wl.procedure_per_session,
+            "uuid": wl.uuid,
+        }
+    )
+    logging.info("bench results:\n%s", format_report(report))
+    if report_path:
+        with open(report_path, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+    return report
+
 
 # if __name__ == "__main__":
 #    run_bench()
@@ -1,14 +1,19 @@
 from fe.bench.workload import Workload
 from fe.bench.workload import NewOrder
 from fe.bench.workload import Payment
+from fe.bench.stats import BenchStats
 import time
 import threading
+from typing import Optional
 
 
 class Session(threading.Thread):
-    def __init__(self, wl: Workload):
+    def __init__(self, wl: Workload, duration: Optional[float] = None):
         threading.Thread.__init__(self)
         self.workload = wl
+        # duration 为 None 时执行预生成的 procedure_per_session 个请求；
+        # 否则在 duration 秒内持续生成并发送请求（fe/bench/multiproc.py 使用）
+        self.duration = duration
         self.new_order_request = []
         self.payment_request = []
         self.payment_i = 0
@@ -17,8 +22,13 @@ class Session(threading.Thread):
         self.new_order_ok = 0
         self.time_new_order = 0
         self.time_payment = 0
+        # 上一次 update_stat 时上报过的累计值，只上报差值
+        self._reported = (0, 0, 0, 0, 0, 0)
+        # 每个 Session 独立的延迟直方图与状态码统计，结束后在 run_bench 中合并
+        self.stats = BenchStats(start=wl.bench_start)
         self.thread = None
-        self.gen_procedure()
+        if duration is None:
+            self.gen_procedure()
 
     def gen_procedure(self):
         for i in range(0, self.workload.procedure_per_session):
@@ -26,14 +36,57 @@ class Session(threading.Thread):
             self.new_order_request.append(new_order)
 
     def run(self):
+        if self.workload.bench_start is not None:
+            self.stats = BenchStats(start=self.workload.bench_start)
         self.run_gut()
 
+    def _timed(self, op: str, procedure):
+        before = time.time()
+        try:
+            result = procedure.run()
+            status = getattr(procedure, "status", None)
+        except Exception as e:
+            # 连接失败等异常计为错误并继续，而不是让整个线程退出
+            result = (False, None) if op == "new_order" else False
+            status = type(e).__name__
+        after = time.time()
+        ok = result[0] if isinstance(result, tuple) else result
+        self.stats.record(op, after - before, status, bool(ok), after)
+        return result, after - before
+
+    def _report(self):
+        current = (
+            self.new_order_i,
+            self.payment_i,
+            self.new_order_ok,
+            self.payment_ok,
+            self.time_new_order,
+            self.time_payment,
+        )
+        self.workload.update_stat(*[c - p for c, p in zip(current, self._reported)])
+        self._reported = current
+
+    def _orders(self):
+        if self.duration is None:
+            yield from self.new_order_request
+            return
+        deadline = time.time() + self.duration
+        while time.time() < deadline:
+            yield self.workload.get_new_order()
+
+    def _pay(self):
+        for payment in self.payment_request:
+            ok, elapsed = self._timed("payment", payment)
+            self.time_payment = self.time_payment + elapsed
+            self.payment_i = self.payment_i + 1
+            if ok:
+                self.payment_ok = self.payment_ok + 1
+        self.payment_request = []
+
     def run_gut(self):
-        for new_order in self.new_order_request:
-            before = time.time()
-            ok, order_id = new_order.run()
-            after = time.time()
-            self.time_new_order = self.time_new_order + after - before
+        for new_order in self._orders():
+            (ok, order_id), elapsed = self._timed("new_order", new_order)
+            self.time_new_order = self.time_new_order + elapsed
             self.new_order_i = self.new_order_i + 1
             if ok:
                 self.new_order_ok = self.new_order_ok + 1
@@ -42,20 +95,10 @@ class Session(threading.Thread):
             if self.new_order_i % 100 ==0 or self.new_order_i == len(
                 self.new_order_request
             ):
-                self.workload.update_stat(
-                    self.new_order_i,
-                    self.payment_i,
-                    self.new_order_ok,
-                    self.payment_ok,
-                    self.time_new_order,
-                    self.time_payment,
-                )
-                for payment in self.payment_request:
-                    before = time.time()
-                    ok = payment.run()
-                    after = time.time()
-                    self.time_payment = self.time_payment + after - before
-                    self.payment_i = self.payment_i + 1
-                    if ok:
-                        self.payment_ok = self.payment_ok + 1
-                self.payment_request = []
+                self._report()
+                self._pay()
+        # 按时长运行时，截止时还没到上报点的订单也要付款
+        self._pay()
+        if (self.new_order_i, self.payment_i) != self._reported[:2]:
+            # 最后一批付款在最后一次上报之后执行，补报一次
+            self._report()
@@ -0,0 +1,233 @@
+"""Latency histograms and per-operation counters for the bench.
+
+LatencyHistogram keeps HDR-style logarithmic buckets: every recorded value
+lands in bucket floor(log(us) / log(1 + precision)), so a percentile read back
+from the histogram is within `precision` (2% by default) of the true value and
+memory stays constant however many requests are recorded. Histograms with the
+same precision merge by adding bucket counts, which is how per-session and
+per-process (BenchStats.to_dict / from_dict) results are combined.
+
+BenchStats groups one histogram per operation with ok/error counts, a status
+code breakdown and completions per time window. Each Session owns one, so the
+hot path takes no shared lock; run_bench merges them at the end.
+"""
+import math
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+
+
+class LatencyHistogram:
+    def __init__(self, precision: float = 0.02):
+        self.precision = precision
+        self._log_base = math.log1p(precision)
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def _index(self, seconds: float) -> int:
+        us = max(seconds * 1e6, 1.0)
+        return int(math.log(us) / self._log_base)
+
+    def _value(self, index: int) -> float:
+        # midpoint of the bucket, in seconds
+        lo = math.exp(index * self._log_base)
+        hi = math.exp((index + 1) * self._log_base)
+        return (lo + hi) / 2 / 1e6
+
+    def record(self, seconds: float) -> None:
+        seconds = max(float(seconds), 0.0)
+        i = self._index(seconds)
+        self.buckets[i] = self.buckets.get(i, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        if other.precision != self.precision:
+            raise ValueError("cannot merge histograms with different precision")
+        for i, n in other.buckets.items():
+            self.buckets[i] = self.buckets.get(i, 0) + n
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        if other.max is not None:
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def percentile(self, p: float) -> float:
+        """Latency in seconds at percentile p (0-100); 0.0 when empty."""
+        if self.count == 0:
+            return 0.0
+        if p >= 100:
+            return self.max
+        rank = max(1, int(math.ceil(self.count * p / 100.0)))
+        seen = 0
+        for i in sorted(self.buckets):
+            seen += self.buckets[i]
+            if seen >= rank:
+                # never report beyond the observed extremes
+                return min(max(self._value(i), self.min), self.max)
+        return self.max
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "precision": self.precision,
+            "buckets": {str(i): n for i, n in self.buckets.items()},
+            "count": self.count,
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "LatencyHistogram":
+        h = cls(d.get("precision", 0.02))
+        h.buckets = {int(i): int(n) for i, n in (d.get("buckets") or {}).items()}
+        h.count = int(d.get("count", 0))
+        h.total = float(d.get("total", 0.0))
+        h.min = d.get("min")
+        h.max = d.get("max")
+        return h
+
+
+class BenchStats:
+    """Per-operation latency, status codes and throughput windows.
+
+    record() is cheap and guarded by an instance lock, so one BenchStats may be
+    shared by threads, but the bench gives every Session its own and merges.
+    """
+
+    def __init__(self, window_seconds: float = 1.0, start: Optional[float] = None):
+        self.window_seconds = window_seconds
+        self.start = time.time() if start is None else start
+        self.end = self.start
+        self.latency: Dict[str, LatencyHistogram] = {}
+        self.ok: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.status: Dict[str, Dict[str, int]] = {}
+        # window index -> op -> completions
+        self.windows: Dict[int, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, op: str, seconds: float, status: Any, ok: bool, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        with self._lock:
+            h = self.latency.get(op)
+            if h is None:
+                h = self.latency[op] = LatencyHistogram()
+            h.record(seconds)
+            counter = self.ok if ok else self.errors
+            counter[op] = counter.get(op, 0) + 1
+            codes = self.status.setdefault(op, {})
+            codes[str(status)] = codes.get(str(status), 0) + 1
+            w = self.windows.setdefault(int((now - self.start) // self.window_seconds), {})
+            w[op] = w.get(op, 0) + 1
+            self.end = max(self.end, now)
+
+    def merge(self, other: "BenchStats") -> None:
+        with self._lock:
+            # re-base the other side's windows onto our start time (sessions
+            # normally share one start, see Workload.bench_start)
+            shift = int(round((other.start - self.start) / self.window_seconds))
+            for op, h in other.latency.items():
+                self.latency.setdefault(op, LatencyHistogram(h.precision)).merge(h)
+            for src, dst in ((other.ok, self.ok), (other.errors, self.errors)):
+                for op, n in src.items():
+                    dst[op] = dst.get(op, 0) + n
+            for op, codes in other.status.items():
+                mine = self.status.setdefault(op, {})
+                for code, n in codes.items():
+                    mine[code] = mine.get(code, 0) + n
+            for i, ops in other.windows.items():
+                mine = self.windows.setdefault(i + shift, {})
+                for op, n in ops.items():
+                    mine[op] = mine.get(op, 0) + n
+            self.end = max(self.end, other.end)
+
+    def report(self, extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        with self._lock:
+            duration = max(self.end - self.start, 1e-9)
+            operations = {}
+            for op in sorted(set(self.latency) | set(self.errors)):
+                h = self.latency.get(op) or LatencyHistogram()
+                latency_ms = {"mean": round(h.mean() * 1000, 3), "max": round((h.max or 0.0) * 1000, 3)}
+                for p in PERCENTILES:
+                    latency_ms["p{:g}".format(p)] = round(h.percentile(p) * 1000, 3)
+                operations[op] = {
+                    "count": h.count,
+                    "ok": self.ok.get(op, 0),
+                    "errors": self.errors.get(op, 0),
+                    "throughput": round(self.ok.get(op, 0) / duration, 3),
+                    "latency_ms": latency_ms,
+                    "status": dict(sorted(self.status.get(op, {}).items())),
+                    "histogram": h.to_dict(),
+                }
+            windows = []
+            for i in sorted(self.windows):
+                windows.append({"t": round(i * self.window_seconds, 3), **self.windows[i]})
+            out = {
+                "started_at": self.start,
+                "duration_s": round(duration, 3),
+                "window_seconds": self.window_seconds,
+                "operations": operations,
+                "windows": windows,
+            }
+            if extra:
+                out.update(extra)
+            return out
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Lossless, JSON/pickle friendly form (histogram buckets included) for merging elsewhere."""
+        with self._lock:
+            return {
+                "window_seconds": self.window_seconds,
+                "start": self.start,
+                "end": self.end,
+                "latency": {op: h.to_dict() for op, h in self.latency.items()},
+                "ok": dict(self.ok),
+                "errors": dict(self.errors),
+                "status": {op: dict(codes) for op, codes in self.status.items()},
+                "windows": {str(i): dict(ops) for i, ops in self.windows.items()},
+            }
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "BenchStats":
+        s = cls(d.get("window_seconds", 1.0), d.get("start"))
+        s.end = d.get("end", s.start)
+        s.latency = {op: LatencyHistogram.from_dict(h) for op, h in (d.get("latency") or {}).items()}
+        s.ok = dict(d.get("ok") or {})
+        s.errors = dict(d.get("errors") or {})
+        s.status = {op: dict(codes) for op, codes in (d.get("status") or {}).items()}
+        s.windows = {int(i): dict(ops) for i, ops in (d.get("windows") or {}).items()}
+        return s
+
+    @classmethod
+    def merged(cls, parts: Iterable["BenchStats"], window_seconds: float = 1.0) -> "BenchStats":
+        parts = list(parts)
+        start = min((p.start for p in parts), default=None)
+        total = cls(window_seconds, start)
+        for p in parts:
+            total.merge(p)
+        return total
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = ["{:<12} {:>8} {:>7} {:>9} {:>9} {:>9} {:>9} {:>9}".format(
+        "op", "ok", "err", "tput/s", "p50ms", "p90ms", "p99ms", "p99.9ms")]
+    for op, o in report["operations"].items():
+        lat = o["latency_ms"]
+        lines.append("{:<12} {:>8} {:>7} {:>9} {:>9} {:>9} {:>9} {:>9}".format(
+            op, o["ok"], o["errors"], o["throughput"], lat["p50"], lat["p90"], lat["p99"], lat["p99.9"]))
+        non_ok = {c: n for c, n in o["status"].items() if c != "200"}
+        if non_ok:
+            lines.append("{:<12} status {}".format("", non_ok))
+    return "\n".join(lines)
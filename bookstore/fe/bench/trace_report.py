@@ -0,0 +1,155 @@
+"""Per-route, per-phase latency breakdown from exported request traces.
+
+Reads the OTLP/JSON traces written by be/tracing.py. The input is either the
+FileExporter's one-trace-per-line file or the dicts held by a
+MemoryCollector. For every root span (one sampled request), each descendant
+span is filed under its path below the root, e.g.
+
+    /buyer/payment  n=<requests>  mean <ms>  p50 <ms>  p95 <ms>
+      Buyer.payment                      mean <ms>  <calls>  <share>
+      Buyer.payment/mongo.findAndModify  mean <ms>  <calls>  <share>
+      Buyer.payment/mongo.update         mean <ms>  <calls>  <share>
+      (view)                             mean <ms>           <share>
+
+The numbers are averaged over the route's requests. "(view)" is the root time
+not covered by any direct child: request parsing, auth checks in the view,
+serialization. Shares are of the mean root duration, and nested phases are
+included in their parent's share.
+
+Usage:
+    BE_TRACE_SAMPLE_ROUTES=/buyer/payment=1,/buyer/new_order=1 python -m be.app
+    python -m fe.bench.async_run --users 200 --duration 30
+    python -m fe.bench.trace_report traces.jsonl
+"""
+import argparse
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+SELF = "(view)"
+
+
+def load_traces(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def spans_of(trace: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [
+        span
+        for rs in trace.get("resourceSpans", [])
+        for ss in rs.get("scopeSpans", [])
+        for span in ss.get("spans", [])
+    ]
+
+
+def _duration_ms(span: Dict[str, Any]) -> float:
+    return (int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])) / 1e6
+
+
+def _route(span: Dict[str, Any]) -> str:
+    for attr in span.get("attributes", []):
+        if attr["key"] == "http.route":
+            return attr["value"].get("stringValue", "")
+    return span["name"]
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def breakdown(traces: Iterable[Dict[str, Any]], route: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """route -> {count, mean_ms, p50_ms, p95_ms, phases: {path: {mean_ms, calls, share}}}."""
+    acc: Dict[str, Dict[str, Any]] = {}
+    for trace in traces:
+        spans = spans_of(trace)
+        ids = {s["spanId"] for s in spans}
+        children: Dict[str, List[Dict[str, Any]]] = {}
+        roots = []
+        for s in spans:
+            parent = s.get("parentSpanId")
+            if parent in ids:
+                children.setdefault(parent, []).append(s)
+            else:
+                # 父 span 不在本次导出中（例如来自上游的 traceparent）即为根
+                roots.append(s)
+        for root in roots:
+            r = _route(root)
+            if route is not None and r != route:
+                continue
+            entry = acc.setdefault(r, {"durations": [], "phases": {}})
+            total = _duration_ms(root)
+            entry["durations"].append(total)
+            phases = entry["phases"]
+            direct = children.get(root["spanId"], [])
+            covered = sum(_duration_ms(c) for c in direct)
+            self_row = phases.setdefault(SELF, [0.0, 0])
+            self_row[0] += max(total - covered, 0.0)
+            stack = [(c, c["name"]) for c in direct]
+            while stack:
+                span, path = stack.pop()
+                row = phases.setdefault(path, [0.0, 0])
+                row[0] += _duration_ms(span)
+                row[1] += 1
+                stack.extend((c, path + "/" + c["name"]) for c in children.get(span["spanId"], []))
+    report: Dict[str, Dict[str, Any]] = {}
+    for r, entry in acc.items():
+        durations = entry["durations"]
+        n = len(durations)
+        mean = sum(durations) / n
+        report[r] = {
+            "count": n,
+            "mean_ms": mean,
+            "p50_ms": _percentile(durations, 0.50),
+            "p95_ms": _percentile(durations, 0.95),
+            "phases": {
+                path: {
+                    "mean_ms": total / n,
+                    "calls": calls / n,
+                    "share": (total / n) / mean if mean else 0.0,
+                }
+                for path, (total, calls) in sorted(entry["phases"].items(), key=lambda kv: (kv[0] == SELF, kv[0]))
+            },
+        }
+    return report
+
+
+def format_breakdown(report: Dict[str, Dict[str, Any]]) -> str:
+    lines: List[str] = []
+    for r, entry in sorted(report.items(), key=lambda kv: -kv[1]["count"] * kv[1]["mean_ms"]):
+        lines.append(
+            "{}  n={}  mean {:.2f} ms  p50 {:.2f} ms  p95 {:.2f} ms".format(
+                r, entry["count"], entry["mean_ms"], entry["p50_ms"], entry["p95_ms"]
+            )
+        )
+        width = max((len(p) for p in entry["phases"]), default=0)
+        for path, ph in entry["phases"].items():
+            calls = "" if path == SELF else "{:5.1f} calls".format(ph["calls"])
+            lines.append(
+                "  {:<{}}  mean {:8.3f} ms  {:>11}  {:4.0f}%".format(path, width, ph["mean_ms"], calls, ph["share"] * 100)
+            )
+        lines.append("")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Per-route, per-phase latency breakdown from be/tracing.py traces")
+    ap.add_argument("path", help="OTLP/JSON traces file, one trace per line (BE_TRACE_FILE)")
+    ap.add_argument("--route", default=None, help="Only this URL rule, e.g. /buyer/payment")
+    ap.add_argument("--json", dest="json_path", default=None, help="Write the breakdown to this file")
+    args = ap.parse_args(argv)
+
+    report = breakdown(load_traces(args.path), route=args.route)
+    print(format_breakdown(report))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
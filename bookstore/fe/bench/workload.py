@@ -1,13 +1,19 @@
+import json
 import logging
 import uuid
 import random
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from fe.access import book
 from fe.access.new_seller import register_new_seller
 from fe.access.new_buyer import register_new_buyer
 from fe.access.buyer import Buyer
+from fe.access.seller import Seller
+from fe.access.auth import Auth
 from fe import conf
 
+LOAD_MODES = ("http", "threads", "direct")
+
 
 class NewOrder:
     def __init__(self, buyer: Buyer, store_id, book_id_and_count):
@@ -17,6 +23,7 @@ class NewOrder:
 
     def run(self) -> (bool, str):
         code, order_id = self.buyer.new_order(self.store_id, self.book_id_and_count)
+        self.status = code
         return code == 200, order_id
 
 
@@ -27,12 +34,15 @@ class Payment:
 
     def run(self) -> bool:
         code = self.buyer.payment(self.order_id)
+        self.status = code
         return code == 200
 
 
 class Workload:
     def __init__(self):
-        self.uuid = str(uuid.uuid1())
+        # 复用已装载的数据集时沿用它的 uuid，用户/店铺/书的 id 都由 uuid 推出
+        self.reuse_uuid = conf.Reuse_Uuid
+        self.uuid = self.reuse_uuid or str(uuid.uuid1())
         self.book_ids = {}
         self.buyer_ids = []
         self.store_ids = []
@@ -51,13 +61,47 @@ class Workload:
         self.batch_size = conf.Data_Batch_Size
         self.procedure_per_session = conf.Request_Per_Session
 
+        self.lock = threading.Lock()
+        self._buyers = {}
+        self._sellers = {}
+        # 所有 Session 共用的统计起点，保证各自的时间窗口可以直接合并
+        self.bench_start = None
+        self.reset_stat()
+
+    # 多进程压测：父进程装载一次数据，子进程据此重建 Workload，无需再读 BookDB
+    SNAPSHOT_FIELDS = (
+        "uuid",
+        "book_ids",
+        "buyer_ids",
+        "store_ids",
+        "seller_num",
+        "buyer_num",
+        "session",
+        "procedure_per_session",
+    )
+
+    def snapshot(self) -> dict:
+        return {k: getattr(self, k) for k in self.SNAPSHOT_FIELDS}
+
+    @classmethod
+    def restore(cls, snapshot: dict) -> "Workload":
+        wl = cls.__new__(cls)
+        for k in cls.SNAPSHOT_FIELDS:
+            setattr(wl, k, snapshot[k])
+        wl.lock = threading.Lock()
+        wl._buyers = {}
+        wl._sellers = {}
+        wl.bench_start = None
+        wl.reset_stat()
+        return wl
+
+    def reset_stat(self):
         self.n_new_order = 0
         self.n_payment = 0
         self.n_new_order_ok = 0
         self.n_payment_ok = 0
         self.time_new_order = 0
         self.time_payment = 0
-        self.lock = threading.Lock()
         # 存储上一次的值，用于两次做差
         self.n_new_order_past = 0
         self.n_payment_past = 0
@@ -77,37 +121,148 @@ class Workload:
     def to_store_id(self, seller_no: int, i):
         return "store_s_{}_{}_{}".format(seller_no, i, self.uuid)
 
-    def gen_database(self):
-        logging.info("load data")
+    def get_seller(self, store_id: str) -> Seller:
+        # store id 由 to_store_id 生成："store_s_{seller_no}_{i}_{uuid}"
+        seller_no = int(store_id.split("_")[2])
+        seller_id, password = self.to_seller_id_and_password(seller_no)
+        with self.lock:
+            s = self._sellers.get(seller_id)
+        if s is None:
+            s = Seller(conf.URL, seller_id, password)
+            with self.lock:
+                s = self._sellers.setdefault(seller_id, s)
+        return s
+
+    def gen_database(self, mode: str = None):
+        """Register sellers and buyers, create stores and add books.
+
+        mode is one of LOAD_MODES (default conf.Load_Mode). With conf.Reuse_Uuid
+        set, nothing is loaded: the ids of that earlier dataset are rebuilt and
+        checked instead.
+        """
+        mode = mode or conf.Load_Mode
+        if mode not in LOAD_MODES:
+            raise ValueError("unknown load mode {}; expected one of {}".format(mode, LOAD_MODES))
+        books = self._plan()
+        if self.reuse_uuid:
+            self._check_reused()
+            logging.info("reusing data set %s", self.uuid)
+            return
+        logging.info("load data (%s)", mode)
+        if mode == "direct":
+            self._load_direct(books)
+        else:
+            self._load_http(books, conf.Load_Threads if mode == "threads" else 1)
+        logging.info("data set %s loaded; set conf.Reuse_Uuid to reuse it", self.uuid)
+
+    def _plan(self) -> list:
+        """Fill store_ids / book_ids / buyer_ids and return the books every store gets."""
+        books = []
+        row_no = 0
+        while row_no < self.book_num_per_store:
+            batch = self.book_db.get_book_info(row_no, self.batch_size)
+            if len(batch) == 0:
+                break
+            books.extend(batch)
+            row_no = row_no + len(batch)
+        self.store_ids = []
+        self.book_ids = {}
         for i in range(1, self.seller_num + 1):
-            user_id, password = self.to_seller_id_and_password(i)
-            seller = register_new_seller(user_id, password)
             for j in range(1, self.store_num_per_user + 1):
                 store_id = self.to_store_id(i, j)
-                code = seller.create_store(store_id)
-                assert code == 200
                 self.store_ids.append(store_id)
-                self.book_ids[store_id] = []
-                row_no = 0
-
-                while row_no < self.book_num_per_store:
-                    books = self.book_db.get_book_info(row_no, self.batch_size)
-                    if len(books) == 0:
-                        break
-                    for bk in books:
-                        code = seller.add_book(store_id, self.stock_level, bk)
-                        assert code == 200
-                        self.book_ids[store_id].append(bk.id)
-                    row_no = row_no + len(books)
+                self.book_ids[store_id] = [bk.id for bk in books]
+        self.buyer_ids = [self.to_buyer_id_and_password(k)[0] for k in range(1, self.buyer_num + 1)]
+        return books
+
+    def _check_reused(self):
+        # 买家最后装载：最后一个卖家和买家都能登录，说明整个数据集已装载完成
+        auth = Auth(conf.URL)
+        for user_id, password in (
+            self.to_seller_id_and_password(self.seller_num),
+            self.to_buyer_id_and_password(self.buyer_num),
+        ):
+            code, _ = auth.login(user_id, password, "reuse check")
+            if code != 200:
+                raise RuntimeError("no complete data set with uuid {} ({} cannot log in)".format(self.uuid, user_id))
+
+    def _load_http(self, books: list, threads: int):
+        with ThreadPoolExecutor(max_workers=max(1, threads), thread_name_prefix="load") as pool:
+
+            def run_all(fn, items):
+                # list() 让任务里的 AssertionError 在这里抛出
+                return list(pool.map(fn, items))
+
+            def new_seller(i):
+                return register_new_seller(*self.to_seller_id_and_password(i))
+
+            sellers = run_all(new_seller, range(1, self.seller_num + 1))
+
+            def create_store(args):
+                seller, store_id = args
+                assert seller.create_store(store_id) == 200
+
+            stores = [
+                (sellers[i - 1], self.to_store_id(i, j))
+                for i in range(1, self.seller_num + 1)
+                for j in range(1, self.store_num_per_user + 1)
+            ]
+            run_all(create_store, stores)
+            logging.info("stores created.")
+
+            def add_books(args):
+                seller, store_id, batch = args
+                for bk in batch:
+                    assert seller.add_book(store_id, self.stock_level, bk) == 200
+
+            run_all(
+                add_books,
+                [
+                    (seller, store_id, books[k : k + self.batch_size])
+                    for seller, store_id in stores
+                    for k in range(0, len(books), self.batch_size)
+                ],
+            )
+            logging.info("seller data loaded.")
+
+            def new_buyer(k):
+                buyer = register_new_buyer(*self.to_buyer_id_and_password(k))
+                assert buyer.add_funds(self.user_funds) == 200
+
+            run_all(new_buyer, range(1, self.buyer_num + 1))
+            logging.info("buyer data loaded.")
+
+    def _load_direct(self, books: list):
+        # 只有直接装载才需要模型层：压测端与后端必须使用同一个 MONGO_URI / MONGO_DB
+        from be.model import buyer_mongo, seller_mongo, user_mongo
+
+        user = user_mongo.User()
+        seller = seller_mongo.Seller()
+        # 与 /seller/add_book 视图一样保存 json.dumps 后的书籍信息
+        rows = [(bk.id, json.dumps(bk.to_dict())) for bk in books]
+        for i in range(1, self.seller_num + 1):
+            seller_id, password = self.to_seller_id_and_password(i)
+            code, msg = user.register(seller_id, password)
+            assert code == 200, msg
+            for j in range(1, self.store_num_per_user + 1):
+                store_id = self.to_store_id(i, j)
+                code, msg = seller.create_store(seller_id, store_id)
+                assert code == 200, msg
+                for k in range(0, len(rows), self.batch_size):
+                    code, msg = seller.add_books(seller_id, store_id, rows[k : k + self.batch_size], self.stock_level)
+                    assert code == 200, msg
         logging.info("seller data loaded.")
+        buyer = buyer_mongo.Buyer()
         for k in range(1, self.buyer_num + 1):
-            user_id, password = self.to_buyer_id_and_password(k)
-            buyer = register_new_buyer(user_id, password)
-            buyer.add_funds(self.user_funds)
-            self.buyer_ids.append(user_id)
+            buyer_id, password = self.to_buyer_id_and_password(k)
+            code, msg = user.register(buyer_id, password)
+            assert code == 200, msg
+            code, msg = buyer.add_funds(buyer_id, password, self.user_funds)
+            assert code == 200, msg
         logging.info("buyer data loaded.")
 
-    def get_new_order(self) -> NewOrder:
+    def new_order_args(self) -> (str, str, str, list):
+        """A random order as (buyer_id, password, store_id, [(book_id, count)])."""
         n = random.randint(1, self.buyer_num)
         buyer_id, buyer_password = self.to_buyer_id_and_password(n)
         store_no = int(random.uniform(0, len(self.store_ids) - 1))
@@ -124,10 +279,25 @@ class Workload:
                 book_temp.append(book_id)
                 count = random.randint(1, 10)
                 book_id_and_count.append((book_id, count))
-        b = Buyer(url_prefix=conf.URL, user_id=buyer_id, password=buyer_password)
+        return buyer_id, buyer_password, store_id, book_id_and_count
+
+    def get_new_order(self) -> NewOrder:
+        buyer_id, buyer_password, store_id, book_id_and_count = self.new_order_args()
+        b = self.get_buyer(buyer_id, buyer_password)
         new_ord = NewOrder(b, store_id, book_id_and_count)
         return new_ord
 
+    def get_buyer(self, buyer_id: str, buyer_password: str) -> Buyer:
+        # 每个买家只登录一次：预生成上千个请求时不再为每个请求调用 /auth/login，
+        # 且同一用户只有最后一次登录的 token 有效
+        with self.lock:
+            b = self._buyers.get(buyer_id)
+        if b is None:
+            b = Buyer(url_prefix=conf.URL, user_id=buyer_id, password=buyer_password)
+            with self.lock:
+                b = self._buyers.setdefault(buyer_id, b)
+        return b
+
     def update_stat(
         self,
         n_new_order,
@@ -137,58 +307,52 @@ class Workload:
         time_new_order,
         time_payment,
     ):
+        """Add one session's deltas since its previous call and log running totals.
+
+        Percentiles come from the per-session histograms merged in run_bench;
+        this keeps the periodic progress line.
+        """
         # 获取当前并发数
         thread_num = len(threading.enumerate())
-        # 加索
-        self.lock.acquire()
-        self.n_new_order = self.n_new_order + n_new_order
-        self.n_payment = self.n_payment + n_payment
-        self.n_new_order_ok = self.n_new_order_ok + n_new_order_ok
-        self.n_payment_ok = self.n_payment_ok + n_payment_ok
-        self.time_new_order = self.time_new_order + time_new_order
-        self.time_payment = self.time_payment + time_payment
-        # 计算这段时间内新创建订单的总数目
-        n_new_order_diff = self.n_new_order - self.n_new_order_past
-        # 计算这段时间内新付款订单的总数目
-        n_payment_diff = self.n_payment - self.n_payment_past
-
-        if (
-            self.n_payment != 0
-            and self.n_new_order != 0
-            and (self.time_payment + self.time_new_order)
-        ):
-            # TPS_C(吞吐量):成功创建订单数量/(提交订单时间/提交订单并发数 + 提交付款订单时间/提交付款订单并发数)
-            # NO=OK:新创建订单数量
-            # Thread_num:以新提交订单的数量作为并发数(这一次的TOTAL-上一次的TOTAL)
-            # TOTAL:总提交订单数量
-            # LATENCY:提交订单时间/处理订单笔数(只考虑该线程延迟，未考虑并发)
-            # P=OK:新创建付款订单数量
-            # Thread_num:以新提交付款订单的数量作为并发数(这一次的TOTAL-上一次的TOTAL)
-            # TOTAL:总付款提交订单数量
-            # LATENCY:提交付款订单时间/处理付款订单笔数(只考虑该线程延迟，未考虑并发)
-            logging.info(
-                "TPS_C={}, NO=OK:{} Thread_num:{} TOTAL:{} LATENCY:{} , P=OK:{} Thread_num:{} TOTAL:{} LATENCY:{}".format(
-                    int(
-                        self.n_new_order_ok
-                        / (
-                            self.time_payment / n_payment_diff
-                            + self.time_new_order / n_new_order_diff
-                        )
-                    ),  # 吞吐量:完成订单数/((付款所用时间+订单所用时间)/并发数)
-                    self.n_new_order_ok,
-                    n_new_order_diff,
-                    self.n_new_order,
-                    self.time_new_order
-                    / self.n_new_order,  # 订单延迟:(创建订单所用时间/并发数)/新创建订单数
-                    self.n_payment_ok,
-                    n_payment_diff,
-                    self.n_payment,
-                    self.time_payment / self.n_payment,  # 付款延迟:(付款所用时间/并发数)/付款订单数
+        # 加锁：累加与 *_past 的更新都在锁内完成，避免并发 Session 互相覆盖差值
+        with self.lock:
+            self.n_new_order = self.n_new_order + n_new_order
+            self.n_payment = self.n_payment + n_payment
+            self.n_new_order_ok = self.n_new_order_ok + n_new_order_ok
+            self.n_payment_ok = self.n_payment_ok + n_payment_ok
+            self.time_new_order = self.time_new_order + time_new_order
+            self.time_payment = self.time_payment + time_payment
+            # 计算这段时间内新创建订单的总数目
+            n_new_order_diff = self.n_new_order - self.n_new_order_past
+            # 计算这段时间内新付款订单的总数目
+            n_payment_diff = self.n_payment - self.n_payment_past
+
+            if n_payment_diff and n_new_order_diff and self.n_payment and self.n_new_order:
+                # TPS_C(吞吐量):成功创建订单数量/(提交订单时间/提交订单并发数 + 提交付款订单时间/提交付款订单并发数)
+                # NO=OK:新创建订单数量
+                # Thread_num:以新提交订单的数量作为并发数(这一次的TOTAL-上一次的TOTAL)
+                # TOTAL:总提交订单数量
+                # LATENCY:提交订单时间/处理订单笔数(只考虑该线程延迟，未考虑并发)
+                # P=OK:新创建付款订单数量
+                # Thread_num:以新提交付款订单的数量作为并发数(这一次的TOTAL-上一次的TOTAL)
+                # TOTAL:总付款提交订单数量
+                # LATENCY:提交付款订单时间/处理付款订单笔数(只考虑该线程延迟，未考虑并发)
+                denominator = self.time_payment / n_payment_diff + self.time_new_order / n_new_order_diff
+                logging.info(
+                    "TPS_C={}, NO=OK:{} Thread_num:{} TOTAL:{} LATENCY:{} , P=OK:{} Thread_num:{} TOTAL:{} LATENCY:{}".format(
+                        int(self.n_new_order_ok / denominator) if denominator else 0,
+                        self.n_new_order_ok,
+                        n_new_order_diff,
+                        self.n_new_order,
+                        self.time_new_order / self.n_new_order,  # 订单延迟:(创建订单所用时间/并发数)/新创建订单数
+                        self.n_payment_ok,
+                        n_payment_diff,
+                        self.n_payment,
+                        self.time_payment / self.n_payment,  # 付款延迟:(付款所用时间/并发数)/付款订单数
+                    )
                 )
-            )
-        self.lock.release()
-        # 旧值更新为新值，便于下一轮计算
-        self.n_new_order_past = self.n_new_order
-        self.n_payment_past = self.n_payment
-        self.n_new_order_ok_past = self.n_new_order_ok
-        self.n_payment_ok_past = self.n_payment_ok
+            # 旧值更新为新值，便于下一轮计算
+            self.n_new_order_past = self.n_new_order
+            self.n_payment_past = self.n_payment
+            self.n_new_order_ok_past = self.n_new_order_ok
+            self.n_payment_ok_past = self.n_payment_ok
@@ -9,3 +9,17 @@ Default_Stock_Level = 1000000
 Default_User_Funds = 10000000
 Data_Batch_Size = 100
 Use_Large_DB = True
+# 压测数据装载方式："http" 逐条调用接口；"threads" 用 Load_Threads 个线程并发调用接口；
+# "direct" 跳过 HTTP，经模型层批量写入 MongoDB（压测端需与后端连同一个库）
+Load_Mode = "threads"
+Load_Threads = 8
+# 复用之前装载过的数据集（填 Workload.uuid，日志里会打印），None 表示重新装载
+Reuse_Uuid = None
+# run_bench 结束时写出的 JSON 报告路径，例如 "bench_report.json"（None 表示不写文件）
+Bench_Report_Path = None
+# fe/access 客户端共用一个 keep-alive 的 requests.Session（见 fe/access/http_session.py）
+Http_Pool = True
+# 每个主机保留的空闲连接数，不小于并发线程数才能让每个线程复用连接
+Http_Pool_Size = 64
+# 仅对连接失败重试的次数（请求未送达服务端，重放是安全的）
+Http_Retries = 3
@@ -1,5 +1,7 @@
+import contextlib
 import requests
 import threading
+import pytest
 from urllib.parse import urljoin
 from be import serve
 from be.serve import init_completed_event
@@ -47,3 +49,49 @@ def pytest_unconfigure(config):
     requests.get(url)
     thread.join()
     print("frontend end test")
+
+
+class RoundTripBudget:
+    """Checks the MongoDB round trips the backend reports for API calls.
+
+    Every fe.access client sends through fe.access.http_session.post; the
+    fixture wraps it and reads the X-DB-Round-Trips header of each response
+    (see be/model/mongo_monitor.py).
+
+        with db_budget(6, "new_order"):
+            buyer.new_order(store_id, books)
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def record(self, url, response):
+        n = response.headers.get("X-DB-Round-Trips")
+        self.calls.append((url.rsplit("/", 2)[-2:], None if n is None else int(n)))
+        return response
+
+    @contextlib.contextmanager
+    def __call__(self, budget: int, what: str = "call"):
+        start = len(self.calls)
+        yield
+        calls = self.calls[start:]
+        assert calls, "{}: no request reached the backend".format(what)
+        missing = [c for c, n in calls if n is None]
+        assert not missing, "{}: no X-DB-Round-Trips header (BE_DB_STATS_HEADER=0?)".format(what)
+        used = sum(n for _, n in calls)
+        assert used > 0, "{}: no MongoDB commands seen; is the command monitor registered?".format(what)
+        assert used <= budget, "{}: {} MongoDB round trips, budget {}: {}".format(what, used, budget, calls)
+
+
+@pytest.fixture
+def db_budget(monkeypatch):
+    from fe.access import http_session
+
+    tracker = RoundTripBudget()
+    post = http_session.post
+
+    def recording_post(url, **kwargs):
+        return tracker.record(url, post(url, **kwargs))
+
+    monkeypatch.setattr(http_session, "post", recording_post)
+    return tracker
@@ -0,0 +1,87 @@
+import json
+import logging
+import os
+import queue
+import uuid
+from urllib.parse import urljoin
+
+import pytest
+import requests
+
+from be import access_log
+from fe import conf
+
+
+def _new_lines(offset):
+    access_log.flush()
+    with open(access_log.ACCESS_LOG_PATH, encoding="utf-8") as fh:
+        fh.seek(offset)
+        return [json.loads(line) for line in fh.read().splitlines() if line]
+
+
+@pytest.fixture
+def log_offset():
+    access_log.flush()
+    return os.path.getsize(access_log.ACCESS_LOG_PATH) if os.path.exists(access_log.ACCESS_LOG_PATH) else 0
+
+
+def test_should_log_keeps_errors_and_slow_requests():
+    acc = access_log.AccessLog(sample_rate=0.0, slow_ms=100)
+    assert acc.should_log(200, 5) is None
+    assert acc.should_log(404, 5) == 1.0
+    assert acc.should_log(500, 5) == 1.0
+    assert acc.should_log(200, 100) == 1.0
+    assert access_log.AccessLog(sample_rate=1.0, slow_ms=100).should_log(200, 5) == 1.0
+    kept = [access_log.AccessLog(sample_rate=0.5, slow_ms=100).should_log(200, 5) for _ in range(400)]
+    assert set(kept) == {None, 0.5}
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = access_log._DictQueueHandler(queue.Queue(1), "test_queue")
+    logger = logging.getLogger("bookstore.test_access_queue")
+    logger.propagate = False
+    logger.addHandler(handler)
+    try:
+        before = access_log.DROPPED.value("test_queue")
+        for i in range(3):
+            logger.error({"i": i})
+        assert handler.queue.qsize() == 1
+        assert access_log.DROPPED.value("test_queue") == before + 2
+        # 入队的是原始 dict，序列化留给监听线程
+        record = handler.queue.get_nowait()
+        assert record.msg == {"i": 0}
+        assert access_log.JsonFormatter().format(record) == '{"i":0}'
+    finally:
+        logger.removeHandler(handler)
+
+
+def test_errors_are_always_logged(log_offset, monkeypatch):
+    monkeypatch.setattr(access_log.ACCESS, "sample_rate", 0.0)
+    path = "/no_such_route_{}".format(uuid.uuid1().hex)
+    assert requests.get(urljoin(conf.URL, path.lstrip("/"))).status_code == 404
+    entries = [e for e in _new_lines(log_offset) if e["path"] == path]
+    assert len(entries) == 1
+    entry = entries[0]
+    assert entry["status"] == 404 and entry["route"] == "<unmatched>" and entry["method"] == "GET"
+    assert entry["ms"] >= 0 and "sample" not in entry
+
+
+def test_fast_successes_are_sampled(log_offset, monkeypatch):
+    url = urljoin(conf.URL, "auth/register")
+    monkeypatch.setattr(access_log.ACCESS, "sample_rate", 0.0)
+    for _ in range(3):
+        user = "al_{}".format(uuid.uuid1())
+        assert requests.post(url, json={"user_id": user, "password": "pw"}).status_code == 200
+    assert [e for e in _new_lines(log_offset) if e["route"] == "/auth/register"] == []
+
+    offset = os.path.getsize(access_log.ACCESS_LOG_PATH)
+    monkeypatch.setattr(access_log.ACCESS, "sample_rate", 0.5)
+    monkeypatch.setattr(access_log.random, "random", lambda: 0.1)
+    user = "al_{}".format(uuid.uuid1())
+    assert requests.post(url, json={"user_id": user, "password": "pw"}).status_code == 200
+    (entry,) = [e for e in _new_lines(offset) if e["route"] == "/auth/register"]
+    assert entry["status"] == 200 and entry["method"] == "POST"
+    assert entry["sample"] == 0.5
+    # 注册至少访问一次数据库
+    assert entry["db_ops"] >= 1 and entry["db_ms"] >= 0
+    assert entry["remote"] == "127.0.0.1"
@@ -0,0 +1,97 @@
+import asyncio
+import uuid
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from fe import conf
+from fe.access import book
+from fe.access.aio import AsyncAuth, AsyncBuyer, AsyncClient, AsyncSeller
+from fe.bench.async_run import AsyncRunner
+from fe.bench.workload import Workload
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_async_clients_match_the_sync_api():
+    suffix = uuid.uuid1()
+    seller_id, buyer_id, store_id = "as_s_{}".format(suffix), "as_b_{}".format(suffix), "as_st_{}".format(suffix)
+
+    async def scenario():
+        async with AsyncClient(conf.URL, limit=4) as client:
+            auth = AsyncAuth(client)
+            assert await auth.register(seller_id, seller_id) == 200
+            assert await auth.register(buyer_id, buyer_id) == 200
+            assert await auth.register(buyer_id, buyer_id) != 200
+            seller = await AsyncSeller.connect(client, seller_id, seller_id)
+            assert await seller.create_store(store_id) == 200
+            bk = book.BookDB(conf.Use_Large_DB).get_book_info(0, 1)[0]
+            assert await seller.add_book(store_id, 10, bk) == 200
+            assert await seller.add_stock_level(seller_id, store_id, bk.id, 5) == 200
+
+            buyer = await AsyncBuyer.connect(client, buyer_id, buyer_id)
+            assert await buyer.add_funds(10 ** 9) == 200
+            code, order_id = await buyer.new_order(store_id, [(bk.id, 2)])
+            assert code == 200 and order_id
+            assert await buyer.payment(order_id) == 200
+            assert await seller.send_books(order_id) == 200
+            assert await buyer.receive_books(order_id) == 200
+            code, orders = await buyer.list_orders()
+            assert code == 200 and orders
+
+            code, token = await auth.login(buyer_id, buyer_id, "t")
+            assert code == 200 and token
+            assert await auth.logout(buyer_id, token) == 200
+            assert await auth.password(buyer_id, buyer_id, "new") == 200
+            assert (await auth.login(buyer_id, buyer_id, "t"))[0] != 200
+            assert await auth.unregister(buyer_id, "new") == 200
+
+    _run(scenario())
+
+
+def test_many_coroutines_share_a_small_pool():
+    user = "as_pool_{}".format(uuid.uuid1())
+
+    async def scenario():
+        async with AsyncClient(conf.URL, limit=2) as client:
+            auth = AsyncAuth(client)
+            assert await auth.register(user, "pw") == 200
+            codes = await asyncio.gather(*(auth.login(user, "pw", "t") for _ in range(20)))
+            assert all(code == 200 for code, _ in codes)
+            assert client.session.connector.limit == 2
+
+    _run(scenario())
+
+
+def test_connection_errors_are_raised_after_retries():
+    async def scenario():
+        async with AsyncClient("http://127.0.0.1:9/", retries=1) as client:
+            await AsyncAuth(client).login("nobody", "pw", "t")
+
+    import aiohttp
+
+    with pytest.raises(aiohttp.ClientConnectorError):
+        _run(scenario())
+
+
+def test_async_runner_sends_orders_and_payments(monkeypatch):
+    monkeypatch.setattr(conf, "Book_Num_Per_Store", 10)
+    monkeypatch.setattr(conf, "Seller_Num", 1)
+    monkeypatch.setattr(conf, "Store_Num_Per_User", 2)
+    monkeypatch.setattr(conf, "Buyer_Num", 3)
+    monkeypatch.setattr(conf, "Use_Large_DB", False)
+    monkeypatch.setattr(conf, "Reuse_Uuid", None)
+    wl = Workload()
+    wl.gen_database()
+    runner = AsyncRunner(wl, users=20, requests=3, connections=4)
+    report = runner.run()
+    ops = report["operations"]
+    assert report["mode"] == "async" and report["users"] == 20
+    assert ops["new_order"]["count"] == 60 and ops["new_order"]["ok"] > 0
+    assert ops["payment"]["count"] == ops["new_order"]["ok"]
+    # 每个买家只登录一次
+    assert len(runner._buyers) <= 3
+    assert report["max_loop_lag_ms"] >= 0
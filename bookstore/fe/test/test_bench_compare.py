@@ -0,0 +1,79 @@
+import json
+import random
+
+import pytest
+
+from fe.bench import compare
+from fe.bench.stats import BenchStats
+
+
+def _report(seed, latency_ms=20.0, rate=50, seconds=20, jitter=0.2):
+    # 按固定速率记录 new_order，延迟服从以 latency_ms 为中心的对数正态分布
+    rng = random.Random(seed)
+    s = BenchStats(start=1000.0)
+    r = rate * rng.uniform(1 - jitter / 4, 1 + jitter / 4)
+    for i in range(int(r * seconds)):
+        now = 1000.0 + i / r
+        s.record("new_order", latency_ms / 1000 * rng.lognormvariate(0, jitter), 200, True, now)
+    return json.loads(json.dumps(s.report()))
+
+
+def test_t_quantile_matches_tables():
+    assert compare.t_quantile(0.975, 1) == pytest.approx(12.706, abs=1e-3)
+    assert compare.t_quantile(0.975, 10) == pytest.approx(2.228, abs=1e-3)
+    assert compare.t_quantile(0.975, 1e6) == pytest.approx(1.960, abs=1e-3)
+    assert compare.t_quantile(0.025, 4) == pytest.approx(-2.776, abs=1e-3)
+
+
+def test_same_build_is_not_a_regression():
+    base = [_report(s) for s in range(5)]
+    new = [_report(s) for s in range(10, 15)]
+    result = compare.compare(base, new, threshold=5)
+    assert result["regressions"] == []
+    row = next(r for r in result["rows"] if r["metric"] == "p99")
+    assert row["method"] == "welch_runs" and row["runs"] == [5, 5]
+
+
+def test_slower_build_fails_on_repeat_and_single_runs():
+    base = [_report(s) for s in range(4)]
+    slow = [_report(s, latency_ms=30.0, rate=35) for s in range(10, 14)]
+    result = compare.compare(base, slow, threshold=10)
+    assert "new_order throughput" in result["regressions"]
+    assert "new_order p50" in result["regressions"] and "new_order p99" in result["regressions"]
+    single = compare.compare(base[:1], slow[:1], threshold=10)
+    methods = {r["metric"]: r["method"] for r in single["rows"]}
+    assert methods["throughput"] == "welch_windows" and methods["p99"] == "quantile_ci"
+    assert methods["mean"] == "welch_histogram"
+    assert {"new_order throughput", "new_order p50", "new_order p99"} <= set(single["regressions"])
+    # 变慢但低于阈值、或者指标不在门禁里，都不算回归
+    assert compare.compare(base, slow, threshold=80)["regressions"] == []
+    assert all(r.endswith("p99.9") for r in compare.compare(base, slow, metrics=["p99.9"])["regressions"])
+
+
+def test_small_difference_in_noisy_runs_is_not_significant():
+    base = [_report(s, jitter=0.6) for s in range(3)]
+    new = [_report(s, latency_ms=21.0, jitter=0.6) for s in range(20, 23)]
+    row = next(r for r in compare.compare(base, new, threshold=1)["rows"] if r["metric"] == "p50")
+    assert row["ci_pct"][0] < 0 < row["ci_pct"][1]
+    assert not row["regression"]
+
+
+def test_main_exit_code_and_inputs(tmp_path):
+    base_dir, new_dir = tmp_path / "base", tmp_path / "new"
+    base_dir.mkdir()
+    new_dir.mkdir()
+    for i in range(3):
+        (base_dir / "r{}.json".format(i)).write_text(json.dumps(_report(i)))
+        (new_dir / "r{}.json".format(i)).write_text(json.dumps(_report(i + 10, latency_ms=40.0)))
+    out = tmp_path / "cmp.json"
+    assert compare.main([str(base_dir), str(new_dir), "--json", str(out)]) == 1
+    assert json.loads(out.read_text())["regressions"]
+    assert compare.main([str(base_dir), str(base_dir / "r*.json")]) == 0
+    assert compare.main([str(base_dir), str(base_dir / "r*.json"), "--ops", "new_order,renamed"]) == 1
+    with pytest.raises(ValueError):
+        compare.compare([], [_report(0)])
+    (tmp_path / "sweep.json").write_text(json.dumps({"rows": []}))
+    with pytest.raises(SystemExit):
+        compare.main([str(tmp_path / "sweep.json"), str(new_dir)])
+    with pytest.raises(SystemExit):
+        compare.main([str(base_dir), str(new_dir), "--metrics", "p42"])
@@ -0,0 +1,73 @@
+import pytest
+
+from be.model import mongo_store
+from fe import conf
+from fe.bench.workload import Workload
+
+
+@pytest.fixture
+def small_conf(monkeypatch):
+    monkeypatch.setattr(conf, "Book_Num_Per_Store", 10)
+    monkeypatch.setattr(conf, "Data_Batch_Size", 5)
+    monkeypatch.setattr(conf, "Seller_Num", 2)
+    monkeypatch.setattr(conf, "Store_Num_Per_User", 2)
+    monkeypatch.setattr(conf, "Buyer_Num", 3)
+    monkeypatch.setattr(conf, "Use_Large_DB", False)
+    monkeypatch.setattr(conf, "Load_Threads", 4)
+    monkeypatch.setattr(conf, "Reuse_Uuid", None)
+
+
+def _inventory(store_id):
+    col = mongo_store.get_db()["inventory"]
+    return {d["book_id"]: d for d in col.find({"store_id": store_id}, {"_id": 0})}
+
+
+@pytest.mark.parametrize("mode", ["http", "threads", "direct"])
+def test_load_modes_build_the_same_data_set(small_conf, mode):
+    wl = Workload()
+    wl.gen_database(mode)
+    assert len(wl.store_ids) == 4 and len(wl.buyer_ids) == 3
+    for store_id in wl.store_ids:
+        inv = _inventory(store_id)
+        assert sorted(inv) == sorted(wl.book_ids[store_id]) and len(inv) == 10
+        doc = inv[wl.book_ids[store_id][0]]
+        assert doc["stock_level"] == conf.Default_Stock_Level and doc["title"] and doc["text_blob"]
+    ok, _ = wl.get_new_order().run()
+    assert ok
+
+
+def test_direct_load_matches_add_book_documents(small_conf):
+    http_wl = Workload()
+    http_wl.gen_database("http")
+    direct_wl = Workload()
+    direct_wl.gen_database("direct")
+    a = _inventory(http_wl.store_ids[0])
+    b = _inventory(direct_wl.store_ids[0])
+    for book_id, doc in a.items():
+        other = dict(b[book_id])
+        # 图片数量是随机的，其余字段应一致
+        for d in (doc, other):
+            d.pop("store_id")
+            d.pop("book_info")
+        assert doc == other
+
+
+def test_reuse_uuid_skips_loading(small_conf, monkeypatch):
+    wl = Workload()
+    wl.gen_database("direct")
+    monkeypatch.setattr(conf, "Reuse_Uuid", wl.uuid)
+    again = Workload()
+    again.gen_database()
+    assert again.uuid == wl.uuid
+    assert again.store_ids == wl.store_ids and again.book_ids == wl.book_ids and again.buyer_ids == wl.buyer_ids
+    assert len(_inventory(wl.store_ids[0])) == 10
+    ok, _ = again.get_new_order().run()
+    assert ok
+
+
+def test_reuse_of_unknown_uuid_and_bad_mode_fail(small_conf, monkeypatch):
+    with pytest.raises(ValueError):
+        Workload().gen_database("carrier-pigeon")
+    monkeypatch.setattr(conf, "Reuse_Uuid", "no-such-uuid")
+    with pytest.raises(RuntimeError):
+        Workload().gen_database()
@@ -0,0 +1,46 @@
+import threading
+
+import pytest
+
+from be.model import mongo_store
+from fe.bench import micro
+
+TINY = micro.Scale(stores=2, books_per_store=40, users=3, orders_per_user=2, selectivity=0.25, iterations=15)
+
+
+def test_suite_runs_every_benchmark_and_cleans_up():
+    report = micro.run_suite(TINY)
+    assert report["mode"] == "micro" and report["scale"]["books_per_store"] == 40
+    assert set(report["operations"]) == set(micro.BENCHMARKS)
+    for name, op in report["operations"].items():
+        assert op["ok"] == TINY.iterations and op["errors"] == 0, (name, op["status"])
+        assert op["throughput"] > 0 and op["latency_ms"]["p50"] > 0
+    db = mongo_store.get_db()
+    assert db["inventory"].count_documents({"store_id": {"$regex": report["uuid"]}}) == 0
+    assert db["user"].count_documents({"_id": {"$regex": report["uuid"]}}) == 0
+
+
+def test_search_keyword_matches_the_configured_selectivity():
+    mb = micro.MicroBench(TINY)
+    mb.setup()
+    try:
+        code, _, rows = mb.search_model.search(micro.NEEDLE, mb.Filter(store_id=mb.store_ids[0]))
+        assert code == 200 and len(rows) == 40 * 0.25
+    finally:
+        mb.cleanup()
+
+
+def test_round_trip_counter_is_per_thread():
+    counter = micro.RoundTripCounter()
+    counter.started(None)
+    counter.started(None)
+    other = []
+    t = threading.Thread(target=lambda: (counter.started(None), other.append(counter.count())))
+    t.start()
+    t.join()
+    assert counter.count() == 2 and other == [1] and counter.seen
+
+
+def test_unknown_benchmark_is_rejected():
+    with pytest.raises(ValueError):
+        micro.run_suite(TINY, only=["teleport"])
@@ -0,0 +1,71 @@
+import json
+import random
+
+import pytest
+
+from fe import conf
+from fe.bench import mix
+from fe.bench.workload import Workload
+
+
+class _B:
+    def __init__(self, title, tags):
+        self.title = title
+        self.tags = tags
+
+
+def test_builtin_profiles_validate():
+    for name in mix.PROFILES:
+        p = mix.load_profile(name)
+        assert p["name"] == name and set(p["weights"]) <= set(mix.OPERATIONS)
+    assert mix.load_profile("flash-sale")["hot_items"] == 1
+
+
+def test_load_json_profile_and_reject_bad_ones(tmp_path):
+    path = tmp_path / "p.json"
+    path.write_text(json.dumps({"name": "x", "weights": {"search": 3, "checkout": 1, "add_funds": 0}}))
+    p = mix.load_profile(str(path))
+    assert p["weights"] == {"search": 3.0, "checkout": 1.0}
+    assert p["search"]["page_size"] == mix.SEARCH_DEFAULTS["page_size"]
+    for bad in ({}, {"weights": {"teleport": 1}}, {"weights": {"search": 0}}, {"weights": {"hot_checkout": 1}, "hot_items": 0}):
+        with pytest.raises(ValueError):
+            mix.validate_profile(bad)
+
+
+def test_keyword_pool_is_skewed_and_comes_from_titles_and_tags():
+    books = [_B("三体 黑暗森林", ["科幻", "小说"]), _B("球状闪电", ["科幻"])]
+    pool = mix.KeywordPool.from_books(books, seed=1, skew=1.2, miss_ratio=0.0)
+    assert set(pool.keywords) == {"三体 黑暗森林", "三体", "黑暗森林", "科幻", "小说", "球状闪电"}
+    rng = random.Random(5)
+    counts = {}
+    for _ in range(3000):
+        k = pool.sample(rng)
+        counts[k] = counts.get(k, 0) + 1
+    assert counts[pool.keywords[0]] > counts[pool.keywords[-1]] * 2
+    misses = mix.KeywordPool(["a"], miss_ratio=1.0).sample(rng)
+    assert misses.startswith("zz_no_such_book_")
+
+
+def test_builtin_profiles_run_against_backend(monkeypatch):
+    # 小数据集：1 个卖家 1 个店 8 本书 2 个买家
+    monkeypatch.setattr(conf, "Book_Num_Per_Store", 8)
+    monkeypatch.setattr(conf, "Seller_Num", 1)
+    monkeypatch.setattr(conf, "Store_Num_Per_User", 1)
+    monkeypatch.setattr(conf, "Buyer_Num", 2)
+    monkeypatch.setattr(conf, "Use_Large_DB", False)
+    wl = Workload()
+    wl.gen_database()
+    keywords = mix.KeywordPool.from_bookdb(wl.book_db, limit=8)
+    for name in ("browse-heavy", "checkout-heavy", "flash-sale"):
+        profile = mix.load_profile(name)
+        # 每种操作都至少执行一次
+        profile["weights"] = {op: 1 for op in profile["weights"]}
+        report = mix.run_mix(profile, sessions=2, requests=20, wl=wl, keywords=keywords)
+        ops = report["operations"]
+        assert report["profile"] == name
+        assert sum(report["operations_issued"].values()) == 40
+        assert all(o["errors"] == 0 for o in ops.values()), {k: o["status"] for k, o in ops.items()}
+        if "lifecycle" in report["operations_issued"]:
+            assert ops["receive_book"]["ok"] > 0
+        if "hot_checkout" in report["operations_issued"]:
+            assert ops["payment"]["ok"] > 0
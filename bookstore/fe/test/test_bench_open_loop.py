@@ -0,0 +1,80 @@
+import random
+import threading
+import time
+
+from fe.bench import open_loop
+from fe.bench.workload import NewOrder
+
+
+class _SlowBuyer:
+    # 每次调用固定耗时的假买家
+    def __init__(self, service_time):
+        self.service_time = service_time
+        self.n = 0
+        self.lock = threading.Lock()
+
+    def new_order(self, store_id, book_id_and_count):
+        time.sleep(self.service_time)
+        with self.lock:
+            self.n += 1
+            return 200, "order_{}".format(self.n)
+
+    def payment(self, order_id):
+        time.sleep(self.service_time)
+        return 200
+
+
+class _OutOfStockBuyer(_SlowBuyer):
+    def new_order(self, store_id, book_id_and_count):
+        time.sleep(self.service_time)
+        return 517, None
+
+
+class _StubWorkload:
+    def __init__(self, service_time, buyer_cls=_SlowBuyer):
+        self.buyer = buyer_cls(service_time)
+
+    def get_new_order(self):
+        return NewOrder(self.buyer, "store", [("book", 1)])
+
+
+def test_arrival_offsets():
+    constant = open_loop.arrival_offsets(10, 2)
+    assert len(constant) == 20 and constant[1] - constant[0] == 0.1
+    poisson = open_loop.arrival_offsets(200, 10, "poisson", random.Random(3))
+    # 泊松到达：数量接近 rate * duration，且都落在窗口内
+    assert 1800 < len(poisson) < 2200 and poisson[-1] < 10
+    assert open_loop.arrival_offsets(0, 10) == []
+
+
+def test_latency_counts_queueing_from_intended_send_time():
+    # 单 worker、服务时间 20ms、到达间隔 10ms：服务时间不变，但排队时间必须计入
+    runner = open_loop.OpenLoopRunner(_StubWorkload(0.02), rate=100, duration=0.2, workers=1)
+    report = runner.run()
+    no = report["operations"]["new_order"]
+    assert no["ok"] == 20 and report["operations"]["payment"]["ok"] == 20
+    assert report["service_latency_ms"]["new_order"]["p50"] < 40
+    assert no["latency_ms"]["p99"] > 5 * report["service_latency_ms"]["new_order"]["p99"]
+    assert report["achieved_rate"] < 100
+
+
+def test_business_errors_are_completed_responses():
+    # 库存耗尽：业务拒绝照样计入吞吐量，单独报告比例，不算错误
+    runner = open_loop.OpenLoopRunner(_StubWorkload(0.001, _OutOfStockBuyer), rate=100, duration=0.5, workers=4)
+    report = runner.run()
+    assert report["achieved_rate"] > 80
+    assert report["business_errors"] == 50 and report["business_error_rate"] == 1.0
+    assert "payment" not in report["operations"]
+    assert open_loop.is_business_error(519) and open_loop.is_business_error(401)
+    assert not open_loop.is_business_error(500) and not open_loop.is_business_error("ConnectionError")
+
+
+def test_find_knee():
+    rows = [
+        {"rate": 10, "achieved": 10.0, "p99_ms": 8.0},
+        {"rate": 20, "achieved": 19.8, "p99_ms": 9.0},
+        {"rate": 40, "achieved": 39.0, "p99_ms": 60.0},
+        {"rate": 80, "achieved": 51.0, "p99_ms": 900.0},
+    ]
+    assert open_loop.find_knee(rows) == {"knee_rate": 40, "max_sustainable_rate": 20}
+    assert open_loop.find_knee(rows[:2]) == {"knee_rate": None, "max_sustainable_rate": 20}
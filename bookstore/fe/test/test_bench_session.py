@@ -0,0 +1,86 @@
+import threading
+
+from fe.bench.session import Session
+from fe.bench.workload import NewOrder, Workload
+
+
+class _StubBuyer:
+    def __init__(self):
+        self.n = 0
+        self.lock = threading.Lock()
+
+    def new_order(self, store_id, book_id_and_count):
+        with self.lock:
+            self.n += 1
+            n = self.n
+        # 每 5 单失败一单
+        return (518, None) if n % 5 == 0 else (200, "order_{}".format(n))
+
+    def payment(self, order_id):
+        return 200
+
+
+class _StubWorkload(Workload):
+    # 不连接后端也不读 BookDB，只保留 Session 用到的字段与真实的 update_stat
+    def __init__(self, procedure_per_session):
+        self.procedure_per_session = procedure_per_session
+        self.buyer = _StubBuyer()
+        self.n_new_order = 0
+        self.n_payment = 0
+        self.n_new_order_ok = 0
+        self.n_payment_ok = 0
+        self.time_new_order = 0
+        self.time_payment = 0
+        self.lock = threading.Lock()
+        self._buyers = {}
+        self.bench_start = None
+        self.n_new_order_past = 0
+        self.n_payment_past = 0
+        self.n_new_order_ok_past = 0
+        self.n_payment_ok_past = 0
+
+    def get_new_order(self) -> NewOrder:
+        return NewOrder(self.buyer, "store", [("book", 1)])
+
+
+def test_sessions_report_deltas_once():
+    # 250 单跨过两次每 100 单的上报点，旧实现会把累计值重复累加
+    wl = _StubWorkload(250)
+    sessions = [Session(wl), Session(wl)]
+    for ss in sessions:
+        ss.start()
+    for ss in sessions:
+        ss.join()
+
+    assert wl.n_new_order == 500
+    assert wl.n_new_order_ok == 400
+    assert wl.n_payment == 400
+    assert wl.n_payment_ok == 400
+    assert wl.time_new_order == sum(ss.time_new_order for ss in sessions)
+    assert wl.time_payment == sum(ss.time_payment for ss in sessions)
+    for ss in sessions:
+        assert ss.stats.ok["new_order"] + ss.stats.errors["new_order"] == 250
+
+
+def test_session_duration_mode_pays_every_order():
+    wl = _StubWorkload(0)
+    ss = Session(wl, duration=0.2)
+    assert ss.new_order_request == []
+    ss.start()
+    ss.join()
+    assert ss.new_order_i > 0 and wl.n_new_order == ss.new_order_i
+    # 截止时未到上报点的订单也已付款并上报
+    assert ss.payment_i == ss.new_order_ok and wl.n_payment == ss.payment_i
+
+
+def test_workload_snapshot_restore():
+    wl = _StubWorkload(10)
+    wl.uuid = "u1"
+    wl.book_ids = {"st": ["b1", "b2"]}
+    wl.buyer_ids = ["buyer_1_u1"]
+    wl.store_ids = ["st"]
+    wl.seller_num, wl.buyer_num, wl.session = 1, 1, 2
+    restored = Workload.restore(wl.snapshot())
+    assert restored.snapshot() == wl.snapshot()
+    assert restored.n_new_order == 0 and restored.bench_start is None
+    assert restored.to_store_id(1, 1) == "store_s_1_1_u1"
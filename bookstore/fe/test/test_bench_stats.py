@@ -0,0 +1,64 @@
+import random
+
+from fe.bench.stats import BenchStats, LatencyHistogram, format_report
+
+
+def test_histogram_percentiles_within_precision():
+    random.seed(7)
+    values = [random.expovariate(1 / 0.02) for _ in range(20000)]
+    h = LatencyHistogram()
+    for v in values:
+        h.record(v)
+    values.sort()
+    for p in (50, 90, 99, 99.9):
+        exact = values[int(len(values) * p / 100) - 1]
+        # 对数分桶的相对误差不超过精度（外加一个桶的取整余量）
+        assert abs(h.percentile(p) - exact) <= exact * 0.03
+    assert h.count == len(values)
+    assert h.percentile(100) == h.max
+
+
+def test_histogram_merge_and_roundtrip():
+    a, b = LatencyHistogram(), LatencyHistogram()
+    for i in range(1, 101):
+        (a if i % 2 else b).record(i / 1000)
+    a.merge(b)
+    assert a.count == 100 and a.min == 0.001 and a.max == 0.1
+    c = LatencyHistogram.from_dict(a.to_dict())
+    assert c.percentile(50) == a.percentile(50) and c.count == 100
+
+
+def test_bench_stats_merge_windows_and_status():
+    start = 1000.0
+    s1, s2 = BenchStats(start=start), BenchStats(start=start)
+    s1.record("new_order", 0.01, 200, True, now=start + 0.5)
+    s1.record("new_order", 0.02, 518, False, now=start + 1.5)
+    s2.record("new_order", 0.03, 200, True, now=start + 1.2)
+    s2.record("payment", 0.04, "ConnectionError", False, now=start + 2.1)
+    total = BenchStats.merged([s1, s2])
+    r = total.report({"sessions": 2})
+    no = r["operations"]["new_order"]
+    assert (no["count"], no["ok"], no["errors"]) == (3, 2, 1)
+    assert no["status"] == {"200": 2, "518": 1}
+    assert r["operations"]["payment"]["status"] == {"ConnectionError": 1}
+    assert r["windows"] == [
+        {"t": 0.0, "new_order": 1},
+        {"t": 1.0, "new_order": 2},
+        {"t": 2.0, "payment": 1},
+    ]
+    assert set(no["latency_ms"]) >= {"p50", "p90", "p99", "p99.9", "mean", "max"}
+    assert r["sessions"] == 2
+    assert "new_order" in format_report(r)
+
+
+def test_bench_stats_dict_roundtrip_merges_like_the_original():
+    # 多进程压测：子进程传回 to_dict()，父进程 from_dict() 后合并
+    start = 1000.0
+    a, b = BenchStats(start=start), BenchStats(start=start + 1.0)
+    for i in range(50):
+        a.record("new_order", 0.001 * (i + 1), 200, True, now=start + i * 0.05)
+        b.record("payment", 0.002 * (i + 1), 200 if i % 10 else 518, i % 10 != 0, now=start + 1.0 + i * 0.05)
+    direct = BenchStats.merged([a, b]).report()
+    via_dict = BenchStats.merged([BenchStats.from_dict(a.to_dict()), BenchStats.from_dict(b.to_dict())]).report()
+    assert via_dict == direct
+    assert via_dict["operations"]["payment"]["errors"] == 5
@@ -0,0 +1,66 @@
+import collections
+import re
+
+from be.model import mongo_store
+from fe.access import book, book_gen
+
+CJK = re.compile("[一-鿿]")
+
+
+def test_books_are_deterministic_per_seed_and_range():
+    whole = list(book_gen.iter_books(0, 2500, seed=3))
+    assert list(book_gen.iter_books(1990, 20, seed=3)) == whole[1990:2010]
+    assert [b["id"] for b in whole[:2]] == ["sg_00000000", "sg_00000001"]
+    other = list(book_gen.iter_books(0, 50, seed=4))
+    assert [b["title"] for b in other] != [b["title"] for b in whole[:50]]
+
+
+def test_books_look_like_the_catalog():
+    books = list(book_gen.iter_books(0, 3000, seed=1, pictures=0.5, picture_bytes=64))
+    assert all(CJK.search(b["title"]) and b["author"] for b in books)
+    assert set(books[0]) >= {"publisher", "pub_year", "pages", "price", "isbn", "book_intro", "content", "tags", "picture"}
+    for b in books[:50]:
+        digits = [int(c) for c in b["isbn"]]
+        assert len(digits) == 13 and sum(d * (1 if k % 2 == 0 else 3) for k, d in enumerate(digits)) % 10 == 0
+    tags = collections.Counter(t for b in books for t in b["tags"])
+    assert tags.most_common(1)[0][0] == "小说" and tags["小说"] > 5 * tags["语言"]
+    prices = sorted(b["price"] for b in books)
+    # 对数正态：均值明显高于中位数
+    assert sum(prices) / len(prices) > prices[len(prices) // 2]
+    with_pic = [b for b in books if b["picture"]]
+    assert 0.4 < len(with_pic) / len(books) < 0.6 and with_pic[0]["picture"].startswith(book_gen.PNG_HEADER)
+
+
+def test_generate_bulk_inserts_and_is_resumable():
+    col = mongo_store.get_db()["bookdb_gen_test"]
+    try:
+        assert book_gen.generate(1100, "bookdb_gen_test", seed=2, processes=1, batch_size=400, drop=True) == 1100
+        # 重复运行只补上缺少的书
+        assert book_gen.generate(1300, "bookdb_gen_test", seed=2, processes=1, batch_size=400) == 200
+        assert col.count_documents({}) == 1300
+        bdb = book.BookDB(False)
+        bdb.col = col
+        bdb._synthetic_only = False
+        books = bdb.get_book_info(1000, 3)
+        assert [b.id for b in books] == ["sg_00001000", "sg_00001001", "sg_00001002"]
+        assert books[0].title == next(book_gen.iter_books(1000, 1, seed=2))["title"]
+    finally:
+        col.drop()
+
+
+def test_ensure_book_db_seeds_the_same_rows_once(monkeypatch):
+    name = "bookdb_ensure_test"
+    col = mongo_store.get_db()[name]
+    col.drop()
+    try:
+        book._ensure_book_db(name, sample_size=30)
+        rows = list(col.find({}, {"_id": 0}).sort("id", 1))
+        assert rows == [book._sample_book(i) for i in range(30)]
+        assert rows[7] == {**rows[7], "id": "bk_00007", "title": "Sample Book 7", "pages": 127, "price": 1007}
+        # 同一进程再次调用不再访问集合
+        col.delete_many({})
+        book._ensure_book_db(name, sample_size=30)
+        assert col.count_documents({}) == 0
+    finally:
+        book._ensured.discard((mongo_store.get_db().name, name))
+        col.drop()
@@ -0,0 +1,64 @@
+import pytest
+
+from be.model import mongo_store
+from fe.access import book_gen
+from fe.access.book import Book, BookDB
+
+
+def test_iter_books_walks_the_catalog_in_id_order():
+    bdb = BookDB(large=False)
+    ids = [b.id for b in bdb.get_book_info(0, bdb.get_book_count())]
+    assert [b.id for b in bdb.iter_books(batch_size=7)] == ids
+    assert [b.id for b in bdb.iter_books(after_id=ids[9], batch_size=4)] == ids[10:]
+    assert list(bdb.iter_books(after_id=ids[-1])) == []
+
+
+def test_sequential_get_book_info_resumes_after_last_id(monkeypatch):
+    bdb = BookDB(large=False)
+    expected = [b.id for b in bdb.get_book_info(0, 30)]
+    queries = []
+    find = bdb.col.find
+
+    def spy(q, *a, **kw):
+        queries.append(q)
+        return find(q, *a, **kw)
+
+    monkeypatch.setattr(bdb.col, "find", spy, raising=False)
+    got = []
+    for start in range(0, 30, 10):
+        got.extend(b.id for b in bdb.get_book_info(start, 10))
+    assert got == expected
+    assert "$gt" not in queries[0]["id"] and queries[1]["id"]["$gt"] == expected[9]
+    # 非顺序访问仍按位置读取
+    assert [b.id for b in bdb.get_book_info(5, 3)] == expected[5:8]
+    assert "$gt" not in queries[-1]["id"]
+
+
+def test_book_is_slotted_and_encodes_pictures_lazily():
+    b = Book()
+    assert not hasattr(b, "__dict__")
+    with pytest.raises(AttributeError):
+        b.not_a_field = 1
+    b.id = "x"
+    b.set_picture(b"\x89PNG-bytes", 4)
+    assert b._pictures is None
+    d = b.to_dict()
+    assert d["id"] == "x" and len(d["pictures"]) == 4 and d["pictures"][0] is d["pictures"][3]
+    b.set_picture(None, 5)
+    assert b.pictures == []
+
+
+def test_iter_books_can_leave_pictures_out(monkeypatch):
+    col = mongo_store.get_db()["bookdb_iter_test"]
+    try:
+        book_gen.generate(30, "bookdb_iter_test", processes=1, pictures=1.0, picture_bytes=16, drop=True)
+        bdb = BookDB(large=True)
+        bdb.col = col
+        monkeypatch.setattr("random.randint", lambda a, b: 2)
+        with_pics = list(bdb.iter_books(batch_size=8))
+        without = list(bdb.iter_books(batch_size=8, pictures=False))
+        assert len(with_pics) == len(without) == 30
+        assert all(len(b.pictures) == 2 for b in with_pics)
+        assert all(b.pictures == [] for b in without)
+    finally:
+        col.drop()
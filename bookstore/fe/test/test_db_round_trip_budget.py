@@ -0,0 +1,97 @@
+"""MongoDB round-trip budgets per API call.
+
+The budgets are the current cost of each endpoint; a change that adds
+database calls must raise the budget here on purpose. They are written as a
+function of the order size where the endpoint loops over the books.
+"""
+import copy
+import uuid
+
+import pytest
+
+from fe import conf
+from fe.access import book
+from fe.access.new_buyer import register_new_buyer
+from fe.access.new_seller import register_new_seller
+from fe.access.search import Search
+
+ORDER_SIZES = (1, 5, 20)
+
+# user + store 存在性检查、一次 $in 库存查询、订单头、明细 insert_many、created 状态
+NEW_ORDER_BUDGET = 6
+
+
+def payment_budget(n: int) -> int:
+    # 订单头 x2（含超时检查）、最新状态、用户、店铺、明细、每本书一次扣库存、
+    # 买卖双方余额 x2、paid 状态、删除明细、删除订单头
+    return 11 + n
+
+
+# 当前页一次聚合，总数一次聚合
+LIST_ORDERS_BUDGET = 2
+ADD_BOOK_BUDGET = 4
+# $text 查询；无文本索引时再加一次回退查询
+SEARCH_BUDGET = 2
+
+
+@pytest.fixture(scope="module")
+def shop():
+    suffix = uuid.uuid1()
+    seller_id = "budget_seller_{}".format(suffix)
+    store_id = "budget_store_{}".format(suffix)
+    seller = register_new_seller(seller_id, seller_id)
+    assert seller.create_store(store_id) == 200
+    books = book.BookDB(conf.Use_Large_DB).get_book_info(0, max(ORDER_SIZES))
+    for bk in books:
+        assert seller.add_book(store_id, 10 ** 6, bk) == 200
+    buyer_id = "budget_buyer_{}".format(suffix)
+    buyer = register_new_buyer(buyer_id, buyer_id)
+    assert buyer.add_funds(10 ** 12) == 200
+    return {"seller": seller, "store_id": store_id, "books": books, "buyer": buyer}
+
+
+def _items(shop, n):
+    assert len(shop["books"]) >= n
+    return [(bk.id, 1) for bk in shop["books"][:n]]
+
+
+@pytest.mark.parametrize("n", ORDER_SIZES)
+def test_new_order_budget_does_not_grow_with_order_size(shop, db_budget, n):
+    with db_budget(NEW_ORDER_BUDGET, "new_order with {} books".format(n)):
+        code, _ = shop["buyer"].new_order(shop["store_id"], _items(shop, n))
+    assert code == 200
+
+
+@pytest.mark.parametrize("n", ORDER_SIZES)
+def test_payment_budget(shop, db_budget, n):
+    code, order_id = shop["buyer"].new_order(shop["store_id"], _items(shop, n))
+    assert code == 200
+    with db_budget(payment_budget(n), "payment of {} books".format(n)):
+        assert shop["buyer"].payment(order_id) == 200
+
+
+def test_list_orders_budget(shop, db_budget):
+    with db_budget(LIST_ORDERS_BUDGET, "list_orders"):
+        code, _ = shop["buyer"].list_orders(page=1, size=20)
+    assert code == 200
+
+
+def test_add_book_budget(shop, db_budget):
+    # 复制一份再改 id，模块级夹具里的书仍是店里已有的那些
+    bk = copy.copy(shop["books"][0])
+    bk.id = "{}_budget_{}".format(bk.id, uuid.uuid1())
+    with db_budget(ADD_BOOK_BUDGET, "add_book"):
+        assert shop["seller"].add_book(shop["store_id"], 1, bk) == 200
+
+
+def test_search_budget(shop, db_budget):
+    title = shop["books"][0].title
+    with db_budget(SEARCH_BUDGET, "search"):
+        code, _ = Search(conf.URL).keyword(title, {"store_id": shop["store_id"]})
+    assert code == 200
+
+
+def test_budget_failure_names_the_calls(shop, db_budget):
+    with pytest.raises(AssertionError, match="budget 1"):
+        with db_budget(1, "new_order"):
+            shop["buyer"].new_order(shop["store_id"], _items(shop, 5))
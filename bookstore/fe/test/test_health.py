@@ -0,0 +1,154 @@
+import threading
+import time
+import uuid
+from urllib.parse import urljoin
+
+import pytest
+import requests
+from flask import Flask, jsonify
+from pymongo.errors import ServerSelectionTimeoutError
+from werkzeug.serving import make_server
+
+from be import health
+from be.model import mongo_store, store_mongo
+from be.view.admin import bp_admin
+from be.view.health import bp_health
+from fe import conf
+
+
+def test_healthz_and_readyz_on_running_server():
+    r = requests.get(urljoin(conf.URL, "healthz"))
+    assert r.status_code == 200
+    assert r.json()["status"] == "ok" and r.json()["draining"] is False
+    r = requests.get(urljoin(conf.URL, "readyz"))
+    assert r.status_code == 200, r.text
+    checks = r.json()["checks"]
+    assert checks["mongo"] == "ok"
+    assert checks["indexes"]["found"] >= checks["indexes"]["expected"] == store_mongo.INDEX_VERSION
+
+
+def test_not_ready_until_indexes_reach_the_expected_version():
+    db = mongo_store._get_client()["health_{}".format(uuid.uuid1().hex[:12])]
+    try:
+        ready, checks = health.readiness(db)
+        assert not ready and checks["indexes"]["found"] == 0
+        store_mongo.ensure_indexes(db)
+        ready, checks = health.readiness(db)
+        assert ready and checks["indexes"]["found"] == store_mongo.INDEX_VERSION
+    finally:
+        mongo_store._get_client().drop_database(db.name)
+
+
+def test_not_ready_when_mongo_is_unreachable():
+    class Unreachable:
+        def command(self, name):
+            raise ServerSelectionTimeoutError("no servers")
+
+    ready, checks = health.readiness(Unreachable())
+    assert not ready
+    assert checks["mongo"].startswith("ServerSelectionTimeoutError")
+
+
+def test_index_build_retries_until_mongo_answers(monkeypatch):
+    monkeypatch.setattr(health, "STATE", health.Lifecycle())
+    monkeypatch.setattr(health, "INDEX_RETRY_MIN_S", 0.01)
+    calls = []
+
+    def get_db():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ServerSelectionTimeoutError("no servers")
+        return mongo_store.get_db()
+
+    health.start_index_build(get_db).join(10)
+    assert len(calls) == 3
+    assert health.STATE.indexes_ready and health.STATE.index_error is None
+
+
+@pytest.fixture
+def drain_server(monkeypatch):
+    """A separate server with the health hooks, so draining it leaves the test backend alone."""
+    state = health.Lifecycle()
+    monkeypatch.setattr(health, "STATE", state)
+    release = threading.Event()
+    app = Flask(__name__)
+    health.init_app(app)
+    app.register_blueprint(bp_health)
+    app.register_blueprint(bp_admin)
+
+    @app.route("/slow_checkout")
+    def slow_checkout():
+        release.wait(10)
+        return jsonify({"message": "ok"})
+
+    @app.route("/fast")
+    def fast():
+        return jsonify({"message": "ok"})
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    state.server = server
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = "http://127.0.0.1:{}/".format(server.server_port)
+    yield url, state, release, thread
+    release.set()
+    if thread.is_alive():
+        server.shutdown()
+    server.server_close()
+
+
+def test_drain_finishes_in_flight_requests_and_rejects_new_ones(drain_server):
+    url, state, release, server_thread = drain_server
+    assert requests.get(url + "fast").status_code == 200
+    assert requests.get(url + "readyz").status_code == 200
+
+    results = []
+    inflight = threading.Thread(target=lambda: results.append(requests.get(url + "slow_checkout")))
+    inflight.start()
+    for _ in range(100):
+        if state.in_flight == 1:
+            break
+        time.sleep(0.01)
+    assert state.in_flight == 1
+
+    r = requests.post(url + "admin/drain", json={"deadline_s": 10})
+    assert r.status_code == 202 and r.json()["in_flight"] == 1
+    assert requests.post(url + "admin/drain", json={}).status_code == 409
+
+    rejected = requests.get(url + "fast")
+    assert rejected.status_code == 503
+    assert rejected.headers["Retry-After"] == "1"
+    assert requests.get(url + "readyz").status_code == 503
+    live = requests.get(url + "healthz")
+    assert live.status_code == 200 and live.json()["draining"] is True
+
+    # 在途请求完成后服务器才停止
+    assert server_thread.is_alive()
+    release.set()
+    inflight.join(10)
+    assert results[0].status_code == 200
+    server_thread.join(10)
+    assert not server_thread.is_alive()
+    assert state.last_drain["unfinished"] == 0
+
+
+def test_drain_stops_at_the_deadline(drain_server):
+    url, state, release, server_thread = drain_server
+    inflight = threading.Thread(target=lambda: requests.get(url + "slow_checkout"), daemon=True)
+    inflight.start()
+    for _ in range(100):
+        if state.in_flight == 1:
+            break
+        time.sleep(0.01)
+    assert state.drain(0.2, stop=True)
+    server_thread.join(5)
+    assert not server_thread.is_alive()
+    assert state.last_drain["unfinished"] == 1
+
+
+def test_drain_endpoint_is_admin_only(drain_server, monkeypatch):
+    url, state, _, _ = drain_server
+    monkeypatch.setenv("BE_ADMIN_TOKEN", "s3cret")
+    assert requests.post(url + "admin/drain", json={}).status_code == 403
+    assert requests.post(url + "admin/drain", json={"deadline_s": -1}, headers={"X-Admin-Token": "s3cret"}).status_code == 400
+    assert not state.draining
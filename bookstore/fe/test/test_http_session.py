@@ -0,0 +1,85 @@
+import threading
+import uuid
+
+import pytest
+import requests
+
+from fe import conf
+from fe.access import http_session
+from fe.access.auth import Auth
+from fe.bench import http_pool
+from fe.bench.workload import Workload
+
+
+@pytest.fixture
+def fresh_session():
+    http_session.reset_session()
+    yield
+    http_session.reset_session()
+
+
+def test_sequential_calls_reuse_one_connection(fresh_session):
+    auth = Auth(conf.URL)
+    user = "pool_{}".format(uuid.uuid1())
+    assert auth.register(user, "pw") == 200
+    for _ in range(10):
+        code, _ = auth.login(user, "pw", "t")
+        assert code == 200
+    assert http_session.connections_opened() == 1
+
+
+def test_threads_share_the_pool(fresh_session):
+    auth = Auth(conf.URL)
+    user = "pool_{}".format(uuid.uuid1())
+    assert auth.register(user, "pw") == 200
+    sessions = []
+
+    def work():
+        sessions.append(http_session.get_session())
+        for _ in range(5):
+            assert auth.login(user, "pw", "t")[0] == 200
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(set(map(id, sessions))) == 1
+    assert 1 <= http_session.connections_opened() <= 4
+
+
+def test_session_is_rebuilt_in_a_new_process(fresh_session, monkeypatch):
+    first = http_session.get_session()
+    monkeypatch.setattr(http_session, "_session_pid", -1)
+    assert http_session.get_session() is not first
+
+
+def test_only_connection_errors_are_retried(fresh_session):
+    retry = http_session.get_session().get_adapter(conf.URL).max_retries
+    assert retry.connect == conf.Http_Retries
+    assert retry.read == 0 and retry.status == 0 and retry.other == 0
+    with pytest.raises(requests.ConnectionError):
+        http_session.post("http://127.0.0.1:9/nothing", json={}, timeout=1)
+
+
+def test_unpooled_mode_bypasses_the_session(fresh_session, monkeypatch):
+    monkeypatch.setattr(conf, "Http_Pool", False)
+    assert Auth(conf.URL).login("nobody", "pw", "t")[0] != 200
+    assert http_session.connections_opened() == 0
+
+
+def test_pool_comparison_bench_runs_both_modes(monkeypatch):
+    monkeypatch.setattr(conf, "Book_Num_Per_Store", 10)
+    monkeypatch.setattr(conf, "Seller_Num", 1)
+    monkeypatch.setattr(conf, "Store_Num_Per_User", 1)
+    monkeypatch.setattr(conf, "Buyer_Num", 2)
+    monkeypatch.setattr(conf, "Use_Large_DB", False)
+    wl = Workload()
+    wl.gen_database()
+    result = http_pool.compare_pooling(2, requests=20, wl=wl)
+    for name in ("unpooled", "pooled"):
+        assert result[name]["operations"]["new_order"]["ok"] == 40 * result["rounds"]
+    assert result["unpooled"]["connections_opened"] == result["unpooled"]["requests"]
+    assert result["pooled"]["connections_opened"] <= 2 * result["rounds"]
+    assert set(result["throughput_ratio"]) == {"new_order", "payment"}
+    assert conf.Http_Pool is True
@@ -0,0 +1,145 @@
+from be.model.search_mongo import Search, Filter, SORT_KEYS
+from be.model import mongo_store
+from be.model import store_mongo
+from fe.bench import index_advisor
+
+
+def test_propose_index_esr_order():
+    # 等值字段在前，排序字段居中，范围字段在后
+    q = {"price": {"$lte": 10}, "store_id": "s1", "stock_level": {"$gte": 1}}
+    keys = index_advisor.propose_index(q)
+    assert keys == [("store_id", 1), ("title", 1), ("book_id", 1), ("price", 1), ("stock_level", 1)]
+    # $text 只能走文本索引，不给出建议
+    assert index_advisor.propose_index({"$text": {"$search": "x"}}) is None
+
+
+def test_merge_proposals_drops_prefixes_and_duplicates():
+    a = [("store_id", 1), ("title", 1), ("book_id", 1)]
+    b = a + [("price", 1)]
+    merged = index_advisor.merge_proposals([a, b, list(b), None])
+    assert merged == [b]
+
+
+def test_summarize_explain_detects_in_memory_sort():
+    explain = {
+        "queryPlanner": {
+            "winningPlan": {
+                "stage": "SORT",
+                "inputStage": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "price_1"}},
+            }
+        },
+        "executionStats": {"totalKeysExamined": 7, "totalDocsExamined": 5, "nReturned": 3},
+    }
+    s = index_advisor.summarize_explain(explain)
+    assert s["in_memory_sort"] is True
+    assert s["indexes"] == ["price_1"]
+    assert (s["keys_examined"], s["docs_examined"], s["n_returned"]) == (7, 5, 3)
+
+
+def test_base_query_matches_filter():
+    f = Filter(store_id="s1", isbn=123)
+    f.price = [1, None]
+    q = Search()._base_query(f)
+    assert q == {"store_id": "s1", "isbn": "123", "price": {"$gte": 1}}
+    assert SORT_KEYS == [("title", 1), ("book_id", 1)]
+
+
+def test_store_shape_uses_esr_index_without_memory_sort():
+    inv = mongo_store.get_db()["inventory"]
+    inv.delete_many({"store_id": "st_esr"})
+    try:
+        for i in range(5):
+            inv.insert_one(
+                {"store_id": "st_esr", "book_id": f"bk_{i}", "title": f"T{i}", "price": 1000 + i, "stock_level": i, "isbn": f"E{i}"}
+            )
+        corpus = [
+            index_advisor.QueryShape("store", filter=Filter(store_id="st_esr")),
+            index_advisor.QueryShape("store_price", filter=Filter(store_id="st_esr", price=[1001, 1003])),
+        ]
+        report = index_advisor.analyze(corpus=corpus)
+        rows = {r["shape"]: r for r in report["before"]}
+        assert rows["store"]["n_returned"] == 5
+        assert rows["store_price"]["n_returned"] == 3
+        # (title, book_id) 顺序直接由 ESR 索引给出，不需要内存排序
+        assert rows["store"]["in_memory_sort"] is False
+        assert rows["store_price"]["in_memory_sort"] is False
+        # 已随 store_mongo 发布的 ESR 索引覆盖了这些建议
+        assert report["missing"] == []
+        assert "store" in index_advisor.format_report(report)
+    finally:
+        inv.delete_many({"store_id": "st_esr"})
+
+
+def test_listing_projection_transfers_fewer_bytes_and_keeps_results():
+    inv = mongo_store.get_db()["inventory"]
+    inv.delete_many({"store_id": "st_lean"})
+    picture = "A" * 4096
+    try:
+        for i in range(3):
+            inv.insert_one(
+                {
+                    "store_id": "st_lean",
+                    "book_id": f"bk_{i}",
+                    "book_info": '{"picture": "%s"}' % picture,
+                    "title": f"Lean {i}",
+                    "author": "Au",
+                    "isbn": f"L{i}",
+                    "price": 100 + i,
+                    "stock_level": 2,
+                    "pages": 100,
+                    "pub_year": 2020,
+                }
+            )
+        corpus = [index_advisor.QueryShape("store", filter=Filter(store_id="st_lean"))]
+        report = index_advisor.analyze(corpus=corpus, measure_bytes=True)
+        b = report["bytes"][0]
+        assert b["n"] == 3
+        assert b["bytes_listing"] * 10 < b["bytes_full"]
+
+        code, _, rows = Search().search("", Filter(store_id="st_lean"))
+        assert code == 200 and [r["book_id"] for r in rows] == ["bk_0", "bk_1", "bk_2"]
+        assert set(rows[0].keys()) == {"store_id", "book_id", "title", "author", "price", "isbn", "stock_level"}
+    finally:
+        inv.delete_many({"store_id": "st_lean"})
+
+
+def test_is_served_ignores_range_field_order():
+    listing = [("store_id", 1), ("title", 1), ("book_id", 1), ("price", 1), ("stock_level", 1), ("pages", 1)]
+    assert index_advisor._is_served([("store_id", 1), ("title", 1), ("book_id", 1), ("pages", 1), ("price", 1)], [listing])
+    # 等值与排序前缀必须完全一致
+    assert not index_advisor._is_served([("store_id", 1), ("isbn", 1), ("title", 1), ("book_id", 1)], [listing])
+    assert not index_advisor._is_served([("store_id", 1), ("title", 1), ("book_id", 1), ("pub_year", 1)], [listing])
+
+
+def test_default_corpus_is_served_by_shipped_indexes():
+    db = mongo_store.get_db()
+    inv = db["inventory"]
+    # 旧版本建过的索引会被 ensure_indexes 删除
+    inv.create_index("isbn")
+    inv.create_index([("store_id", 1), ("stock_level", 1)])
+    store_mongo.ensure_indexes(db)
+    existing = index_advisor._existing_indexes(inv)
+    assert not set(store_mongo.SUPERSEDED_INVENTORY_INDEXES) & set(existing)
+    # 库存扣减只改写一个包含 stock_level 的索引
+    assert [n for n, keys in existing.items() if "stock_level" in dict(keys)] == ["inv_store_listing"]
+
+    search = Search()
+    corpus = index_advisor.default_corpus("st_any", "isbn_any")
+    proposals = index_advisor.merge_proposals(
+        index_advisor.propose_index(index_advisor._shape_query(search, shape)) for shape in corpus
+    )
+    assert proposals and all(index_advisor._is_served(p, existing.values()) for p in proposals)
+
+
+def test_summarize_explain_covered_plan():
+    explain = {
+        "queryPlanner": {
+            "winningPlan": {
+                "stage": "PROJECTION_COVERED",
+                "inputStage": {"stage": "IXSCAN", "indexName": "inv_store_listing"},
+            }
+        },
+        "executionStats": {"totalKeysExamined": 3, "totalDocsExamined": 0, "nReturned": 3},
+    }
+    s = index_advisor.summarize_explain(explain)
+    assert s["covered"] is True and s["in_memory_sort"] is False
@@ -0,0 +1,93 @@
+import re
+import uuid
+from urllib.parse import urljoin
+
+import pytest
+import requests
+from flask import Flask
+
+from be import metrics
+from fe import conf
+from fe.access.auth import Auth
+
+
+def _scrape() -> str:
+    r = requests.get(urljoin(conf.URL, "metrics"))
+    assert r.status_code == 200
+    assert r.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+    return r.text
+
+
+def _sample(text: str, name: str, **labels) -> float:
+    for line in text.splitlines():
+        if line.startswith(name + "{") or line.startswith(name + " "):
+            found = dict(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', line))
+            if all(found.get(k) == v for k, v in labels.items()):
+                return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def test_histogram_renders_cumulative_buckets():
+    h = metrics.Histogram("test_hist_seconds", "test", ("route",), buckets=(0.1, 1.0))
+    try:
+        for v in (0.05, 0.5, 0.5, 3.0):
+            h.observe(v, "/a")
+        text = "\n".join(h.render())
+        assert '# TYPE test_hist_seconds histogram' in text
+        assert 'test_hist_seconds_bucket{route="/a",le="0.1"} 1' in text
+        assert 'test_hist_seconds_bucket{route="/a",le="1.0"} 3' in text
+        assert 'test_hist_seconds_bucket{route="/a",le="+Inf"} 4' in text
+        assert 'test_hist_seconds_count{route="/a"} 4' in text
+        assert _sample(text, "test_hist_seconds_sum", route="/a") == pytest.approx(4.05)
+    finally:
+        metrics.REGISTRY.remove(h)
+
+
+def test_label_values_are_escaped():
+    c = metrics.Counter("test_escape_total", "test", ("path",))
+    try:
+        c.inc('a"b\\c\nd')
+        assert 'test_escape_total{path="a\\"b\\\\c\\nd"} 1' in "\n".join(c.render())
+        with pytest.raises(ValueError):
+            c.inc()
+    finally:
+        metrics.REGISTRY.remove(c)
+
+
+def test_exceptions_and_in_flight_are_counted():
+    app = Flask(__name__)
+    metrics.init_app(app)
+
+    @app.route("/boom")
+    def boom():
+        assert metrics.IN_FLIGHT.value("/boom") == 1
+        raise KeyError("x")
+
+    before = metrics.EXCEPTIONS.value("/boom", "KeyError")
+    assert app.test_client().get("/boom").status_code == 500
+    assert metrics.EXCEPTIONS.value("/boom", "KeyError") == before + 1
+    assert metrics.ERRORS.value("/boom", "500") >= 1
+    assert metrics.IN_FLIGHT.value("/boom") == 0
+    assert metrics.REQUEST_DURATION.count("/boom", "GET", "500") >= 1
+
+
+def test_metrics_endpoint_reports_routes_and_status():
+    user = "metrics_{}".format(uuid.uuid1())
+    auth = Auth(conf.URL)
+    before = _scrape()
+    assert auth.register(user, "pw") == 200
+    assert auth.login(user, "wrong", "t")[0] == 401
+    requests.post(urljoin(conf.URL, "no/such/route"))
+    after = _scrape()
+
+    def delta(name, **labels):
+        return _sample(after, name, **labels) - _sample(before, name, **labels)
+
+    count = "bookstore_http_request_duration_seconds_count"
+    assert delta(count, route="/auth/register", method="POST", status="200") == 1
+    assert delta(count, route="/auth/login", method="POST", status="401") == 1
+    assert delta("bookstore_http_errors_total", route="/auth/login", status="401") == 1
+    assert delta("bookstore_http_errors_total", route="<unmatched>", status="404") == 1
+    assert "/no/such/route" not in after
+    # 抓取请求本身此刻正在处理中
+    assert _sample(after, "bookstore_http_requests_in_flight", route="/metrics") == 1
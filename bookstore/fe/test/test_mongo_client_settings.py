@@ -0,0 +1,107 @@
+import os
+
+import pytest
+from pymongo import MongoClient
+
+from be.model import mongo_store
+from fe.bench import pool_size
+
+
+def test_client_options_from_environment(monkeypatch):
+    for env, _ in mongo_store._INT_OPTIONS:
+        monkeypatch.delenv(env, raising=False)
+    monkeypatch.delenv("MONGO_COMPRESSORS", raising=False)
+    monkeypatch.delenv("MONGO_APP_NAME", raising=False)
+    assert mongo_store.client_options() == {"appname": "bookstore"}
+
+    monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "16")
+    monkeypatch.setenv("MONGO_MIN_POOL_SIZE", "2")
+    monkeypatch.setenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "500")
+    monkeypatch.setenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "3000")
+    monkeypatch.setenv("MONGO_CONNECT_TIMEOUT_MS", "2000")
+    monkeypatch.setenv("MONGO_SOCKET_TIMEOUT_MS", "10000")
+    monkeypatch.setenv("MONGO_COMPRESSORS", "zlib")
+    monkeypatch.setenv("MONGO_ZLIB_LEVEL", "6")
+    monkeypatch.setenv("MONGO_APP_NAME", "bookstore-test")
+    options = mongo_store.client_options()
+    assert options == {
+        "appname": "bookstore-test",
+        "maxPoolSize": 16,
+        "minPoolSize": 2,
+        "waitQueueTimeoutMS": 500,
+        "serverSelectionTimeoutMS": 3000,
+        "connectTimeoutMS": 2000,
+        "socketTimeoutMS": 10000,
+        "compressors": "zlib",
+        "zlibCompressionLevel": 6,
+    }
+    # pymongo 接受这些参数（connect=False 不会连接服务器）
+    client = MongoClient("mongodb://localhost:27017", connect=False, **options)
+    try:
+        pool = client.options.pool_options
+        assert pool.max_pool_size == 16 and pool.min_pool_size == 2
+        assert pool.wait_queue_timeout == 0.5
+        assert pool.connect_timeout == 2.0 and pool.socket_timeout == 10.0
+        assert client.options.server_selection_timeout == 3.0
+        assert pool.metadata["application"] == {"name": "bookstore-test"}
+    finally:
+        client.close()
+
+
+def test_invalid_integer_setting_names_the_variable(monkeypatch):
+    monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "lots")
+    with pytest.raises(ValueError, match="MONGO_MAX_POOL_SIZE"):
+        mongo_store.client_options()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork()")
+def test_child_process_gets_its_own_client(monkeypatch):
+    created = []
+    monkeypatch.setattr(mongo_store, "_create_client", lambda: created.append(os.getpid()) or object())
+    parent = mongo_store._get_client()
+    assert mongo_store._get_client() is parent
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        ok = False
+        try:
+            child = mongo_store._get_client()
+            ok = child is not parent and mongo_store._get_client() is child and created[-1] == os.getpid()
+        finally:
+            os.write(write_fd, b"1" if ok else b"0")
+            os._exit(0)
+    os.close(write_fd)
+    try:
+        assert os.read(read_fd, 1) == b"1"
+    finally:
+        os.close(read_fd)
+        os.waitpid(pid, 0)
+    # 父进程的客户端不受影响
+    assert mongo_store._get_client() is parent
+
+
+def test_pool_size_bench_reports_every_cell(monkeypatch):
+    monkeypatch.delenv("MONGO_MAX_POOL_SIZE", raising=False)
+    report = pool_size.run_pool_bench([1, 4], [1, 3], payments=3, stores=1, books_per_store=10)
+    assert report["mode"] == "pool_size"
+    assert [(c["pool_size"], c["workers"]) for c in report["cells"]] == [(1, 1), (1, 3), (4, 1), (4, 3)]
+    for c in report["cells"]:
+        assert c["payments"] == c["workers"] * 3
+        assert c["ok"] == c["payments"] and c["errors"] == 0, c
+        assert c["throughput"] > 0
+    assert "MONGO_MAX_POOL_SIZE" not in os.environ
+    text = pool_size.format_pool_report(report)
+    assert "pool=1" in text and "pool=4" in text
+
+
+def test_pool_wait_listener_summary():
+    listener = pool_size.PoolWaitListener()
+    listener.connection_created(None)
+    listener.connection_check_out_started(None)
+    listener.connection_checked_out(None)
+    summary = listener.summary()
+    assert summary["connections_created"] == 1
+    assert summary["checkout_wait_ms_mean"] >= 0 and summary["checkout_wait_ms_max"] >= summary["checkout_wait_ms_mean"]
+    listener.reset()
+    assert listener.summary() == {"checkout_wait_ms_mean": 0.0, "checkout_wait_ms_max": 0.0, "connections_created": 0}
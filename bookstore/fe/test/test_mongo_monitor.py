@@ -0,0 +1,75 @@
+import datetime
+import threading
+import uuid
+from urllib.parse import urljoin
+
+import requests
+from pymongo import monitoring
+
+from be.model import mongo_monitor
+from fe import conf
+from fe.access import http_session
+from fe.access.new_buyer import register_new_buyer
+
+_DURATION = datetime.timedelta(microseconds=1500)
+
+
+def _command(monitor, request_id, command, reply=None, failure=None):
+    name = next(iter(command))
+    conn = ("test", 1)
+    monitor.started(monitoring.CommandStartedEvent(command, "db", request_id, conn, request_id))
+    if failure is not None:
+        monitor.failed(monitoring.CommandFailedEvent(_DURATION, failure, name, request_id, conn, request_id))
+    else:
+        monitor.succeeded(monitoring.CommandSucceededEvent(_DURATION, reply or {"ok": 1}, name, request_id, conn, request_id))
+
+
+def test_commands_are_attributed_to_the_tracked_block():
+    monitor = mongo_monitor.CommandMonitor()
+    before = mongo_monitor.COMMAND_DOCUMENTS.value("find", "mon_books")
+    with mongo_monitor.track() as stats:
+        _command(monitor, 1, {"find": "mon_books"}, {"cursor": {"firstBatch": [{}, {}, {}]}, "ok": 1})
+        _command(monitor, 2, {"getMore": 7, "collection": "mon_books"}, {"cursor": {"nextBatch": [{}]}, "ok": 1})
+        _command(monitor, 3, {"update": "mon_users"}, {"n": 1, "ok": 1})
+        _command(monitor, 4, {"findAndModify": "mon_users"}, {"value": None, "ok": 1})
+        _command(monitor, 5, {"insert": "mon_users"}, failure={"errmsg": "dup", "code": 11000})
+    _command(monitor, 6, {"find": "mon_books"})
+    assert stats.round_trips == 5 and stats.failures == 1
+    assert abs(stats.seconds - 5 * 0.0015) < 1e-9
+    assert [c[3] for c in stats.commands] == [3, 1, 1, 0, 0]
+    assert stats.by_command() == {
+        "find.mon_books": 1, "getMore.mon_books": 1, "update.mon_users": 1,
+        "findAndModify.mon_users": 1, "insert.mon_users": 1,
+    }
+    assert mongo_monitor.COMMAND_DOCUMENTS.value("find", "mon_books") == before + 3
+    assert mongo_monitor.COMMAND_FAILURES.value("insert", "mon_users") >= 1
+    assert mongo_monitor.current() is None
+
+
+def test_tracking_is_per_thread():
+    monitor = mongo_monitor.CommandMonitor()
+    seen = []
+
+    def other():
+        seen.append(mongo_monitor.current())
+        _command(monitor, 10, {"find": "mon_other"})
+
+    with mongo_monitor.track() as stats:
+        t = threading.Thread(target=other)
+        t.start()
+        t.join()
+    assert seen == [None] and stats.round_trips == 0
+
+
+def test_responses_carry_round_trip_headers():
+    user = "mon_{}".format(uuid.uuid1())
+    buyer = register_new_buyer(user, user)
+    r = http_session.post(
+        urljoin(conf.URL, "buyer/orders"), json={"user_id": user, "page": 1, "size": 5}, headers={"token": buyer.token}
+    )
+    assert r.status_code == 200
+    assert int(r.headers["X-DB-Round-Trips"]) >= 1
+    assert float(r.headers["X-DB-Time-Ms"]) >= 0
+    text = requests.get(urljoin(conf.URL, "metrics")).text
+    assert 'bookstore_http_db_round_trips_count{route="/buyer/orders"}' in text
+    assert "bookstore_mongo_command_duration_seconds_bucket" in text
@@ -0,0 +1,119 @@
+import threading
+import time
+from urllib.parse import urljoin
+
+import pytest
+import requests
+from flask import Flask
+
+from be import profiler
+from be.view.admin import bp_admin
+from fe import conf
+
+
+def _busy_loop_for_profiler(stop):
+    while not stop.is_set():
+        sum(i * i for i in range(1000))
+
+
+@pytest.fixture
+def busy_thread():
+    stop = threading.Event()
+    t = threading.Thread(target=_busy_loop_for_profiler, args=(stop,), name="busy-worker", daemon=True)
+    t.start()
+    yield t
+    stop.set()
+    t.join()
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(bp_admin)
+    return app.test_client()
+
+
+def test_sample_finds_busy_thread(busy_thread):
+    stacks, rounds = profiler.sample(seconds=0.3, hz=200)
+    assert rounds > 10
+    busy = [(stack, n) for stack, n in stacks.items() if stack[0] == "busy-worker"]
+    assert busy
+    assert any(label.startswith("_busy_loop_for_profiler (") for stack, _ in busy for label in stack)
+    # 采样线程自身不出现在结果中
+    assert not any("sample (" in label for stack in stacks for label in stack)
+
+
+def test_idle_threads_are_skipped_by_default():
+    stop = threading.Event()
+    t = threading.Thread(target=stop.wait, name="idle-waiter", daemon=True)
+    t.start()
+    try:
+        stacks, _ = profiler.sample(seconds=0.05, hz=100)
+        assert not any(stack[0] == "idle-waiter" for stack in stacks)
+        stacks, _ = profiler.sample(seconds=0.05, hz=100, idle=True)
+        assert any(stack[0] == "idle-waiter" for stack in stacks)
+    finally:
+        stop.set()
+        t.join()
+
+
+def test_collapse_format():
+    from collections import Counter
+
+    text = profiler.collapse(Counter({("main", "a (x.py)", "b;c (y.py)"): 3, ("main", "a (x.py)"): 5}))
+    assert text == "main;a (x.py) 5\nmain;a (x.py);b:c (y.py) 3\n"
+    assert profiler.collapse(Counter()) == ""
+
+
+def test_only_one_profile_at_a_time():
+    done = threading.Event()
+    t = threading.Thread(target=lambda: (profiler.sample(seconds=0.5, hz=10), done.set()), daemon=True)
+    t.start()
+    time.sleep(0.1)
+    with pytest.raises(profiler.ProfilerBusy):
+        profiler.sample(seconds=0.1)
+    t.join()
+    assert done.is_set()
+    profiler.sample(seconds=0.01)
+
+
+def test_profile_endpoint_returns_collapsed_stacks(client, busy_thread):
+    r = client.get("/admin/profile?seconds=0.3&hz=100&lines=1")
+    assert r.status_code == 200
+    assert r.mimetype == "text/plain"
+    assert int(r.headers["X-Profile-Samples"]) > 5
+    lines = r.get_data(as_text=True).splitlines()
+    busy = [line for line in lines if line.startswith("busy-worker;")]
+    assert busy
+    stack, count = busy[0].rsplit(" ", 1)
+    assert int(count) > 0
+    assert "_busy_loop_for_profiler (" in stack and "test_profiler.py:" in stack
+
+
+def test_profile_endpoint_validates_parameters(client):
+    assert client.get("/admin/profile?seconds=abc").status_code == 400
+    assert client.get("/admin/profile?seconds=0").status_code == 400
+    assert client.get("/admin/profile?seconds={}".format(profiler.MAX_SECONDS + 1)).status_code == 400
+    assert client.get("/admin/profile?seconds=1&hz={}".format(profiler.MAX_HZ + 1)).status_code == 400
+
+
+def test_profile_endpoint_is_admin_only(client, monkeypatch):
+    # 未配置令牌时只允许本机访问
+    r = client.get("/admin/profile?seconds=0.01", environ_base={"REMOTE_ADDR": "10.0.0.8"})
+    assert r.status_code == 403
+    monkeypatch.setenv("BE_ADMIN_TOKEN", "s3cret")
+    assert client.get("/admin/profile?seconds=0.01").status_code == 403
+    r = client.get("/admin/profile?seconds=0.01", headers={"X-Admin-Token": "wrong"})
+    assert r.status_code == 403
+    r = client.get(
+        "/admin/profile?seconds=0.01", headers={"X-Admin-Token": "s3cret"}, environ_base={"REMOTE_ADDR": "10.0.0.8"}
+    )
+    assert r.status_code == 200
+
+
+def test_profile_running_server():
+    r = requests.get(urljoin(conf.URL, "admin/profile"), params={"seconds": 0.2, "hz": 50, "idle": 1})
+    assert r.status_code == 200
+    assert int(r.headers["X-Profile-Samples"]) > 0
+    # idle=1 时至少能看到服务器的监听线程
+    assert r.text.strip()
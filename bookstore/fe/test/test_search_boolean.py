@@ -0,0 +1,94 @@
+import json
+import uuid
+
+from be.model import search_query
+from be.model.search_mongo import Search, Filter
+from be.model.seller_mongo import Seller
+from be.model.user_mongo import User
+
+
+def test_parse_and_compile_shapes():
+    # 隐式 AND + NOT：正向词编译为 $text 短语（交集），负向词为排除
+    plan = search_query.compile_query("三体 -漫画")
+    assert plan.text == '"三体" -漫画' and plan.equals == {}
+    # 字段词下推为等值条件，OR 组以每个分支的必要词做 $text 超集
+    plan = search_query.compile_query("author:刘慈欣 (科幻 OR 小说)")
+    assert plan.equals == {"author": "刘慈欣"} and plan.text == "科幻 小说"
+    # 仅有 NOT 时无法用索引收窄
+    assert search_query.compile_query("NOT 漫画").text is None
+    # 矛盾的等值条件直接判空
+    assert search_query.compile_query("isbn:1 isbn:2").empty
+    # 无运算符的关键字保持旧语义
+    assert search_query.compile_query("Sample Book") is None
+    assert search_query.compile_query("no-such-word-xyz") is None
+
+
+def test_parse_is_tolerant_of_malformed_input():
+    assert search_query.parse(")a ((b") == search_query.And([search_query.Term("a"), search_query.Term("b")])
+    assert search_query.parse('"open phrase') == search_query.Term("open phrase", phrase=True)
+    assert search_query.parse("a AND") == search_query.Term("a")
+    assert search_query.parse("NOT") is None
+
+
+def test_parse_is_bounded_and_flattens_groups():
+    # 超长的 -/NOT/( 前缀不会递归溢出；NOT 按奇偶折叠
+    assert search_query.parse("NOT NOT a") == search_query.Term("a")
+    assert len(search_query.tokenize("-" * 3000 + "a")) <= search_query.MAX_TOKENS
+    deep = "(" * 20 + "a" + ")" * 20
+    assert search_query.parse(deep) == search_query.Term("a")
+    # 嵌套 AND 展开后，每个正向词都下推到 $text
+    plan = search_query.compile_query("Python (3rd edition)")
+    assert plan.text == '"Python" "3rd" "edition"'
+    # && 与 AND 等价，也会被识别为运算符
+    assert search_query.has_operators("a && b")
+    assert search_query.compile_query("a && b").text == '"a" "b"'
+
+
+def test_search_with_pathological_keyword_does_not_500():
+    for kw in ("-" * 3000 + "a", "NOT " * 3000 + "a", "(" * 3000 + "a"):
+        code, _, rows = Search().search(kw, Filter(store_id="st_no_such_store"))
+        assert code == 200 and rows == []
+
+
+def test_evaluate_residual():
+    doc = {"title": "三体", "author": "刘慈欣", "isbn": "1", "text_blob": "科幻 漫画"}
+    assert not search_query.compile_query("三体 -漫画").matches(doc)
+    assert search_query.compile_query("(小说 OR 科幻) author:刘慈欣").matches(doc)
+    # 旧记录没有 text_blob 时回退到 book_info
+    legacy = {"title": "T", "book_info": json.dumps({"tags": ["武侠"]})}
+    assert search_query.compile_query("T AND 武侠").matches(legacy)
+
+
+def test_boolean_search_end_to_end():
+    suffix = uuid.uuid4().hex[:8]
+    seller_id, store_id = f"u_bool_{suffix}", f"st_bool_{suffix}"
+    assert User().register(seller_id, "pw")[0] == 200
+    s = Seller()
+    assert s.create_store(seller_id, store_id)[0] == 200
+    books = [
+        ("b1", "三体", "刘慈欣", ["科幻"]),
+        ("b2", "三体 漫画版", "刘慈欣", ["漫画"]),
+        ("b3", "球状闪电", "刘慈欣", ["科幻"]),
+        ("b4", "笑傲江湖", "金庸", ["武侠"]),
+    ]
+    for bid, title, author, tags in books:
+        info = {"id": bid, "title": title, "author": author, "tags": tags, "isbn": f"{suffix}-{bid}"}
+        assert s.add_book(seller_id, store_id, bid, json.dumps(info), 1)[0] == 200
+
+    search = Search()
+    f = Filter(store_id=store_id)
+
+    def ids(q):
+        code, _, rows = search.search(q, f)
+        assert code == 200
+        streamed = [r["book_id"] for r in search.iter_search(q, f, batch_size=1)]
+        got = sorted(r["book_id"] for r in rows)
+        assert got == sorted(streamed)
+        return got
+
+    assert ids("三体 -漫画") == ["b1"]
+    assert ids("三体 OR 球状闪电") == ["b1", "b2", "b3"]
+    assert ids("author:刘慈欣 -三体") == ["b3"]
+    assert ids("NOT 刘慈欣") == ["b4"]
+    assert ids(f"isbn:{suffix}-b4") == ["b4"]
+    assert ids('"三体 漫画版"') == ["b2"]
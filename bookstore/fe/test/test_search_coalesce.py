@@ -0,0 +1,95 @@
+import threading
+import time
+from urllib.parse import urljoin
+
+import requests
+
+from fe import conf
+
+N = 6
+
+
+class _SlowSearch:
+    # 统计构造次数；search 阻塞到其余请求都挂到同一个 in-flight 调用上（或超时）
+    created = 0
+    lock = threading.Lock()
+    wait_for_followers = 0
+
+    def __init__(self):
+        with _SlowSearch.lock:
+            _SlowSearch.created += 1
+
+    def search(self, keyword, f):  # noqa: ANN001
+        import be.view.search as vsearch
+
+        deadline = time.time() + 3
+        while vsearch._search_flight.coalesced < self.wait_for_followers and time.time() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        row = {"store_id": f.store_id, "book_id": keyword, "title": "T", "author": "A", "price": 1, "isbn": "I", "stock_level": 1}
+        return 200, "ok", [row]
+
+    def close(self):
+        pass
+
+
+def _post_concurrently(bodies):
+    url = urljoin(conf.URL, "search/keyword")
+    barrier = threading.Barrier(len(bodies))
+    out = [None] * len(bodies)
+
+    def worker(i):
+        barrier.wait()
+        out[i] = requests.post(url, json=bodies[i])
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(bodies))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return out
+
+
+def _install(monkeypatch, coalesce=True):
+    import be.view.search as vsearch
+    from be.model import singleflight
+
+    monkeypatch.setattr(vsearch, "Search", _SlowSearch)
+    monkeypatch.setattr(vsearch, "COALESCE_SEARCH", coalesce)
+    monkeypatch.setattr(vsearch, "_search_flight", singleflight.Group())
+    _SlowSearch.created = 0
+    return vsearch
+
+
+def test_identical_concurrent_searches_build_one_search(monkeypatch):
+    vsearch = _install(monkeypatch)
+    monkeypatch.setattr(_SlowSearch, "wait_for_followers", N - 1)
+    body = {"keyword": "三体", "filter": {"store_id": "st_co"}}
+    rs = _post_concurrently([body] * N)
+    assert all(r.status_code == 200 for r in rs)
+    assert all(r.json()["results"][0]["book_id"] == "三体" for r in rs)
+    assert _SlowSearch.created == 1
+    assert vsearch._search_flight.coalesced == N - 1
+
+
+def test_different_keywords_or_filters_do_not_coalesce(monkeypatch):
+    _install(monkeypatch)
+    bodies = [
+        {"keyword": "三体", "filter": {"store_id": "st_co"}},
+        {"keyword": "球状闪电", "filter": {"store_id": "st_co"}},
+        {"keyword": "三体", "filter": {"store_id": "st_other"}},
+        {"keyword": "三体", "filter": {"store_id": "st_co", "price_from": 100}},
+    ]
+    rs = _post_concurrently(bodies)
+    assert [r.json()["results"][0]["book_id"] for r in rs] == [b["keyword"] for b in bodies]
+    assert [r.json()["results"][0]["store_id"] for r in rs] == [b["filter"]["store_id"] for b in bodies]
+    assert _SlowSearch.created == len(bodies)
+
+
+def test_coalescing_can_be_switched_off(monkeypatch):
+    vsearch = _install(monkeypatch, coalesce=False)
+    body = {"keyword": "三体", "filter": {"store_id": "st_co"}}
+    rs = _post_concurrently([body] * N)
+    assert all(r.status_code == 200 for r in rs)
+    assert _SlowSearch.created == N
+    assert vsearch._search_flight.executed == 0
@@ -0,0 +1,90 @@
+import json
+import uuid
+from urllib.parse import urljoin
+import requests
+from fe import conf
+from fe.access.book import BookDB
+from fe.access.new_seller import register_new_seller
+
+
+def _mk_store(n: int = 5):
+    sid = f"s_exp_{str(uuid.uuid4())[:8]}"
+    s = register_new_seller(sid, "pass")
+    store_id = f"st_exp_{str(uuid.uuid4())[:8]}"
+    assert s.create_store(store_id) == 200
+    books = BookDB(large=False).get_book_info(0, n)
+    for b in books:
+        assert s.add_book(store_id, 3, b) == 200
+    return store_id, books
+
+
+def _read_ndjson(r):
+    return [json.loads(line) for line in r.iter_lines(decode_unicode=True) if line]
+
+
+def test_export_streams_whole_store_in_keyword_order():
+    store_id, books = _mk_store(5)
+    url = urljoin(conf.URL, "search/export")
+    # batch_size 小于结果数，验证多批次输出后内容与 /search/keyword 一致
+    r = requests.post(url, json={"keyword": "", "filter": {"store_id": store_id}, "batch_size": 2}, stream=True)
+    assert r.status_code == 200
+    assert r.headers["Content-Type"].startswith("application/x-ndjson")
+    rows = _read_ndjson(r)
+    assert len(rows) == len(books)
+    assert all(x["store_id"] == store_id for x in rows)
+
+    r2 = requests.post(urljoin(conf.URL, "search/keyword"), json={"keyword": "", "filter": {"store_id": store_id}, "size": 100})
+    assert [x["book_id"] for x in rows] == [x["book_id"] for x in r2.json()["results"]]
+
+
+def test_export_keyword_and_invalid_batch_size():
+    store_id, _ = _mk_store(3)
+    url = urljoin(conf.URL, "search/export")
+    # 非法 batch_size 回退为默认值；关键字无匹配时输出为空
+    r = requests.post(url, json={"keyword": "no-such-word-xyz", "filter": {"store_id": store_id}, "batch_size": "bad"})
+    assert r.status_code == 200
+    assert _read_ndjson(r) == []
+
+    r = requests.post(url, json={"keyword": "Sample", "filter": {"store_id": store_id}, "batch_size": 0})
+    rows = _read_ndjson(r)
+    assert len(rows) == 3 and all("error" not in x for x in rows)
+
+
+class _FailingSearch:
+    # fail_after=0：第一行之前失败；否则输出 fail_after 行后失败
+    fail_after = 0
+
+    def __init__(self):
+        self.closed = False
+
+    def iter_search(self, keyword, f, batch_size=500):  # noqa: ANN001
+        for i in range(self.fail_after):
+            yield {"store_id": "st", "book_id": f"bk{i}"}
+        raise RuntimeError("mongo down")
+
+    def close(self):
+        self.closed = True
+
+
+def test_export_error_before_first_row_returns_528(monkeypatch):
+    import be.view.search as vsearch
+
+    monkeypatch.setattr(vsearch, "Search", _FailingSearch)
+    r = requests.post(urljoin(conf.URL, "search/export"), json={"keyword": "", "filter": {}})
+    assert r.status_code == 528
+    assert r.headers["Content-Type"].startswith("application/json")
+    assert "mongo down" in r.json()["message"]
+
+
+def test_export_error_after_first_row_is_trailing_line(monkeypatch):
+    import be.view.search as vsearch
+
+    class _LateFailure(_FailingSearch):
+        fail_after = 3
+
+    monkeypatch.setattr(vsearch, "Search", _LateFailure)
+    r = requests.post(urljoin(conf.URL, "search/export"), json={"keyword": "", "filter": {}, "batch_size": 2}, stream=True)
+    assert r.status_code == 200
+    rows = _read_ndjson(r)
+    assert [x.get("book_id") for x in rows[:-1]] == ["bk0", "bk1", "bk2"]
+    assert rows[-1] == {"error": "mongo down"}
@@ -0,0 +1,82 @@
+import threading
+import time
+
+import pytest
+
+from be.model import singleflight
+
+
+def test_concurrent_identical_calls_share_one_execution():
+    g = singleflight.Group()
+    calls = []
+    release = threading.Event()
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return ["row"]
+
+    results = []
+
+    def worker():
+        results.append(g.do("k", slow))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    # 等待所有跟随者挂到同一个 in-flight 调用上再放行
+    deadline = time.time() + 5
+    while g.coalesced < 7 and time.time() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert g.executed == 1 and g.coalesced == 7
+    assert all(r is results[0][0] for r, _ in results)
+    assert all(shared for _, shared in results)
+    assert g.in_flight() == 0
+
+
+def test_no_caching_after_completion_and_distinct_keys():
+    g = singleflight.Group()
+    n = {"v": 0}
+
+    def fn():
+        n["v"] += 1
+        return n["v"]
+
+    assert g.do("a", fn) == (1, False)
+    assert g.do("a", fn) == (2, False)
+    assert g.do("b", fn) == (3, False)
+
+
+def test_error_propagates_to_waiters():
+    g = singleflight.Group()
+    release = threading.Event()
+
+    def boom():
+        release.wait(5)
+        raise RuntimeError("boom")
+
+    errors = []
+
+    def worker():
+        try:
+            g.do("k", boom)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for t in threads:
+        t.start()
+    deadline = time.time() + 5
+    while g.coalesced < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for t in threads:
+        t.join()
+    assert errors == ["boom"] * 3
+    with pytest.raises(ValueError):
+        g.do("k", lambda: (_ for _ in ()).throw(ValueError("again")))
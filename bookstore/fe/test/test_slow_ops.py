@@ -0,0 +1,116 @@
+import datetime
+import json
+
+from pymongo import monitoring
+
+from be.model import mongo_monitor, slow_ops
+
+
+def _read(path):
+    with open(path, encoding="utf-8") as fh:
+        return [json.loads(line) for line in fh if line.strip()]
+
+
+def test_query_shape_hides_literals():
+    cmd = {
+        "find": "inventory",
+        "filter": {"store_id": "st_secret", "price": {"$gte": 100, "$lte": 900}, "book_id": {"$in": ["a", "b", "c"]}},
+        "sort": {"title": 1, "book_id": 1},
+        "projection": {"title": 1, "book_id": 1},
+        "limit": 20,
+    }
+    shape = slow_ops.query_shape("find", cmd)
+    assert shape == {
+        "filter": {"store_id": "?", "price": {"$gte": "?", "$lte": "?"}, "book_id": {"$in": ["?"]}},
+        "sort": {"title": 1, "book_id": 1},
+        "projection": ["book_id", "title"],
+        "limit": "?",
+    }
+    agg = {"aggregate": "order_status", "pipeline": [
+        {"$match": {"user_id": "alice"}}, {"$sort": {"ts": -1}}, {"$group": {"_id": "$order_id"}}, {"$skip": 40},
+    ]}
+    assert slow_ops.query_shape("aggregate", agg)["pipeline"] == [
+        {"$match": {"user_id": "?"}}, {"$sort": {"ts": -1}}, {"$group": {"_id": "$order_id"}}, {"$skip": "?"},
+    ]
+    other = dict(cmd, filter={"store_id": "st_other", "price": {"$gte": 1, "$lte": 2}, "book_id": {"$in": ["x"]}})
+    assert slow_ops.shape_id("inventory", "find", shape) == slow_ops.shape_id(
+        "inventory", "find", slow_ops.query_shape("find", other)
+    )
+
+
+def test_explain_summary_handles_find_and_aggregate():
+    find_plan = {
+        "queryPlanner": {"winningPlan": {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}}},
+        "executionStats": {"totalKeysExamined": 0, "totalDocsExamined": 500, "nReturned": 3, "executionTimeMillis": 7},
+    }
+    s = slow_ops.summarize_explain(find_plan)
+    assert s["collscan"] and s["in_memory_sort"] and s["docs_examined"] == 500 and s["indexes"] == []
+    agg_plan = {"stages": [{"$cursor": {
+        "queryPlanner": {"winningPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "user_id_1"}}},
+        "executionStats": {"totalKeysExamined": 4, "totalDocsExamined": 4, "nReturned": 4},
+    }}, {"$group": {}}]}
+    s = slow_ops.summarize_explain(agg_plan)
+    assert s["indexes"] == ["user_id_1"] and not s["collscan"] and s["keys_examined"] == 4
+
+
+def test_slow_commands_are_logged_with_a_sampled_explain(tmp_path):
+    calls = []
+
+    def explain(database, command_name, command):
+        calls.append(slow_ops.explain_command(command_name, command))
+        return {"queryPlanner": {"winningPlan": {"stage": "COLLSCAN"}}, "executionStats": {"totalDocsExamined": 9}}
+
+    log = slow_ops.SlowOpLog(str(tmp_path / "slow.log"), threshold_ms=50, explain_sample=1.0, explain=explain)
+    cmd = {"find": "orders", "filter": {"user_id": "bob"}, "lsid": {"id": 1}, "$db": "project1"}
+    try:
+        assert not log.observe("project1", "orders", "find", cmd, 0.010)
+        assert not log.observe("project1", "orders", "insert", {"insert": "orders"}, 1.0)
+        assert log.observe("project1", "orders", "find", cmd, 0.120, "/buyer/orders")
+        # 同一形状在间隔内不再 explain
+        assert log.observe("project1", "orders", "find", dict(cmd, filter={"user_id": "eve"}), 0.080)
+        log.flush()
+        rows = _read(log.path)
+    finally:
+        log.close()
+    assert len(rows) == 2 and len(calls) == 1
+    assert calls[0] == {"explain": {"find": "orders", "filter": {"user_id": "bob"}}, "verbosity": "executionStats"}
+    first, second = rows
+    assert first["route"] == "/buyer/orders" and first["duration_ms"] == 120.0
+    assert first["shape"] == {"filter": {"user_id": "?"}} and first["explain"]["collscan"]
+    assert "explain" not in second and second["shape_id"] == first["shape_id"]
+    assert "bob" not in json.dumps(rows) and "eve" not in json.dumps(rows)
+
+
+def test_explain_failures_are_recorded_not_raised(tmp_path):
+    def explain(*args):
+        raise RuntimeError("explain not allowed")
+
+    log = slow_ops.SlowOpLog(str(tmp_path / "slow.log"), threshold_ms=0, explain=explain)
+    try:
+        log.observe("db", "inventory", "aggregate", {"aggregate": "inventory", "pipeline": []}, 0.001)
+        log.flush()
+        (row,) = _read(log.path)
+    finally:
+        log.close()
+    assert row["explain_error"].startswith("RuntimeError")
+
+
+def test_monitor_feeds_the_slow_log(tmp_path, monkeypatch):
+    log = slow_ops.SlowOpLog(str(tmp_path / "slow.log"), threshold_ms=1, explain_sample=0)
+    monkeypatch.setattr(slow_ops, "LOG", log)
+    monitor = mongo_monitor.CommandMonitor()
+    conn = ("test", 1)
+    try:
+        with mongo_monitor.track():
+            for rid, (cmd, micros) in enumerate([({"find": "order_status", "filter": {"order_id": "o1"}}, 5000),
+                                                 ({"find": "order_status", "filter": {"order_id": "o2"}}, 200),
+                                                 ({"update": "user"}, 9000)]):
+                name = next(iter(cmd))
+                monitor.started(monitoring.CommandStartedEvent(cmd, "db", rid, conn, rid))
+                monitor.succeeded(monitoring.CommandSucceededEvent(
+                    datetime.timedelta(microseconds=micros), {"ok": 1}, name, rid, conn, rid))
+        log.flush()
+        rows = _read(log.path)
+    finally:
+        log.close()
+    assert [(r["collection"], r["duration_ms"]) for r in rows] == [("order_status", 5.0)]
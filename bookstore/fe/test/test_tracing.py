@@ -0,0 +1,158 @@
+import json
+import uuid
+from urllib.parse import urljoin
+
+import pytest
+import requests
+
+from be import tracing
+from fe import conf
+from fe.access import book
+from fe.access.new_buyer import register_new_buyer
+from fe.access.new_seller import register_new_seller
+from fe.bench import trace_report
+
+
+@pytest.fixture
+def collector(monkeypatch):
+    c = tracing.MemoryCollector()
+    monkeypatch.setattr(tracing.TRACER, "exporter", c)
+    monkeypatch.setattr(tracing.TRACER, "sample_rate", 0.0)
+    monkeypatch.setattr(tracing.TRACER, "route_rates", {})
+    return c
+
+
+def _spans(trace):
+    return trace_report.spans_of(trace)
+
+
+def _attrs(span):
+    return {a["key"]: list(a["value"].values())[0] for a in span["attributes"]}
+
+
+def test_spans_nest_under_the_root(collector):
+    tracer = tracing.Tracer(sample_rate=1.0, route_rates={}, exporter=collector)
+    root, token = tracer.start_trace("GET /x", "/x", attributes={"http.method": "GET"})
+    with tracer.span("outer") as outer:
+        tracer.record("mongo.find", 1000, 500, attributes={"db.mongodb.collection": "orders", "ok": True})
+        with pytest.raises(ValueError):
+            with tracer.span("inner"):
+                raise ValueError("boom")
+    tracer.finish_trace(root, token)
+    assert tracing.current_span() is None
+
+    (trace,) = collector.traces()
+    rs = trace["resourceSpans"][0]
+    assert rs["resource"]["attributes"] == [{"key": "service.name", "value": {"stringValue": "bookstore"}}]
+    spans = {s["name"]: s for s in rs["scopeSpans"][0]["spans"]}
+    assert set(spans) == {"GET /x", "outer", "mongo.find", "inner"}
+    assert {s["traceId"] for s in spans.values()} == {root.trace.trace_id}
+    assert "parentSpanId" not in spans["GET /x"]
+    assert spans["GET /x"]["kind"] == tracing.KIND_SERVER
+    assert spans["outer"]["parentSpanId"] == root.span_id
+    assert spans["mongo.find"]["parentSpanId"] == outer.span_id
+    assert spans["inner"]["parentSpanId"] == outer.span_id
+    assert spans["mongo.find"]["startTimeUnixNano"] == "1000"
+    assert spans["mongo.find"]["endTimeUnixNano"] == "1500"
+    assert _attrs(spans["mongo.find"]) == {"db.mongodb.collection": "orders", "ok": True}
+    assert spans["inner"]["status"]["code"] == tracing.STATUS_ERROR
+    assert _attrs(spans["inner"])["error.message"] == "ValueError: boom"
+    assert int(spans["GET /x"]["endTimeUnixNano"]) >= int(spans["GET /x"]["startTimeUnixNano"])
+
+
+def test_sampling_rates_and_traceparent(collector):
+    tracer = tracing.Tracer(sample_rate=0.0, route_rates=tracing.parse_route_rates("/a=1, /b=0"), exporter=collector)
+    assert tracer.start_trace("GET /c", "/c") is None
+    assert tracer.start_trace("GET /b", "/b") is None
+    root, token = tracer.start_trace("GET /a", "/a")
+    tracer.finish_trace(root, token)
+
+    parent = "00-{}-{}-01".format("ab" * 16, "cd" * 8)
+    root, token = tracer.start_trace("GET /c", "/c", traceparent=parent)
+    tracer.finish_trace(root, token)
+    assert root.trace.trace_id == "ab" * 16 and root.parent_id == "cd" * 8
+    # 未设置 sampled 标志时仍按本地采样率决定
+    assert tracer.start_trace("GET /c", "/c", traceparent="00-{}-{}-00".format("ab" * 16, "cd" * 8)) is None
+    assert len(collector.traces()) == 2
+
+
+def test_traced_is_a_no_op_outside_a_trace(collector):
+    class Model:
+        @tracing.traced
+        def method(self, code):
+            return code, "msg"
+
+    assert Model().method(200) == (200, "msg")
+    assert collector.traces() == []
+
+    root, token = tracing.TRACER.start_trace("GET /m", "/m", traceparent="00-{}-{}-01".format("1" * 32, "2" * 16))
+    Model().method(512)
+    tracing.TRACER.finish_trace(root, token)
+    spans = {s["name"]: s for s in _spans(collector.traces()[0])}
+    span = spans["test_traced_is_a_no_op_outside_a_trace.<locals>.Model.method"]
+    assert _attrs(span)["bookstore.code"] == "512"
+    assert span["status"]["code"] == tracing.STATUS_ERROR
+
+
+def test_file_exporter_writes_one_line_per_trace(tmp_path, collector):
+    path = str(tmp_path / "traces.jsonl")
+    exporter = tracing.FileExporter(path)
+    tracer = tracing.Tracer(sample_rate=1.0, route_rates={}, exporter=exporter)
+    for _ in range(3):
+        root, token = tracer.start_trace("GET /f", "/f")
+        tracer.finish_trace(root, token)
+    exporter.close()
+    traces = list(trace_report.load_traces(path))
+    assert len(traces) == 3
+    assert all(_spans(t)[0]["name"] == "GET /f" for t in traces)
+
+
+def test_checkout_trace_has_model_and_mongo_spans(collector, monkeypatch):
+    monkeypatch.setattr(tracing.TRACER, "route_rates", {"/buyer/payment": 1.0})
+    suffix = uuid.uuid1()
+    seller_id, buyer_id, store_id = "tr_s_{}".format(suffix), "tr_b_{}".format(suffix), "tr_st_{}".format(suffix)
+    seller = register_new_seller(seller_id, seller_id)
+    assert seller.create_store(store_id) == 200
+    bk = book.BookDB(conf.Use_Large_DB).get_book_info(0, 1)[0]
+    assert seller.add_book(store_id, 10, bk) == 200
+    buyer = register_new_buyer(buyer_id, buyer_id)
+    assert buyer.add_funds(10 ** 9) == 200
+    code, order_id = buyer.new_order(store_id, [(bk.id, 1)])
+    assert code == 200
+    # 只有 /buyer/payment 被采样
+    assert collector.traces() == []
+    assert buyer.payment(order_id) == 200
+
+    (trace,) = collector.traces()
+    spans = _spans(trace)
+    by_id = {s["spanId"]: s for s in spans}
+    root = [s for s in spans if "parentSpanId" not in s]
+    assert [s["name"] for s in root] == ["POST /buyer/payment"]
+    assert _attrs(root[0])["http.status_code"] == "200"
+    model = [s for s in spans if s["name"] == "Buyer.payment"]
+    assert len(model) == 1 and model[0]["parentSpanId"] == root[0]["spanId"]
+    mongo = [s for s in spans if s["name"].startswith("mongo.")]
+    assert mongo
+    assert all(by_id[s["parentSpanId"]]["name"] == "Buyer.payment" for s in mongo)
+    assert all(_attrs(s)["db.system"] == "mongodb" for s in mongo)
+
+    report = trace_report.breakdown(collector.traces())
+    phases = report["/buyer/payment"]["phases"]
+    assert report["/buyer/payment"]["count"] == 1
+    assert phases["Buyer.payment"]["calls"] == 1
+    assert any(p.startswith("Buyer.payment/mongo.") for p in phases)
+    assert trace_report.SELF in phases
+    assert "/buyer/payment" in trace_report.format_breakdown(report)
+
+
+def test_trace_id_header_and_traceparent(collector):
+    url = urljoin(conf.URL, "auth/login")
+    r = requests.post(url, json={"user_id": "nobody_{}".format(uuid.uuid1()), "password": "x", "terminal": "t"})
+    assert "X-Trace-Id" not in r.headers
+    parent = "00-{}-{}-01".format(uuid.uuid4().hex, "0123456789abcdef")
+    r = requests.post(url, json={"user_id": "nobody", "password": "x", "terminal": "t"}, headers={"traceparent": parent})
+    assert r.headers["X-Trace-Id"] == parent[3:35]
+    (trace,) = collector.traces()
+    root = [s for s in _spans(trace) if s["name"] == "POST /auth/login"][0]
+    assert root["parentSpanId"] == "0123456789abcdef"
+    assert json.dumps(trace)